@@ -5,15 +5,21 @@ import JavaExtractor.Common.TimeoutCaller;
 import JavaExtractor.FeaturesEntities.ProgramRelation;
 import org.kohsuke.args4j.CmdLineException;
 
+import java.io.BufferedOutputStream;
+import java.io.FileOutputStream;
 import java.io.IOException;
+import java.io.PrintStream;
 import java.nio.file.Files;
 import java.nio.file.Paths;
 import java.util.LinkedList;
-import java.util.concurrent.Executors;
+import java.util.concurrent.ArrayBlockingQueue;
 import java.util.concurrent.ThreadPoolExecutor;
+import java.util.concurrent.TimeUnit;
 
 public class App {
+  private static final int MAX_QUEUED_TASKS = 8;
   private static CommandLineValues s_CommandLineValues;
+  private static PrintStream s_VarOutput = null;
 
   public static void main(String[] args) {
     try {
@@ -25,17 +31,52 @@ public class App {
 
     if (s_CommandLineValues.NoHash) {
       ProgramRelation.setNoHash();
+    } else if (s_CommandLineValues.Hash64) {
+      ProgramRelation.setHash64();
+    }
+    if (s_CommandLineValues.PathDict != null) {
+      ProgramRelation.collectPathDictionary();
+    }
+
+    if (s_CommandLineValues.Daemon) {
+      try {
+        new ExtractorDaemon(s_CommandLineValues).serve();
+      } catch (IOException e) {
+        e.printStackTrace();
+      }
+      return;
     }
 
     if (s_CommandLineValues.Preprocess == true) {
+      if (s_CommandLineValues.VarOutput != null) {
+        try {
+          s_VarOutput =
+              new PrintStream(
+                  new BufferedOutputStream(new FileOutputStream(s_CommandLineValues.VarOutput)));
+        } catch (IOException e) {
+          e.printStackTrace();
+          return;
+        }
+      }
       if (s_CommandLineValues.File != null) {
         ExtractFeaturesTask extractFeaturesTask =
             new ExtractFeaturesTask(s_CommandLineValues, s_CommandLineValues.File.toPath());
+        extractFeaturesTask.setVarOutput(s_VarOutput);
         extractFeaturesTask.run();
 
       } else if (s_CommandLineValues.Dir != null) {
         extractDir();
       }
+      if (s_VarOutput != null) {
+        s_VarOutput.close();
+      }
+      if (s_CommandLineValues.PathDict != null) {
+        try {
+          ProgramRelation.savePathDictionary(s_CommandLineValues.PathDict);
+        } catch (IOException e) {
+          e.printStackTrace();
+        }
+      }
     } else {
       if (s_CommandLineValues.File == null){
         throw new IllegalArgumentException("For demonstration we need file to run net on.");
@@ -46,9 +87,16 @@ public class App {
   }
 
   private static void extractDir() {
+    // Bounded queue with caller-runs policy prevents from creating a lot of tasks in memory
+    // without spinning on the task count.
     ThreadPoolExecutor executor =
-        (ThreadPoolExecutor) Executors.newFixedThreadPool(s_CommandLineValues.NumThreads);
-    executor.setMaximumPoolSize(s_CommandLineValues.NumThreads + 2);
+        new ThreadPoolExecutor(
+            s_CommandLineValues.NumThreads,
+            s_CommandLineValues.NumThreads,
+            0L,
+            TimeUnit.MILLISECONDS,
+            new ArrayBlockingQueue<>(MAX_QUEUED_TASKS),
+            new ThreadPoolExecutor.CallerRunsPolicy());
     LinkedList<ExtractFeaturesTask> tasks = new LinkedList<>();
     try {
       Files.walk(Paths.get(s_CommandLineValues.Dir))
@@ -57,6 +105,7 @@ public class App {
           .forEach(
               f -> {
                 ExtractFeaturesTask task = new ExtractFeaturesTask(s_CommandLineValues, f);
+                task.setVarOutput(s_VarOutput);
                 tasks.add(task);
               });
     } catch (IOException e) {
@@ -65,8 +114,6 @@ public class App {
     }
     try {
       for (ExtractFeaturesTask task : tasks) {
-        while (executor.getTaskCount() - executor.getCompletedTaskCount()
-            > 8) {} // prevent from creating a lot of threads in memory.
         System.err.println(
             executor.getActiveCount()
                 + " Total:"
@@ -80,5 +127,11 @@ public class App {
     } finally {
       executor.shutdown();
     }
+    try {
+      // Shared outputs can be closed only after all tasks are finished.
+      executor.awaitTermination(Long.MAX_VALUE, TimeUnit.MILLISECONDS);
+    } catch (InterruptedException e) {
+      e.printStackTrace();
+    }
   }
 }
@@ -23,6 +23,12 @@ public class CommandLineValues {
   @Option(name = "--no_hash")
   public boolean NoHash = false;
 
+  @Option(name = "--hash64", forbids = "--no_hash")
+  public boolean Hash64 = false;
+
+  @Option(name = "--path_dict")
+  public String PathDict = null;
+
   @Option(name = "--preprocess")
   public boolean Preprocess = false;
 
@@ -50,6 +56,12 @@ public class CommandLineValues {
   @Option(name = "--timeout")
   public int Timeout = 60;
 
+  @Option(name = "--var_output", forbids = "--variables")
+  public String VarOutput = null;
+
+  @Option(name = "--daemon", forbids = {"--file", "--dir"})
+  public boolean Daemon = false;
+
   public CommandLineValues(String... args) throws CmdLineException {
     CmdLineParser parser = new CmdLineParser(this);
     try {
@@ -2,6 +2,8 @@ package JavaExtractor;
 
 import JavaExtractor.Common.CommandLineValues;
 import JavaExtractor.Common.Common;
+import JavaExtractor.Common.MethodContent;
+import JavaExtractor.Common.Pair;
 import JavaExtractor.FeaturesEntities.ProgramFeatures;
 import com.github.javaparser.ParseException;
 import org.apache.commons.lang3.NotImplementedException;
@@ -19,8 +21,10 @@ import spoon.support.reflect.reference.CtFieldReferenceImpl;
 import spoon.support.reflect.reference.CtTypeReferenceImpl;
 
 import java.io.IOException;
+import java.io.PrintStream;
 import java.nio.file.Files;
 import java.nio.file.Path;
+import java.nio.file.Paths;
 import java.util.*;
 import java.util.stream.Collectors;
 import java.util.stream.IntStream;
@@ -31,6 +35,8 @@ public class ExtractFeaturesTask implements Runnable {
   Path filePath;
   String code;
 
+  PrintStream m_VarOutput = null;
+
   HashMap<String, HashMap<String, String>> obfuscatedNames;
   ArrayList<Integer> freeIndexes;
   Integer freeIndexesNumber;
@@ -47,6 +53,18 @@ public class ExtractFeaturesTask implements Runnable {
     obfuscatedNames = new HashMap<>();
   }
 
+  public ExtractFeaturesTask(CommandLineValues commandLineValues, String code, String name) {
+    m_CommandLineValues = commandLineValues;
+    this.filePath = Paths.get(name);
+    this.code = code;
+    obfuscatedNames = new HashMap<>();
+  }
+
+  /** When set, file is parsed once and code2var features are printed to output. */
+  public void setVarOutput(PrintStream output) {
+    m_VarOutput = output;
+  }
+
   @Override
   public void run() {
     try {
@@ -229,6 +247,10 @@ public class ExtractFeaturesTask implements Runnable {
   }
 
   public void processFile() {
+    if (m_VarOutput != null) {
+      processFileBothModes();
+      return;
+    }
     ArrayList<ProgramFeatures> features;
     try {
       features = extractSingleFile();
@@ -236,22 +258,66 @@ public class ExtractFeaturesTask implements Runnable {
       e.printStackTrace();
       return;
     }
+    printFeatures(features, System.out);
+  }
+
+  private void processFileBothModes() {
+    Pair<ArrayList<ProgramFeatures>, ArrayList<ProgramFeatures>> features;
+    try {
+      features = extractBothModes();
+    } catch (IOException e) {
+      e.printStackTrace();
+      return;
+    }
+    printFeatures(features.first(), System.out);
+    printFeatures(features.second(), m_VarOutput);
+  }
+
+  private void printFeatures(ArrayList<ProgramFeatures> features, PrintStream output) {
     if (features == null) {
       return;
     }
 
     String toPrint = featuresToString(features);
     if (toPrint.length() > 0) {
-      System.out.println(toPrint);
+      output.println(toPrint);
+    }
+  }
+
+  /**
+   * Extracts features for both code2vec (first) and code2var (second) the same way as run does and
+   * returns them as lines instead of printing.
+   */
+  public Pair<List<String>, List<String>> extractLinesBothModes() throws IOException {
+    if (m_CommandLineValues.Obfuscate) {
+      obfuscateCode();
     }
+    Pair<ArrayList<ProgramFeatures>, ArrayList<ProgramFeatures>> features = extractBothModes();
+    return Pair.makePair(toLines(features.first()), toLines(features.second()));
+  }
+
+  private static List<String> toLines(ArrayList<ProgramFeatures> features) {
+    return features.stream().map(ProgramFeatures::toString).collect(Collectors.toList());
   }
 
   public ArrayList<ProgramFeatures> extractSingleFile() throws ParseException, IOException {
+    return extractFeatures(FeatureExtractor.extractMethods(code), m_CommandLineValues.OnlyVars);
+  }
+
+  /** Parses code once and extracts features for both code2vec (first) and code2var (second). */
+  public Pair<ArrayList<ProgramFeatures>, ArrayList<ProgramFeatures>> extractBothModes()
+      throws IOException {
+    ArrayList<MethodContent> methods = FeatureExtractor.extractMethods(code);
+    return Pair.makePair(extractFeatures(methods, false), extractFeatures(methods, true));
+  }
+
+  private ArrayList<ProgramFeatures> extractFeatures(
+      ArrayList<MethodContent> methods, boolean onlyVars) {
     FeatureExtractor featureExtractor = new FeatureExtractor(m_CommandLineValues);
 
-    ArrayList<ProgramFeatures> features = featureExtractor.extractFeatures(code);
+    ArrayList<ProgramFeatures> features = featureExtractor.generatePathFeatures(methods, onlyVars);
 
-    if (m_CommandLineValues.OnlyVars) {
+    if (onlyVars) {
       for (ProgramFeatures feature : features) {
         String originalName = feature.getName();
         if (m_CommandLineValues.Obfuscate
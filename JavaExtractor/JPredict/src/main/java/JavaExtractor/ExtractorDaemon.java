@@ -0,0 +1,122 @@
+package JavaExtractor;
+
+import JavaExtractor.Common.CommandLineValues;
+import JavaExtractor.Common.Pair;
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+import com.fasterxml.jackson.databind.node.ArrayNode;
+import com.fasterxml.jackson.databind.node.ObjectNode;
+
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import java.util.List;
+import java.util.concurrent.ExecutionException;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.Future;
+import java.util.concurrent.TimeUnit;
+import java.util.concurrent.TimeoutException;
+
+/**
+ * Keeps JVM and JavaParser warm between extractions. Reads json requests line by line from stdin:
+ * {"id": 1, "path": "File.java"} or {"id": 1, "code": "class A {...}"} and writes one json response
+ * line for each of them to stdout: {"id": 1, "vec": [...], "var": [...]} or {"id": 1, "error": "..."}.
+ * Up to --num_threads requests are extracted at once, so responses can come in other order than requests.
+ */
+public class ExtractorDaemon {
+  private final CommandLineValues m_CommandLineValues;
+  private final ObjectMapper m_Mapper = new ObjectMapper();
+  private final ExecutorService m_Handlers;
+  // Unbounded, stuck extraction thread abandoned on timeout does not take place of next requests.
+  private final ExecutorService m_Extractions = Executors.newCachedThreadPool();
+
+  public ExtractorDaemon(CommandLineValues commandLineValues) {
+    m_CommandLineValues = commandLineValues;
+    m_Handlers = Executors.newFixedThreadPool(Math.max(1, commandLineValues.NumThreads));
+  }
+
+  public void serve() throws IOException {
+    // Only responses are written to stdout, everything printed by extraction goes to stderr.
+    PrintStream responses = new PrintStream(System.out, true, "UTF-8");
+    System.setOut(System.err);
+    BufferedReader requests =
+        new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+    String line;
+    while ((line = requests.readLine()) != null) {
+      if (line.trim().isEmpty()) {
+        continue;
+      }
+      String request = line;
+      m_Handlers.submit(() -> respond(responses, handle(request)));
+    }
+    // Requests sent before stdin was closed are still answered.
+    m_Handlers.shutdown();
+    try {
+      m_Handlers.awaitTermination(Long.MAX_VALUE, TimeUnit.DAYS);
+    } catch (InterruptedException e) {
+      Thread.currentThread().interrupt();
+    }
+    m_Extractions.shutdownNow();
+  }
+
+  private void respond(PrintStream responses, ObjectNode response) {
+    String json;
+    try {
+      json = m_Mapper.writeValueAsString(response);
+    } catch (IOException e) {
+      json = "{\"id\":" + response.get("id") + ",\"error\":\"" + e.getClass().getName() + "\"}";
+    }
+    synchronized (responses) {
+      responses.println(json);
+    }
+  }
+
+  private ObjectNode handle(String line) {
+    ObjectNode response = m_Mapper.createObjectNode();
+    try {
+      JsonNode request = m_Mapper.readTree(line);
+      response.set("id", request.get("id"));
+      String name;
+      String code;
+      if (request.hasNonNull("code")) {
+        name = request.hasNonNull("path") ? request.get("path").asText() : "Input.java";
+        code = request.get("code").asText();
+      } else {
+        name = request.get("path").asText();
+        code = new String(Files.readAllBytes(Paths.get(name)), StandardCharsets.UTF_8);
+      }
+      Pair<List<String>, List<String>> lines = extract(code, name);
+      response.set("vec", toArray(lines.first()));
+      response.set("var", toArray(lines.second()));
+    } catch (Exception e) {
+      response.put("error", e.toString());
+    }
+    return response;
+  }
+
+  /** File is parsed once for both code2vec (first) and code2var (second) lines. */
+  private Pair<List<String>, List<String>> extract(String code, String name)
+      throws InterruptedException, ExecutionException, TimeoutException {
+    ExtractFeaturesTask task = new ExtractFeaturesTask(m_CommandLineValues, code, name);
+    Future<Pair<List<String>, List<String>>> future =
+        m_Extractions.submit(task::extractLinesBothModes);
+    try {
+      return future.get(m_CommandLineValues.Timeout, TimeUnit.SECONDS);
+    } catch (TimeoutException e) {
+      // Stuck extraction thread is abandoned, next requests use other ones.
+      future.cancel(true);
+      throw e;
+    }
+  }
+
+  private ArrayNode toArray(List<String> lines) {
+    ArrayNode array = m_Mapper.createArrayNode();
+    lines.forEach(array::add);
+    return array;
+  }
+}
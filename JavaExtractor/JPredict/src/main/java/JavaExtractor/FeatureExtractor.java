@@ -96,11 +96,20 @@ public class FeatureExtractor {
   }
 
   public ArrayList<ProgramFeatures> generatePathFeatures(ArrayList<MethodContent> methods) {
+    return generatePathFeatures(methods, parseOnlyVars);
+  }
+
+  /**
+   * Generates features of already parsed methods, so the same methods can be used for both
+   * code2vec and code2var features.
+   */
+  public ArrayList<ProgramFeatures> generatePathFeatures(
+      ArrayList<MethodContent> methods, boolean onlyVars) {
     ArrayList<ProgramFeatures> methodsFeatures = new ArrayList<>();
     for (MethodContent content : methods) {
       if (content.getLength() < m_CommandLineValues.MinCodeLength
           || content.getLength() > m_CommandLineValues.MaxCodeLength) continue;
-      if (parseOnlyVars) {
+      if (onlyVars) {
         ArrayList<ProgramFeatures> singleMethodVarsFeatures =
             generatePathOnlyVarsFeaturesForFunction(content);
         if (!singleMethodVarsFeatures.isEmpty()) {
@@ -120,7 +129,7 @@ public class FeatureExtractor {
   private ProgramFeatures generatePathFeaturesForFunction(MethodContent methodContent) {
     ArrayList<Node> functionLeaves = methodContent.getLeaves();
     ProgramFeatures programFeatures =
-        new ProgramFeatures(methodContent.getName(), m_CommandLineValues, methodContent.getMethodName());
+        new ProgramFeatures(methodContent.getName(), false, methodContent.getMethodName());
 
     for (int i = 0; i < functionLeaves.size(); i++) {
       for (int j = i + 1; j < functionLeaves.size(); j++) {
@@ -150,7 +159,7 @@ public class FeatureExtractor {
     for (Node varNode : variableLeaves) {
       String varName = ((VariableDeclaratorId) varNode).getName();
 
-      ProgramFeatures varFeatures = new ProgramFeatures(varName, m_CommandLineValues, methodContent.getMethodName());
+      ProgramFeatures varFeatures = new ProgramFeatures(varName, true, methodContent.getMethodName());
       for (int i = 0; i < functionLeaves.size(); i++) {
         for (int j = i + 1; j < functionLeaves.size(); j++) {
           String separator = Common.EmptyString;
@@ -8,7 +8,7 @@ import java.util.ArrayList;
 import java.util.stream.Collectors;
 
 public class ProgramFeatures {
-  private CommandLineValues m_CommandLineValues;
+  private boolean m_OnlyVars;
 
   private String name;
   private String normalizedName;
@@ -16,9 +16,13 @@ public class ProgramFeatures {
   private ArrayList<ProgramRelation> features = new ArrayList<>();
 
   public ProgramFeatures(String name, CommandLineValues commandLineValues, String methodName) {
+    this(name, commandLineValues.OnlyVars, methodName);
+  }
+
+  public ProgramFeatures(String name, boolean onlyVars, String methodName) {
     this.name = name;
     this.normalizedName = Common.normalizeName(name, Common.BlankWord);
-    this.m_CommandLineValues = commandLineValues;
+    this.m_OnlyVars = onlyVars;
     this.methodName = methodName;
   }
 
@@ -34,10 +38,10 @@ public class ProgramFeatures {
   }
 
   public void addFeature(String source, String path, String target) {
-    if (m_CommandLineValues.OnlyVars && source.equals(this.name)) {
+    if (m_OnlyVars && source.equals(this.name)) {
       source = Common.variableName;
     }
-    if (m_CommandLineValues.OnlyVars && target.equals(this.name)) {
+    if (m_OnlyVars && target.equals(this.name)) {
       target = Common.variableName;
     }
     if (source.equals(this.methodName)){
@@ -46,10 +50,10 @@ public class ProgramFeatures {
     if (target.equals(this.methodName)){
       target = Common.methodName;
     }
-    if (m_CommandLineValues.OnlyVars && source.startsWith("VAR_")){
+    if (m_OnlyVars && source.startsWith("VAR_")){
       source = "VAR";
     }
-    if (m_CommandLineValues.OnlyVars && target.startsWith("VAR_")){
+    if (m_OnlyVars && target.startsWith("VAR_")){
       target = "VAR";
     }
 
@@ -4,11 +4,20 @@ import com.fasterxml.jackson.annotation.JsonIgnore;
 import com.fasterxml.jackson.annotation.JsonIgnoreProperties;
 import com.fasterxml.jackson.annotation.JsonPropertyDescription;
 
+import java.io.IOException;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
 import java.util.ArrayList;
+import java.util.Map;
+import java.util.concurrent.ConcurrentHashMap;
 import java.util.function.Function;
 
 public class ProgramRelation {
+  private static final long FNV64_OFFSET_BASIS = 0xcbf29ce484222325L;
+  private static final long FNV64_PRIME = 0x100000001b3L;
   public static Function<String, String> s_Hasher = (s) -> Integer.toString(s.hashCode());
+  // Hashed path to path, filled only if it was asked for by collectPathDictionary.
+  private static Map<String, String> s_PathDictionary = null;
   private String m_Source;
   private String m_Target;
   private String m_HashedPath;
@@ -22,12 +31,44 @@ public class ProgramRelation {
     m_Target = targetName;
     m_Path = path;
     m_HashedPath = s_Hasher.apply(path);
+    if (s_PathDictionary != null) {
+      s_PathDictionary.putIfAbsent(m_HashedPath, path);
+    }
   }
 
   public static void setNoHash() {
     s_Hasher = (s) -> s;
   }
 
+  /** Paths are hashed with 64-bit FNV-1a of their utf-8 bytes, which is the same on every JVM and run. */
+  public static void setHash64() {
+    s_Hasher = (s) -> Long.toString(fnv1a64(s));
+  }
+
+  public static long fnv1a64(String s) {
+    long hash = FNV64_OFFSET_BASIS;
+    for (byte b : s.getBytes(StandardCharsets.UTF_8)) {
+      hash ^= (b & 0xff);
+      hash *= FNV64_PRIME;
+    }
+    return hash;
+  }
+
+  public static void collectPathDictionary() {
+    s_PathDictionary = new ConcurrentHashMap<>();
+  }
+
+  /** Writes "hashed_path path" lines of all paths seen since collectPathDictionary. */
+  public static void savePathDictionary(String filePath) throws IOException {
+    try (PrintStream output = new PrintStream(filePath, "UTF-8")) {
+      for (Map.Entry<String, String> entry : s_PathDictionary.entrySet()) {
+        output.print(entry.getKey());
+        output.print(' ');
+        output.println(entry.getValue());
+      }
+    }
+  }
+
   public String toString() {
     return String.format("%s,%s,%s", m_Source, m_HashedPath, m_Target);
   }
@@ -1,13 +1,21 @@
 #!/usr/bin/python
 
-import itertools
-import multiprocessing
+import functools
+import hashlib
+import json
 import os
-import shutil
 import subprocess
-from threading import Timer
 import sys
+import threading
+import time
 from argparse import ArgumentParser
+from multiprocessing.pool import ThreadPool
+
+# java_extractor.py lives in the root of repo.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from java_extractor import JavaExtractorDaemon
+from net_type import NetType
 
 
 def get_immediate_subdirectories(a_dir):
@@ -15,51 +23,146 @@ def get_immediate_subdirectories(a_dir):
             if os.path.isdir(os.path.join(a_dir, name)))
 
 
-TMP_DIR = ""
-
+def DrainStderr(stream, dir):
+    """Reads JVM stderr in background, so extractor never blocks on full pipe"""
+    for line in stream:
+        print(f"[{dir}] {line}", end="", flush=True)
 
-def ParallelExtractDir(args, dir):
-    ExtractFeaturesForDir(args, dir, "")
 
-
-def ExtractFeaturesForDir(args, dir, prefix):
+def ExtractFeaturesForDir(args, dir, prefix=""):
     command = ["java", "-cp", args.jar, "JavaExtractor.App",
                "--max_path_length", str(args.max_path_length), "--max_path_width",
                str(args.max_path_width),
                "--dir", dir, "--num_threads", str(args.num_threads), "--preprocess"]
     suffix = ".vec.data.log"
-    if args.only_vars:
+    if args.both_modes:
+        # Every file is parsed once, code2var contexts are written by JVM itself.
+        command += ["--var_output", f"{prefix}{dir}.var.data.log"]
+    elif args.only_vars:
         command += ["--variables"]
         suffix = ".var.data.log"
     if args.obfuscate:
         command += ["--obfuscate"]
-
-    output_filename = f"{TMP_DIR}{prefix}{dir.split('/')[-1]}"
-    with open(output_filename, "a") as outputFile:
-        with open(f"{prefix}{dir}{suffix}", 'a') as o:
-            print(command)
-            sp = subprocess.Popen(command, stdout=o, stderr=subprocess.PIPE)
-
-        while sp.poll() is None:  # sp.poll() returns None while subprocess is running
-            print(sp.stderr.readline())
-
-        print("Ended: ", command)
+    if args.hash64:
+        command += ["--hash64"]
+    if args.path_dict:
+        command += ["--path_dict", f"{prefix}{dir}.path.dict"]
+
+    start = time.time()
+    with open(f"{prefix}{dir}{suffix}", "w") as output_file:
+        print(command, flush=True)
+        sp = subprocess.Popen(command, stdout=output_file, stderr=subprocess.PIPE, universal_newlines=True)
+        stderr_thread = threading.Thread(target=DrainStderr, args=(sp.stderr, dir), daemon=True)
+        stderr_thread.start()
+        sp.wait()
+        stderr_thread.join()
+    return dir, time.time() - start, sp.returncode
+
+
+class ExtractionCache:
+    """
+    Path-context lines of both nets for every extracted file, keyed by file content and extractor parameters.
+    Every entry is a json file {"vec": [...], "var": [...]} in cache_dir.
+    """
+
+    def __init__(self, cache_dir, args):
+        self.cache_dir = cache_dir
+        jar = os.stat(args.jar)
+        # Rebuilt extractor invalidates all entries.
+        self.params = (f"max_path_length={args.max_path_length};max_path_width={args.max_path_width};"
+                       f"obfuscate={bool(args.obfuscate)};hash64={bool(args.hash64)};"
+                       f"jar={jar.st_size}:{jar.st_mtime_ns}")
+
+    def key(self, path):
+        with open(path, "rb") as file:
+            content = file.read()
+        return hashlib.sha256(self.params.encode("utf8") + b"\0" + content).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, lines):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf8") as file:
+            json.dump(lines, file)
+        # Readers never see partially written entry.
+        os.replace(path + ".tmp", path)
+
+
+def GetJavaFiles(dir):
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(dir) for name in names
+                  if name.endswith(".java"))
+
+
+def ExtractFeaturesForDirWithCache(args, dir, prefix=""):
+    """
+    Extracts only files missed in --cache_dir with daemon JVM and assembles .data.log of dir from cache.
+    Daemon extracts --num_threads files at once, as JVM of ExtractFeaturesForDir does.
+    """
+    start = time.time()
+    cache = ExtractionCache(args.cache_dir, args)
+    entries = []
+    missed = []
+    for path in GetJavaFiles(dir):
+        key = cache.key(path)
+        entries.append((path, key, cache.get(key)))
+        if entries[-1][2] is None:
+            missed.append(len(entries) - 1)
+    print(f"[{dir}] {len(entries) - len(missed)} files are cached, {len(missed)} to extract", flush=True)
+
+    if missed:
+        with JavaExtractorDaemon(args.jar, args.max_path_length, args.max_path_width,
+                                 obfuscate=bool(args.obfuscate), stderr=subprocess.DEVNULL,
+                                 hash64=bool(args.hash64), num_threads=args.num_threads) as daemon:
+
+            def extract(position):
+                path, key, _ = entries[position]
+                try:
+                    contexts = daemon.extract(path=path)
+                    lines = {"vec": contexts[NetType.code2vec], "var": contexts[NetType.code2var]}
+                    cache.put(key, lines)
+                except RuntimeError as e:
+                    print(f"[{dir}] {e}", flush=True)
+                    lines = {"vec": [], "var": []}
+                    # Unparsable file fails the same way every time, timeouts and crashes can pass on next run.
+                    if "Timeout" not in str(e) and daemon.process.poll() is None:
+                        cache.put(key, lines)
+                entries[position] = (path, key, lines)
+
+            # Threads only wait for responses of daemon, it keeps num_threads files in flight.
+            with ThreadPool(args.num_threads) as pool:
+                pool.map(extract, missed)
+
+    if args.both_modes:
+        modes = ["vec", "var"]
+    else:
+        modes = ["var"] if args.only_vars else ["vec"]
+    for mode in modes:
+        with open(f"{prefix}{dir}.{mode}.data.log", "w", encoding="utf8") as output_file:
+            for _, _, lines in entries:
+                output_file.writelines(line + "\n" for line in lines[mode])
+    return dir, time.time() - start, 0
 
 
 def ExtractFeaturesForDirsList(args, dirs):
-    global TMP_DIR
-    TMP_DIR = "./tmp/feature_extractor%d/" % (os.getpid())
-    if os.path.exists(TMP_DIR):
-        shutil.rmtree(TMP_DIR, ignore_errors=True)
-    os.makedirs(TMP_DIR)
-    try:
-        p = multiprocessing.Pool(1)
-        p.starmap(ParallelExtractDir, zip(itertools.repeat(args), list(dirs)))
-        output_files = os.listdir(TMP_DIR)
-        for f in output_files:
-            os.system("cat %s/%s" % (TMP_DIR, f))
-    finally:
-        shutil.rmtree(TMP_DIR, ignore_errors=True)
+    """Runs several JVMs at once, their number is sized by cores and --num_threads of each JVM"""
+    workers = args.workers or max(1, (os.cpu_count() or 1) // args.num_threads)
+    print(f"Extracting {len(dirs)} dirs with {workers} JVMs", flush=True)
+    start = time.time()
+    # Every worker only waits for its JVM, so threads are enough.
+    with ThreadPool(workers) as pool:
+        extract = ExtractFeaturesForDirWithCache if args.cache_dir else ExtractFeaturesForDir
+        for dir, elapsed, return_code in pool.imap_unordered(functools.partial(extract, args), dirs):
+            print(f"Ended: {dir} in {elapsed:.1f}s with exit code {return_code}", flush=True)
+    print(f"Extracted {len(dirs)} dirs in {time.time() - start:.1f}s", flush=True)
 
 
 if __name__ == "__main__":
@@ -69,7 +172,10 @@ if __name__ == "__main__":
     parser.add_argument("-maxwidth", "--max_path_width", dest="max_path_width",
                         required=False, default=2)
     parser.add_argument("-threads", "--num_threads", dest="num_threads",
-                        required=False, default=8)
+                        required=False, default=8, type=int)
+    parser.add_argument("-workers", "--workers", dest="workers",
+                        help="number of JVMs running at once, cores / num_threads by default",
+                        required=False, default=None, type=int)
     parser.add_argument("-j", "--jar", dest="jar", required=True)
     parser.add_argument("-d", "--dir", dest="dir", required=False)
     parser.add_argument("-file", "--file", dest="file", required=False)
@@ -77,6 +183,19 @@ if __name__ == "__main__":
                         default=False)
     parser.add_argument("--obfuscate", dest="obfuscate", required=False,
                         default=False)
+    parser.add_argument("--both_modes", dest="both_modes",
+                        help="write code2vec and code2var contexts from one pass to .vec.data.log and .var.data.log",
+                        required=False, default=False)
+    parser.add_argument("--hash64", dest="hash64",
+                        help="write paths as stable 64-bit FNV-1a hashes, see config.HASHED_PATHS",
+                        required=False, default=config.config.HASHED_PATHS)
+    parser.add_argument("--path_dict", dest="path_dict",
+                        help="write \"hash path\" lines of extracted paths to .path.dict of every dir for debugging, "
+                             "not written with --cache_dir",
+                        required=False, default=False)
+    parser.add_argument("--cache_dir", dest="cache_dir",
+                        help="extract only new or changed files of --dir, path-contexts of others are taken from cache",
+                        required=False, default=None)
     args = parser.parse_args()
 
     if args.file is not None:
@@ -85,14 +204,19 @@ if __name__ == "__main__":
                    str(args.max_path_width),
                    "--preprocess",
                    "--file", args.file]
-        if args.only_vars:
+        if args.both_modes:
+            command += ["--var_output", f"{args.file}.var.data.log"]
+        elif args.only_vars:
             command += ["--only_for_vars"]
         if args.obfuscate:
             command += ["--obfuscate"]
+        if args.hash64:
+            command += ["--hash64"]
+        if args.path_dict:
+            command += ["--path_dict", f"{args.file}.path.dict"]
         os.system(" ".join(command))
     elif args.dir is not None:
-        subdirs = get_immediate_subdirectories(args.dir)
-        to_extract = subdirs
-        if sys.getsizeof(subdirs) == 0:
+        to_extract = list(get_immediate_subdirectories(args.dir))
+        if len(to_extract) == 0:
             to_extract = [args.dir.rstrip("/")]
         ExtractFeaturesForDirsList(args, to_extract)
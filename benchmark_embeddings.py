@@ -0,0 +1,57 @@
+#!/usr/bin/python
+import time
+import config
+import numpy as np
+import tensorflow as tf
+
+from argparse import ArgumentParser
+from benchmark_sampled_softmax import synthetic_dataset
+from net import code2vec
+
+
+def variables_megabytes(variables) -> float:
+    return sum(np.prod(variable.shape) * variable.dtype.size for variable in variables) / 2 ** 20
+
+
+def benchmark(args, lazy_adam: bool, path_embedding_rows: int = 0, path_hash_buckets: int = 0) -> str:
+    tf.random.set_seed(42)
+    model = code2vec(token_vocab_size=args.token_vocab_size,
+                     target_vocab_size=args.target_vocab_size,
+                     path_vocab_size=args.path_vocab_size,
+                     custom_metrics=[],
+                     lazy_adam=lazy_adam,
+                     path_embedding_rows=path_embedding_rows,
+                     path_hash_buckets=path_hash_buckets)
+    model.build_model()
+    dataset = synthetic_dataset(args.token_vocab_size, args.path_vocab_size, args.target_vocab_size,
+                                args.batch_size, model.max_contexts)
+    # First steps trace train function and create optimizer slots.
+    model.train_model.fit(dataset, epochs=1, steps_per_epoch=args.warmup_steps, verbose=0)
+    start = time.perf_counter()
+    model.train_model.fit(dataset, epochs=1, steps_per_epoch=args.steps, verbose=0)
+    steps_per_second = args.steps / (time.perf_counter() - start)
+    return (f"weights {variables_megabytes(model.model.weights):8.1f} MB, "
+            f"optimizer {variables_megabytes(model.train_model.optimizer.weights):8.1f} MB, "
+            f"{steps_per_second:6.1f} steps/sec")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Compares memory and step time of Adam, LazyAdam and capped paths embedding")
+    parser.add_argument("--steps", dest="steps", type=int, default=100)
+    parser.add_argument("--warmup_steps", dest="warmup_steps", type=int, default=5)
+    parser.add_argument("--batch_size", dest="batch_size", type=int, default=config.config.BATCH_SIZE)
+    parser.add_argument("--token_vocab_size", dest="token_vocab_size", type=int,
+                        default=config.config.VEC_NET_TOKEN_SIZE)
+    parser.add_argument("--path_vocab_size", dest="path_vocab_size", type=int,
+                        default=config.config.VEC_NET_PATH_SIZE)
+    parser.add_argument("--target_vocab_size", dest="target_vocab_size", type=int,
+                        default=config.config.VEC_NET_TARGET_SIZE)
+    parser.add_argument("--path_embedding_rows", dest="path_embedding_rows", type=int, default=200000)
+    parser.add_argument("--path_hash_buckets", dest="path_hash_buckets", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"paths vocab {args.path_vocab_size}, batch {args.batch_size}")
+    print("Adam:                 ", benchmark(args, lazy_adam=False))
+    print("LazyAdam:             ", benchmark(args, lazy_adam=True))
+    print("LazyAdam, pruned paths:", benchmark(args, True, args.path_embedding_rows))
+    print("LazyAdam, hashed paths:", benchmark(args, True, args.path_embedding_rows, args.path_hash_buckets))
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+import os
+import random
+import tempfile
+import config
+
+from argparse import ArgumentParser
+from net_type import NetType
+from preprocess import create_csv_line, save_dictionaries
+from profiling import measure_throughput
+
+
+def synthetic_data(directory: str, methods: int, max_contexts: int, tokens: int = 1000, paths: int = 20000,
+                   targets: int = 1000) -> str:
+    """Writes csv of random methods and frequency dicts of their words to directory, returns path of csv"""
+    rng = random.Random(42)
+    csv_path = os.path.join(directory, "synthetic.csv")
+    with open(csv_path, "w") as file:
+        for _ in range(methods):
+            contexts = [f"t{rng.randrange(tokens)},{rng.randrange(paths)},t{rng.randrange(tokens)}"
+                        for _ in range(rng.randint(1, max_contexts))]
+            file.write(create_csv_line(f"name|{rng.randrange(targets)}", contexts, max_contexts) + "\n")
+    save_dictionaries({str(path): 1 for path in range(paths)},
+                      {f"name|{target}": 1 for target in range(targets)},
+                      {f"t{token}": 1 for token in range(tokens)},
+                      os.path.join(directory, "synthetic"))
+    return csv_path
+
+
+def examples_per_second(csv_path: str, net: NetType, parse_batch_size: int, num_parallel_batches: int,
+                        cache) -> float:
+    """Examples per second of the second epoch of training dataset, when the first one filled the cache"""
+    from path_context_reader import PathContextReader
+    from vocabulary import Code2VecVocabs
+
+    config.config.READER_PARSE_BATCH_SIZE = parse_batch_size
+    config.config.READER_NUM_PARALLEL_BATCHES = num_parallel_batches
+    config.config.READER_CACHE = cache
+    reader = PathContextReader(vocabs=Code2VecVocabs(net), csv_path=csv_path, is_train=True)
+    dataset = reader.get_dataset()
+    measure_throughput(dataset, max_elements=2 ** 62)
+    return measure_throughput(dataset, max_elements=2 ** 62)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Compares examples per second of PathContextReader with and without "
+                                        "batched parsing, parallel batches and cache of parsed examples")
+    parser.add_argument("--net", dest="net", help="net destination type var or vec", default="vec")
+    parser.add_argument("--data", dest="data", help="csv generated by preprocess, synthetic one if not given",
+                        required=False)
+    parser.add_argument("--methods", dest="methods", type=int, help="methods in synthetic csv", default=20000)
+    parser.add_argument("--batch_size", dest="batch_size", type=int, default=config.config.BATCH_SIZE)
+    parser.add_argument("--parse_batch_size", dest="parse_batch_size", type=int,
+                        default=config.config.READER_PARSE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    config.config.BATCH_SIZE = args.batch_size
+    config.config.NUM_TRAIN_EPOCHS = 1
+    config.config.VALIDATION_SIZE = 0
+    config.config.TEST_SIZE = 0
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = args.data
+        if csv_path is None:
+            csv_path = synthetic_data(directory, args.methods, config.config.MAX_CONTEXTS)
+            config.config.CREATE_VOCAB = True
+            config.config.VEC_TRAINING_FREQ_DICTS_PATH = os.path.join(directory, "synthetic.c2v.dict")
+            config.config.VAR_TRAINING_FREQ_DICTS_PATH = config.config.VEC_TRAINING_FREQ_DICTS_PATH
+        net = NetType(args.net)
+        results = {
+            "line by line, serial": examples_per_second(csv_path, net, 1, 1, None),
+            "batched, serial": examples_per_second(csv_path, net, args.parse_batch_size, 1, None),
+            "batched, autotune": examples_per_second(csv_path, net, args.parse_batch_size, -1, None),
+            "batched, autotune, cache": examples_per_second(csv_path, net, args.parse_batch_size, -1, ""),
+        }
+    for name, value in results.items():
+        print(f"{name:>26}: {value:10.0f} examples/sec")
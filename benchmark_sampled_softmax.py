@@ -0,0 +1,58 @@
+#!/usr/bin/python
+import time
+import config
+import numpy as np
+import tensorflow as tf
+
+from argparse import ArgumentParser
+from net import code2vec
+
+
+def synthetic_dataset(token_vocab_size: int, path_vocab_size: int, target_vocab_size: int,
+                      batch_size: int, max_contexts: int) -> tf.data.Dataset:
+    """Endless dataset of random contexts with the same shapes as PathContextReader gives"""
+    rng = np.random.default_rng(42)
+    batches = 16
+    tokens = rng.integers(0, token_vocab_size, (batches * batch_size, 2, max_contexts), dtype=np.int32)
+    paths = rng.integers(0, path_vocab_size, (batches * batch_size, max_contexts), dtype=np.int32)
+    # Zipf-like targets, as in real data
+    targets = np.minimum(rng.zipf(1.3, batches * batch_size), target_vocab_size) - 1
+    dataset = tf.data.Dataset.from_tensor_slices(((tokens[:, 0], paths, tokens[:, 1]), targets.astype(np.int32)))
+    return dataset.batch(batch_size, drop_remainder=True).cache().repeat()
+
+
+def steps_per_second(num_sampled: int, args) -> float:
+    tf.random.set_seed(42)
+    model = code2vec(token_vocab_size=args.token_vocab_size,
+                     target_vocab_size=args.target_vocab_size,
+                     path_vocab_size=args.path_vocab_size,
+                     custom_metrics=[],
+                     num_sampled_targets=num_sampled)
+    model.build_model()
+    dataset = synthetic_dataset(args.token_vocab_size, args.path_vocab_size, args.target_vocab_size,
+                                args.batch_size, model.max_contexts)
+    # First steps trace and compile train function.
+    model.train_model.fit(dataset, epochs=1, steps_per_epoch=args.warmup_steps, verbose=0)
+    start = time.perf_counter()
+    model.train_model.fit(dataset, epochs=1, steps_per_epoch=args.steps, verbose=0)
+    return args.steps / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Compares training speed of full softmax and sampled softmax over targets")
+    parser.add_argument("--steps", dest="steps", type=int, default=200)
+    parser.add_argument("--warmup_steps", dest="warmup_steps", type=int, default=10)
+    parser.add_argument("--batch_size", dest="batch_size", type=int, default=config.config.BATCH_SIZE)
+    parser.add_argument("--num_sampled", dest="num_sampled", type=int, default=1024)
+    parser.add_argument("--token_vocab_size", dest="token_vocab_size", type=int,
+                        default=config.config.VEC_NET_TOKEN_SIZE)
+    parser.add_argument("--path_vocab_size", dest="path_vocab_size", type=int, default=100000)
+    parser.add_argument("--target_vocab_size", dest="target_vocab_size", type=int,
+                        default=config.config.TARGET_VOCAB_SIZE)
+    args = parser.parse_args()
+
+    full = steps_per_second(0, args)
+    sampled = steps_per_second(args.num_sampled, args)
+    print(f"target vocab {args.target_vocab_size}, batch {args.batch_size}")
+    print(f"full softmax:    {full:.1f} steps/sec")
+    print(f"sampled softmax: {sampled:.1f} steps/sec ({args.num_sampled} sampled, x{sampled / full:.2f})")
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from argparse import ArgumentParser
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Commands which must start without heavy modules, they are imported only by code paths that need them.
+LIGHT_COMMANDS = {
+    "code2var.py --help": ["code2var.py", "--help"],
+    "preprocess.py --help": ["preprocess.py", "--help"],
+    "prediction_server.py --help": ["prediction_server.py", "--help"],
+    "import vocabulary": ["-c", "import vocabulary"],
+}
+HEAVY_MODULES = ("tensorflow", "keras", "pandas")
+
+
+def import_times(command: List[str]) -> Dict[str, int]:
+    """Runs python -X importtime with command, returns cumulative import time in microseconds of every module"""
+    result = subprocess.run([sys.executable, "-X", "importtime", *command], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$", line)
+        if match:
+            times[match.group(2)] = int(match.group(1))
+    return times
+
+
+def heavy_imports(command: List[str]) -> List[str]:
+    """Heavy modules imported by command"""
+    return [module for module in import_times(command) if module.split(".")[0] in HEAVY_MODULES]
+
+
+def startup_seconds(command: List[str], repeats: int) -> float:
+    """Median wall time of command"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *command], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measures startup time of commands which must not import heavy modules")
+    parser.add_argument("--repeats", dest="repeats", type=int, default=5)
+    parser.add_argument("--max_seconds",
+                        dest="max_seconds",
+                        type=float,
+                        help="exit with code 1 if any command starts longer or imports heavy modules",
+                        required=False,
+                        default=None)
+    parser.add_argument("--top", dest="top", type=int, help="number of the slowest imports shown", default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for name, command in LIGHT_COMMANDS.items():
+        seconds = startup_seconds(command, args.repeats)
+        heavy = heavy_imports(command)
+        print(f"{name:>28}: {seconds:6.3f} s" + (f", imports {', '.join(heavy[:3])}" if heavy else ""))
+        top_level = {module: micros for module, micros in import_times(command).items() if "." not in module}
+        for module, micros in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"{'':>30}{module}: {micros / 1000:.1f} ms")
+        if args.max_seconds is not None and (seconds > args.max_seconds or heavy):
+            failed = True
+    sys.exit(1 if failed else 0)
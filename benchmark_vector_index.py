@@ -0,0 +1,55 @@
+#!/usr/bin/python
+import time
+import numpy as np
+
+from argparse import ArgumentParser
+from code_vectors import BruteForceIndex, IVFIndex, load_code_vectors
+
+
+def clustered_vectors(count: int, dim: int, clusters: int, seed: int = 42) -> np.ndarray:
+    """Synthetic vectors grouped around clusters centers, as code vectors of similar methods are"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)]
+    return vectors + 1.5 * rng.normal(size=(count, dim)).astype(np.float32)
+
+
+def recall(found_ids: np.ndarray, true_ids: np.ndarray) -> float:
+    return np.mean([len(set(found) & set(true)) / len(true) for found, true in zip(found_ids, true_ids)])
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measures recall and latency of IVF index against brute force search")
+    parser.add_argument("--vectors", dest="vectors", help="prefix of exported code vectors, synthetic if not set")
+    parser.add_argument("--count", dest="count", type=int, default=200000)
+    parser.add_argument("--dim", dest="dim", type=int, default=300)
+    parser.add_argument("--queries", dest="queries", type=int, default=200)
+    parser.add_argument("--lists", dest="lists", type=int, default=1024)
+    parser.add_argument("-k", dest="k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.vectors is not None:
+        vectors, _ = load_code_vectors(args.vectors)
+    else:
+        vectors = clustered_vectors(args.count, args.dim, clusters=args.count // 100)
+    rng = np.random.default_rng(0)
+    queries = np.asarray(vectors[rng.choice(len(vectors), args.queries, replace=False)], np.float32)
+    queries += 0.1 * rng.normal(size=queries.shape).astype(np.float32)
+
+    brute_force = BruteForceIndex(vectors)
+    start = time.perf_counter()
+    true_ids, _ = brute_force.search(queries, args.k)
+    brute_force_ms = 1000 * (time.perf_counter() - start) / len(queries)
+    print(f"{len(vectors)} vectors of dim {vectors.shape[1]}, {len(queries)} queries, recall@{args.k}")
+    print(f"brute force:       recall 1.0000, {brute_force_ms:8.3f} ms/query")
+
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors, args.lists)
+    print(f"IVF with {len(index.centroids)} lists built in {time.perf_counter() - start:.1f}s")
+    n_probe = 1
+    while n_probe <= len(index.centroids):
+        start = time.perf_counter()
+        found_ids, _ = index.search(queries, args.k, n_probe)
+        latency = 1000 * (time.perf_counter() - start) / len(queries)
+        print(f"IVF n_probe {n_probe:4d}:  recall {recall(found_ids, true_ids):.4f}, {latency:8.3f} ms/query")
+        n_probe *= 4
@@ -0,0 +1,271 @@
+import os
+import re
+import threading
+import config
+import tensorflow as tf
+
+from typing import Dict, List, Optional
+
+
+def _variable_key(variable: tf.Variable, scope: str = "") -> str:
+    """
+    Name of variable usable as checkpoint key, e.g. paths_embed_embeddings for paths_embed/embeddings:0.
+    Scope is cut from the name, as it differs between instances of the same optimizer, e.g. adam/ and adam_1/.
+    """
+    name = (getattr(variable, "path", None) or variable.name).split(":")[0]
+    if scope and name.startswith(scope + "/"):
+        name = name[len(scope) + 1:]
+    return re.sub(r"\W", "_", name)
+
+
+def _optimizer_variables(optimizer) -> List[tf.Variable]:
+    variables = optimizer.variables
+    return list(variables() if callable(variables) else variables)
+
+
+def create_optimizer_weights(optimizer, variables: List[tf.Variable]):
+    """Creates optimizer slots before the first step, so they can be restored"""
+    if hasattr(optimizer, "_create_all_weights"):
+        optimizer._create_all_weights(variables)
+    else:
+        optimizer.build(variables)
+
+
+def tracked_variables(model: tf.keras.Model, optimizer=None) -> Dict[str, tf.Variable]:
+    """Weights of model and, if optimizer is given, its iterations and slots keyed by their names"""
+    keyed = {}
+    variables = [(_variable_key(variable), variable) for variable in model.weights]
+    if optimizer is not None:
+        scope = getattr(optimizer, "name", None) or getattr(optimizer, "_name", "")
+        variables += [("optimizer_" + _variable_key(variable, scope), variable)
+                      for variable in _optimizer_variables(optimizer)]
+    for key, variable in variables:
+        if key in keyed and keyed[key] is not variable:
+            raise ValueError(f"Two variables have the same checkpoint key {key}")
+        keyed[key] = variable
+    return keyed
+
+
+def _value_name(key: str) -> str:
+    return f"variables/{key}/.ATTRIBUTES/VARIABLE_VALUE"
+
+
+def _rows_name(key: str) -> str:
+    return f"rows/{key}/.ATTRIBUTES/VARIABLE_VALUE"
+
+
+def _checkpoint_options() -> tf.train.CheckpointOptions:
+    """Splits checkpoint files to shards of at most CHECKPOINT_SHARD_BYTES if TensorFlow can do it"""
+    policy = getattr(tf.train.experimental, "MaxShardSizePolicy", None)
+    if policy is None or config.config.CHECKPOINT_SHARD_BYTES <= 0:
+        return tf.train.CheckpointOptions()
+    return tf.train.CheckpointOptions(experimental_sharding_callback=policy(config.config.CHECKPOINT_SHARD_BYTES))
+
+
+def _deltas_of(checkpoint_prefix: str) -> List[str]:
+    """Prefixes of deltas saved on top of full checkpoint, in order of saving"""
+    return sorted(path[:-len(".index")] for path in tf.io.gfile.glob(f"{checkpoint_prefix}.delta-*.index"))
+
+
+def _epoch_of(prefix: str) -> int:
+    return int(re.search(r"(\d+)$", prefix).group(1))
+
+
+class AsyncCheckpoint(tf.keras.callbacks.Callback):
+    """
+    Saves weights and optimizer state of trained model to tf.train.Checkpoint in directory at the end of epochs.
+    Training thread only copies variables to host memory, checkpoint is written by background thread while the next
+    epoch goes on. CheckpointManager keeps max_to_keep checkpoints: the most recent ones or, if monitor is given,
+    the best ones, as checkpoint is saved only when monitored value improves.
+
+    With incremental saving only rows of embeddings (variables with at least CHECKPOINT_DELTA_MIN_ROWS rows)
+    changed since the previous save are written as delta on top of the last full checkpoint, the rest of variables
+    are written whole. Full checkpoint is saved every full_every saves or when more than half of rows changed.
+    It pays off with LazyAdam only, Adam moves all rows of embeddings every step. See restore_latest.
+
+    Copies cost host memory of all weights and optimizer slots, with Adam about 3x size of weights, kept for
+    the whole training. Full checkpoint copies all of them on training thread, delta only changed rows of embeddings
+    and variables smaller than CHECKPOINT_DELTA_MIN_ROWS rows.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 max_to_keep: int = config.config.CHECKPOINTS_TO_KEEP,
+                 monitor: Optional[str] = None,
+                 incremental: bool = config.config.CHECKPOINT_INCREMENTAL_EMBEDDINGS,
+                 full_every: int = config.config.CHECKPOINT_FULL_EVERY,
+                 weights_path: Optional[str] = None):
+        """
+        weights_path - weights of the latest saved checkpoint are saved there at the end of training for load_net,
+        model gets them too if the last epoch was not saved
+        """
+        super(AsyncCheckpoint, self).__init__()
+        self.directory = directory
+        self.max_to_keep = max_to_keep
+        self.monitor = monitor
+        self.incremental = incremental
+        self.full_every = full_every
+        self.weights_path = weights_path
+        self.best: Optional[float] = None
+        self.epoch = 0
+        self.saved_epoch = 0
+        self.shadow: Dict[str, tf.Variable] = {}
+        self.manager: Optional[tf.train.CheckpointManager] = None
+        self.base: Optional[str] = None
+        self.saves_since_full = 0
+        self.thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+        self.options = _checkpoint_options()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.epoch = epoch + 1
+        if self._improved(logs):
+            self.save(epoch + 1)
+
+    def on_train_end(self, logs=None):
+        self.wait()
+        if self.weights_path is not None and self.saved_epoch > 0:
+            if self.saved_epoch != self.epoch:
+                restore_latest(self.directory, self.model)
+            self.model.save_weights(self.weights_path)
+            print(f"Weights of epoch {self.saved_epoch} saved to {self.weights_path}")
+
+    def _improved(self, logs) -> bool:
+        if self.monitor is None:
+            return True
+        value = (logs or {}).get(self.monitor)
+        if value is None:
+            if self.saved_epoch == 0:
+                print(f"{self.monitor} is not in logs, checkpoints are saved without comparison")
+            return True
+        sign = -1 if "loss" in self.monitor else 1
+        if self.best is not None and sign * value <= sign * self.best:
+            return False
+        self.best = value
+        return True
+
+    def save(self, epoch: int):
+        """Copies variables to host memory and starts writing them. Waits for the previous checkpoint if needed"""
+        self.wait()
+        variables = tracked_variables(self.model, self.model.optimizer)
+        if not self.shadow:
+            self._create_shadow(variables)
+            self.manager = tf.train.CheckpointManager(tf.train.Checkpoint(variables=self.shadow), self.directory,
+                                                      max_to_keep=self.max_to_keep, checkpoint_name="ckpt")
+        rows = None
+        if self.incremental and self.base is not None and self.saves_since_full + 1 < self.full_every:
+            rows = self._changed_rows(variables)
+        if rows is None:
+            for key, variable in variables.items():
+                self.shadow[key].assign(variable)
+            self.base = os.path.join(self.directory, f"ckpt-{epoch}")
+            self.saves_since_full = 0
+            target, args = self._write_full, (epoch,)
+        else:
+            delta = {}
+            for key, variable in variables.items():
+                if key in rows:
+                    values = tf.gather(variable, rows[key])
+                    self.shadow[key].scatter_update(tf.IndexedSlices(values, rows[key]))
+                    with tf.device("CPU:0"):
+                        delta[key] = tf.Variable(values, trainable=False)
+                else:
+                    self.shadow[key].assign(variable)
+                    delta[key] = self.shadow[key]
+            with tf.device("CPU:0"):
+                rows = {key: tf.Variable(indices, trainable=False) for key, indices in rows.items()}
+            self.saves_since_full += 1
+            target, args = self._write_delta, (f"{self.base}.delta-{epoch:06d}", delta, rows)
+        self.saved_epoch = epoch
+        self.thread = threading.Thread(target=self._run, args=(target, *args), daemon=True)
+        self.thread.start()
+
+    def _create_shadow(self, variables: Dict[str, tf.Variable]):
+        """
+        Creates host copies of variables in another thread. Strategy scope of fit is thread-local, in it copies would
+        be mirrored and initialized by all workers, while in multi-worker training only chief saves checkpoints.
+        """
+
+        def create():
+            with tf.device("CPU:0"):
+                self.shadow = {key: tf.Variable(tf.zeros(variable.shape, variable.dtype), trainable=False)
+                               for key, variable in variables.items()}
+
+        thread = threading.Thread(target=self._run, args=(create,))
+        thread.start()
+        thread.join()
+        self.wait()
+        size = sum(variable.shape.num_elements() * variable.dtype.size for variable in self.shadow.values())
+        print(f"Checkpoint copies of {len(self.shadow)} variables take {size / 2 ** 20:.1f} MiB of host memory")
+
+    def _changed_rows(self, variables: Dict[str, tf.Variable]) -> Optional[Dict[str, tf.Tensor]]:
+        """Indices of rows of embeddings changed since the previous save, None if full checkpoint is better"""
+        rows = {}
+        for key, variable in variables.items():
+            shadow = self.shadow[key]
+            if shadow.shape.rank < 2 or shadow.shape[0] < config.config.CHECKPOINT_DELTA_MIN_ROWS:
+                continue
+            with tf.device(shadow.device):
+                changed = tf.not_equal(tf.reshape(tf.convert_to_tensor(variable), [shadow.shape[0], -1]),
+                                       tf.reshape(shadow, [shadow.shape[0], -1]))
+                rows[key] = tf.where(tf.reduce_any(changed, axis=1))[:, 0]
+            if 2 * rows[key].shape[0] > shadow.shape[0]:
+                return None
+        return rows
+
+    def _run(self, target, *args):
+        try:
+            target(*args)
+        except BaseException as error:
+            self.error = error
+
+    def _write_full(self, epoch: int):
+        before = set(self.manager.checkpoints)
+        self.manager.save(checkpoint_number=epoch, options=self.options)
+        # Deltas are useless without their full checkpoint.
+        for removed in before - set(self.manager.checkpoints):
+            for delta in _deltas_of(removed):
+                for path in tf.io.gfile.glob(f"{delta}.*"):
+                    tf.io.gfile.remove(path)
+
+    def _write_delta(self, prefix: str, delta: Dict[str, tf.Variable], rows: Dict[str, tf.Variable]):
+        tf.train.Checkpoint(variables=delta, rows=rows).write(prefix, options=self.options)
+
+    def wait(self):
+        """Waits until checkpoint being written is written, raises error of writing if any"""
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+
+def restore_latest(directory: str, model: tf.keras.Model, optimizer=None) -> int:
+    """
+    Restores the latest checkpoint saved by AsyncCheckpoint to model and optimizer, deltas saved on top of it
+    are applied in order of saving. Returns epoch of restored checkpoint, 0 if there is no checkpoint in directory.
+    """
+    latest = tf.train.latest_checkpoint(directory)
+    if latest is None:
+        return 0
+    if optimizer is not None:
+        create_optimizer_weights(optimizer, model.trainable_variables)
+    variables = tracked_variables(model, optimizer)
+    tf.train.Checkpoint(variables=variables).restore(latest).expect_partial().assert_existing_objects_matched()
+    deltas = _deltas_of(latest)
+    for delta in deltas:
+        reader = tf.train.load_checkpoint(delta)
+        for key, variable in variables.items():
+            if not reader.has_tensor(_value_name(key)):
+                continue
+            values = reader.get_tensor(_value_name(key))
+            if reader.has_tensor(_rows_name(key)):
+                rows = reader.get_tensor(_rows_name(key))
+                variable.assign(tf.tensor_scatter_nd_update(tf.convert_to_tensor(variable), rows[:, None], values))
+            else:
+                variable.assign(values)
+    epoch = _epoch_of(deltas[-1] if deltas else latest)
+    print(f"Restored {latest} with {len(deltas)} deltas, epoch {epoch}")
+    return epoch
+
@@ -1,209 +1,27 @@
-import csv
-import config
-import numpy as np
+import importlib.util
 import os
-import tensorflow as tf
+import config
 
-from abc import ABC
 from argparse import ArgumentParser
-from tensorflow.python.framework import config as tf_config
-from tensorflow.python.keras.utils import tf_utils, metrics_utils
-from typing import List, Optional, Callable
-from path_context_reader import PathContextReader
-from preprocess import NetType
-from vocabulary import Code2VecVocabs
-from functools import reduce
-
-
-class Precision(tf.metrics.Metric):
-    FilterType = Callable[[tf.Tensor, tf.Tensor], tf.Tensor]
-
-    def __init__(self,
-                 index_to_word_table: Optional[tf.lookup.StaticHashTable] = None,
-                 topk_predicted_words=None,
-                 predicted_words_filters: Optional[List[FilterType]] = None,
-                 subtokens_delimiter: str = '|', name=None, dtype=None):
-        super(Precision, self).__init__(name=name, dtype=dtype)
-        self.true = self.add_weight('true', shape=(), initializer=tf.zeros_initializer)
-        self.total = self.add_weight('total', shape=(), initializer=tf.zeros_initializer)
-        self.index_to_word_table = index_to_word_table
-        self.topk_predicted_words = topk_predicted_words
-        self.predicted_words_filters = predicted_words_filters
-        self.subtokens_delimiter = subtokens_delimiter
-
-    @tf.function
-    def _get_top_predicted_words(self, predictions, k):
-        return tf.nn.top_k(predictions, k=k, sorted=True).indices
-
-    def update_state(self, true_target_word, predictions, sample_weight=None):
-        """Accumulates true positive, false positive and false negative statistics."""
-        if sample_weight is not None:
-            raise NotImplemented("WordsSubtokenMetricBase with non-None `sample_weight` is not implemented.")
-
-        top_predicted_words = self._get_top_predicted_words(predictions, 5)
-        self.true.assign_add(tf.keras.backend.sum(tf.cast(tf.equal(true_target_word, top_predicted_words), tf.float32)))
-        self.total.assign_add(tf.keras.backend.sum(tf.cast(tf.equal(true_target_word, true_target_word), tf.float32)))
-
-    def result(self):
-        return tf.math.divide_no_nan(self.true, self.total)
-
-    def reset_states(self):
-        for v in self.variables:
-            tf.keras.backend.set_value(v, 0)
-
-
-class GPUEmbedding(tf.keras.layers.Embedding):
-    """Fixes problem with tf.keras.layers.Embedding. Original one does not want to work with GPU in Eager Mode."""
-
-    @tf_utils.shape_type_conversion
-    def build(self, input_shape):
-        self.embeddings = self.add_weight(
-            shape=(self.input_dim, self.output_dim),
-            initializer=self.embeddings_initializer,
-            name="embeddings",
-            regularizer=self.embeddings_regularizer,
-            constraint=self.embeddings_constraint,
-            trainable=True
-        )
-        self.built = True
-
-
-class code2vec(tf.keras.Model, ABC):
-    def __init__(self,
-                 token_vocab_size,
-                 target_vocab_size,
-                 path_vocab_size,
-                 custom_metrics: List,
-                 max_contexts=config.config.MAX_CONTEXTS,
-                 token_embed_dim=config.config.TOKEN_EMBED_DIMENSION,
-                 path_embed_dim=config.config.PATH_EMBED_DIMENSION,
-                 dropout_keep_rate=config.config.DROPOUT_KEEP_RATE):
-        super(code2vec, self).__init__()
-        self.max_contexts: int = max_contexts
-        self.token_vocab_size: int = token_vocab_size
-        self.target_vocab_size: int = target_vocab_size
-        self.path_vocab_size: int = path_vocab_size
-        self.token_embed_dim: int = token_embed_dim
-        self.path_embed_dim: int = path_embed_dim
-        self.dropout_rate: float = 1 - dropout_keep_rate
-        self.code_embed_dim: int = 2 * self.token_embed_dim + self.path_embed_dim
-        self.custom_metrics = custom_metrics
-        self.history = None
-        self.model = None  # TODO (RKulagin): look at tf github and check, how they store models
-        self.vector_model = None
+from net_type import NetType
 
-    def build_model(self, **kwargs):
-        if self.model is None:
-            input_source_token_embed = tf.keras.Input(shape=(self.max_contexts,), name="input_source_token")
-            input_target_token_embed = tf.keras.Input(shape=(self.max_contexts,), name="input_target_token")
-            token_embed = GPUEmbedding(input_dim=self.token_vocab_size,
-                                       output_dim=self.token_embed_dim,
-                                       embeddings_initializer='uniform',
-                                       dtype=tf.float32,
-                                       name="token_embed")
-            token_source_embed_model = tf.keras.Sequential([input_source_token_embed, token_embed])
-            token_target_embed_model = tf.keras.Sequential([input_target_token_embed, token_embed])
-            input_paths_embed = tf.keras.Input(shape=(self.max_contexts,), name="input_paths")
-            paths_embed = GPUEmbedding(input_dim=self.path_vocab_size,
-                                       output_dim=self.path_embed_dim,
-                                       dtype=tf.float32,
-                                       embeddings_initializer='uniform',
-                                       name="paths_embed")
-            path_embed_model = tf.keras.Sequential([input_paths_embed, paths_embed])
-            concatenated_embeds = tf.keras.layers.Concatenate(name="concatenated_embeds")(
-                [token_source_embed_model.output, path_embed_model.output, token_target_embed_model.output])
 
-            dropped_embeds = tf.keras.layers.Dropout(self.dropout_rate)(concatenated_embeds)
-            flatten_embeds = tf.keras.layers.Reshape((-1, self.code_embed_dim), name="flatten_embeds")(dropped_embeds)
-            combined_context_vector = tf.keras.layers.Dense(self.code_embed_dim, activation='sigmoid',
-                                                            name="combined_context_vector")(flatten_embeds)
-            context_weights = tf.keras.layers.Dense(1, activation='softmax', name="context_weights")(
-                combined_context_vector)
-            attention_weights = tf.keras.layers.Reshape((-1, self.max_contexts, 1), name="attention_weights")(
-                context_weights)
+def __getattr__(name):
+    """
+    Net classes and load_net live in net.py, which imports TensorFlow. They are imported on first use,
+    e.g. by from code2var import load_net, so --help does not wait for TensorFlow.
+    """
+    import net
+    try:
+        return getattr(net, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__} has no attribute {name}") from None
 
-            batched_embed = tf.keras.layers.Reshape((-1, self.max_contexts, self.code_embed_dim),
-                                                    name="batched_embed")(combined_context_vector)
-            code_vectors = tf.keras.layers.Multiply()([batched_embed, attention_weights])
-            code_vectors = tf.keras.backend.squeeze(code_vectors, axis=1)
-            code_vectors = tf.keras.backend.sum(code_vectors, axis=1)
-            dropped_code_vectors = tf.keras.layers.Dropout(self.dropout_rate)(code_vectors)
-            possible_targets = tf.keras.layers.Dense(self.target_vocab_size, activation="softmax",
-                                                     name="possible_targets")(dropped_code_vectors)
 
-            inputs = [token_source_embed_model.input, path_embed_model.input, token_target_embed_model.input]
-            self.model = tf.keras.Model(inputs=inputs, outputs=possible_targets)
-            self.vector_model = tf.keras.Model(inputs=inputs, outputs=code_vectors)
-            self.model.compile(optimizer=tf.keras.optimizers.Adam(), metrics=[Precision()],
-                               loss=tf.keras.losses.SparseCategoricalCrossentropy())
-            # self.vector_model.compile()
-            print(self.model.summary())
-            tf.keras.utils.plot_model(self.model, show_shapes=True)
-
-    @staticmethod
-    def recall(y_true, y_pred):
-        """Recall metric.
-
-        Only computes a batch-wise average of recall.
-
-        Computes the recall, a metric for multi-label classification of
-        how many relevant items are selected.
-        """
-
-        true_positives = tf.keras.backend.sum(tf.keras.backend.round(
-            tf.keras.backend.clip(tf.cast(
-                tf.cast(tf.keras.backend.transpose(y_true), tf.dtypes.int64) == tf.keras.backend.argmax(y_pred, axis=1),
-                tf.dtypes.float32), 0, 1)))
-        possible_positives = tf.keras.backend.sum(tf.keras.backend.round(
-            tf.keras.backend.clip(tf.cast(tf.keras.backend.argmax(y_true, axis=1) == tf.keras.backend.argmax(y_true, axis=1),
-                                          tf.dtypes.float32), 0, 1)))
-        # tf.keras.backend.print_tensor(
-        #     tf.cast(tf.keras.backend.argmax(y_true, axis=1) == tf.keras.backend.argmax(y_pred, axis=1), tf.dtypes.float32))
-        # tf.keras.backend.print_tensor(
-        #
-        #     tf.cast(tf.keras.backend.argmax(y_true, axis=1) == tf.keras.backend.argmax(y_true, axis=1), tf.dtypes.float32))
-        # tf.keras.backend.print_tensor(
-        #     true_positives)
-        # tf.keras.backend.print_tensor(
-        #     possible_positives)
-        # tf.keras.backend.print_tensor(y_true)
-        # tf.keras.backend.print_tensor(tf.keras.backend.argmax(y_true, axis=1))
-        # tf.keras.backend.print_tensor(tf.keras.backend.argmax(y_pred, axis=1))
-        recall = true_positives / (possible_positives + tf.keras.backend.epsilon())
-        return recall
-
-    @staticmethod
-    def f1(y_true, y_pred):
-        return tf.keras.backend.sum(
-            tf.cast(tf.keras.backend.argmax(y_true, axis=1) == tf.keras.backend.argmax(y_pred, axis=1), tf.dtypes.int32))
-
-    def get_vector(self, inputs):
-        return self.vector_model(inputs)
-
-    def train(self,
-              dataset,
-              epochs,
-              callbacks: List[tf.keras.callbacks.Callback],
-              **kwargs):
-        if self.model is None:
-            self.build_model()
-        if tf_config.list_logical_devices('GPU'):
-            with tf.device("/device:GPU:0"):
-                self.history = self.model.fit(dataset, epochs=epochs, callbacks=callbacks, **kwargs)
-
-    def load_weights(self, *args, **kwargs):
-        if self.model is None:
-            self.build_model()
-        self.model.load_weights(*args, **kwargs)
-
-    def evaluate(self,
-                 *args, **kwargs):
-        if self.model is None:
-            self.build_model()
-        self.model.evaluate(*args, **kwargs)
-
-    def __call__(self, *args, **kwargs):
-        return self.model(*args, **kwargs)
+def _profile_steps(value: str):
+    """Parses --profile_steps, profiling.py imports TensorFlow, so it is imported only if the option is given"""
+    from profiling import parse_profile_steps
+    return parse_profile_steps(value)
 
 
 if __name__ == "__main__":
@@ -235,82 +53,227 @@ if __name__ == "__main__":
                         help="Dir for checkpoints",
                         required=False,
                         default="training")
+    parser.add_argument("--keep_checkpoints",
+                        dest="keep_checkpoints",
+                        help="number of the best checkpoints kept in checkpoints dir",
+                        type=int,
+                        required=False,
+                        default=config.config.CHECKPOINTS_TO_KEEP)
+    parser.add_argument("--incremental_checkpoints",
+                        dest="incremental_checkpoints",
+                        type=bool,
+                        help="save only rows of embeddings changed since the previous checkpoint?",
+                        required=False,
+                        default=config.config.CHECKPOINT_INCREMENTAL_EMBEDDINGS)
+    parser.add_argument("--resume",
+                        dest="resume",
+                        type=bool,
+                        help="continue training from the latest checkpoint in checkpoints dir?",
+                        required=False,
+                        default=False)
+    parser.add_argument("--freq_dicts",
+                        dest="freq_dicts",
+                        help="frequency dicts vocabs are created from, path from config of net by default",
+                        required=False,
+                        default=None)
+    parser.add_argument("--epochs",
+                        dest="epochs",
+                        type=int,
+                        required=False,
+                        default=100)
+    parser.add_argument("--steps_per_epoch",
+                        dest="steps_per_epoch",
+                        help="train steps of every epoch, the whole dataset by default",
+                        type=int,
+                        required=False,
+                        default=None)
+    parser.add_argument("--validation_size",
+                        dest="validation_size",
+                        help="number of the first lines of dataset used for validation",
+                        type=int,
+                        required=False,
+                        default=config.config.VALIDATION_SIZE)
     parser.add_argument("--net",
                         dest="net",
                         help="net destination type var or vec",
                         required=False,
                         default="vec")
+    parser.add_argument("--batch_size",
+                        dest="batch_size",
+                        help="batch size used for --run predictions",
+                        type=int,
+                        required=False,
+                        default=config.config.PREDICTION_BATCH_SIZE)
+    parser.add_argument("--num_sampled",
+                        dest="num_sampled",
+                        help="train with sampled softmax over this number of targets, 0 for full softmax",
+                        type=int,
+                        required=False,
+                        default=config.config.NUM_SAMPLED_TARGETS)
+    parser.add_argument("--cache_dir",
+                        dest="cache_dir",
+                        help="Dir with cache of --run predictions, methods with unchanged contexts are not predicted again",
+                        required=False,
+                        default=None)
+    parser.add_argument("--shards_dir",
+                        dest="shards_dir",
+                        help="Dir with binary shards generated by preprocess.py --export_shards, used instead of csv",
+                        required=False,
+                        default=None)
+    parser.add_argument("--reader_cache",
+                        dest="reader_cache",
+                        help="cache parsed training examples in this file, empty string to cache them in memory",
+                        required=False,
+                        default=config.config.READER_CACHE)
+    parser.add_argument("--multi_worker",
+                        dest="multi_worker",
+                        type=bool,
+                        help="train as one of workers described by TF_CONFIG, see train_multi_worker.py",
+                        required=False,
+                        default=False)
+    parser.add_argument("--inter_op_threads",
+                        dest="inter_op_threads",
+                        type=int,
+                        required=False,
+                        default=config.config.CPU_INTER_OP_THREADS)
+    parser.add_argument("--intra_op_threads",
+                        dest="intra_op_threads",
+                        type=int,
+                        required=False,
+                        default=config.config.CPU_INTRA_OP_THREADS)
+    parser.add_argument("--cpu_replicas",
+                        dest="cpu_replicas",
+                        help="split CPU to this number of devices and train model replica on each of them",
+                        type=int,
+                        required=False,
+                        default=config.config.CPU_REPLICAS)
+    parser.add_argument("--xla",
+                        dest="xla",
+                        type=bool,
+                        help="compile with XLA?",
+                        required=False,
+                        default=config.config.USE_XLA)
+    parser.add_argument("--step_time_every",
+                        dest="step_time_every",
+                        help="log step time, examples/sec and input wait every this number of train steps, 0 - never",
+                        type=int,
+                        required=False,
+                        default=config.config.STEP_TIME_LOG_EVERY)
+    parser.add_argument("--profile_steps",
+                        dest="profile_steps",
+                        help="trace train steps start,stop with tf.profiler to ./logs, e.g. 100,110",
+                        type=_profile_steps,
+                        required=False,
+                        default=None)
+    parser.add_argument("--summary",
+                        dest="summary",
+                        type=bool,
+                        help="print summary of built net?",
+                        required=False,
+                        default=config.config.PRINT_NET_SUMMARY)
+    parser.add_argument("--plot_model",
+                        dest="plot_model",
+                        help="save picture of net layers to this path, needs pydot and graphviz",
+                        required=False,
+                        default=config.config.NET_PLOT_PATH)
     args = parser.parse_args()
-
+    config.config.PRINT_NET_SUMMARY = args.summary
+    config.config.NET_PLOT_PATH = args.plot_model
+
+    import tensorflow as tf
+    from checkpoints import AsyncCheckpoint, restore_latest
+    from devices import configure_devices, get_multi_worker_strategy, get_strategy, get_worker_info
+    from net import Predictor, code2vec, load_net, save_weights_info
+    from path_context_reader import PathContextReader
+    from prediction_cache import open_cache
+    from profiling import InputTimer, StepTimeCallback
+    from vocabulary import Code2VecVocabs
+
+    configure_devices(args.inter_op_threads, args.intra_op_threads, args.cpu_replicas, args.xla)
     print("Num GPUs Available: ", len(tf.config.experimental.list_physical_devices('GPU')))
     if args.train:
+        # Multi-worker strategy has to be created before vocab lookup tables.
+        strategy = get_multi_worker_strategy() if args.multi_worker else get_strategy()
+        num_workers, worker_index = get_worker_info()
         print(f"dataset/{args.dataset_name}/{args.dataset_name}.{args.net}.csv")
-        c2v_vocabs = Code2VecVocabs(net=NetType(args.net))
+        c2v_vocabs = Code2VecVocabs(net=NetType(args.net), freq_dicts_path=args.freq_dicts)
+        config.config.READER_CACHE = args.reader_cache
+        config.config.VALIDATION_SIZE = args.validation_size
         pcr = PathContextReader(is_train=True, vocabs=c2v_vocabs,
-                                csv_path=f"dataset/{args.dataset_name}/{args.dataset_name}.{args.net}.csv")
+                                csv_path=f"dataset/{args.dataset_name}/{args.dataset_name}.{args.net}.csv",
+                                shards_dir=args.shards_dir,
+                                num_workers=num_workers,
+                                worker_index=worker_index)
         dataset = pcr.get_dataset()
         val_dataset, test_dataset = pcr.get_subdatasets()
-        # init lookups
-
-        c2v_vocabs.target_vocab.get_word_to_index_lookup_table()
-        c2v_vocabs.token_vocab.get_word_to_index_lookup_table()
-        c2v_vocabs.path_vocab.get_word_to_index_lookup_table()
 
-        TOKEN_VOCAB_SIZE = c2v_vocabs.token_vocab.lookup_table_word_to_index.size().numpy()
-        TARGET_VOCAB_SIZE = c2v_vocabs.target_vocab.lookup_table_word_to_index.size().numpy()
-        PATH_VOCAB_SIZE = c2v_vocabs.path_vocab.lookup_table_word_to_index.size().numpy()
+        # Sizes are taken from vocabs, so lookup tables are not built when reading binary shards.
+        TOKEN_VOCAB_SIZE = len(c2v_vocabs.token_vocab.word_to_index)
+        TARGET_VOCAB_SIZE = len(c2v_vocabs.target_vocab.word_to_index)
+        PATH_VOCAB_SIZE = len(c2v_vocabs.path_vocab.word_to_index)
         tf.random.set_seed(42)
         model = code2vec(token_vocab_size=TOKEN_VOCAB_SIZE,
                          target_vocab_size=TARGET_VOCAB_SIZE,
                          path_vocab_size=PATH_VOCAB_SIZE,
-                         custom_metrics=["accuracy"])
-
-        checkpoint_path = f"{args.checkpoints_dir}/" + "cp-{epoch:04d}-{loss:.2f}.hdf5"
-        checkpoint_dir = os.path.dirname(checkpoint_path)
-
-        callbacks = [tf.keras.callbacks.ModelCheckpoint(filepath=checkpoint_path,
-                                                        save_weights_only=True,
-                                                        save_best_only=True,
-                                                        monitor='accuracy',
-                                                        verbose=1),
-                     tf.keras.callbacks.TensorBoard(log_dir='./logs'),
-
+                         custom_metrics=[],
+                         num_sampled_targets=args.num_sampled,
+                         strategy=strategy,
+                         index_to_word_table=c2v_vocabs.target_vocab.get_index_to_word_lookup_table())
+
+        initial_epoch = 0
+        if args.resume:
+            model.build_model()
+            # Optimizer slots are created by restore, they have to be mirrored too.
+            with model.strategy.scope():
+                initial_epoch = restore_latest(args.checkpoints_dir, model.train_model, model.train_model.optimizer)
+
+        # Checkpoints are written in background, weights of the best one are saved for load_net when training ends.
+        weights_path = os.path.join(args.checkpoints_dir, "weights.hdf5")
+        callbacks = [AsyncCheckpoint(args.checkpoints_dir,
+                                     max_to_keep=args.keep_checkpoints,
+                                     monitor=model.checkpoint_monitor,
+                                     incremental=args.incremental_checkpoints,
+                                     weights_path=weights_path),
                      tf.keras.callbacks.CSVLogger('training.log')
                      ]
-        model.train(dataset, 100, callbacks, validation_data=val_dataset, validation_freq=3)
+        if importlib.util.find_spec("tensorboard") is not None:
+            callbacks.insert(1, tf.keras.callbacks.TensorBoard(log_dir='./logs', profile_batch=args.profile_steps or 0))
+        else:
+            print("TensorBoard is not installed, training is not logged to ./logs")
+        if worker_index != 0:
+            # Only chief worker writes checkpoints and logs, other workers take part in steps only.
+            callbacks = []
+        elif args.step_time_every > 0:
+            input_timer = InputTimer()
+            dataset = input_timer.wrap(dataset)
+            # The first, so its epoch means are in logs of TensorBoard and CSVLogger.
+            callbacks.insert(0, StepTimeCallback(args.step_time_every, input_timer))
+        model.train(dataset, args.epochs, callbacks, validation_data=val_dataset, validation_freq=3,
+                    initial_epoch=initial_epoch, steps_per_epoch=args.steps_per_epoch)
+        if worker_index == 0 and os.path.exists(weights_path):
+            # load_net refuses weights without it, they could be trained by older net or with other vocabs.
+            save_weights_info(weights_path, c2v_vocabs)
 
     if args.run:
-        tokens_numbers, target_numbers, path_numbers = 0, 0, 0
-        model_path = ""
-        if args.net == "vec":
-            tokens_numbers = config.config.VEC_NET_TOKEN_SIZE
-            target_numbers = config.config.VEC_NET_TARGET_SIZE
-            path_numbers = config.config.VEC_NET_PATH_SIZE
-            model_path = "cp-0006-3.17/cp-0006-3.17.hdf5"
-            # model_path = "training-med-vec-cutted/cp-0010-3.02.hdf5"
-        elif args.net == "var":
-            tokens_numbers = config.config.VAR_NET_TOKEN_SIZE
-            target_numbers = config.config.VAR_NET_TARGET_SIZE
-            path_numbers = config.config.VAR_NET_PATH_SIZE
-            # model_path = "training/cp-0023.hdf5"
-            model_path = "training-sm-var/cp-0002-2.67.hdf5"
-        model = code2vec(token_vocab_size=tokens_numbers,
-                         target_vocab_size=target_numbers,
-                         path_vocab_size=path_numbers,
-                         custom_metrics=[Precision()])
-        # model.load_weights("training-code2var-vec/cp-0002-1.91.hdf5")
-        model.load_weights(model_path)
-
         c2v_vocabs = Code2VecVocabs(NetType(args.net))
+        model = load_net(NetType(args.net), c2v_vocabs)
         pcr = PathContextReader(is_train=False, vocabs=c2v_vocabs,
-                                csv_path=f"tmp_data_for_code2var/data.{args.net}.csv")
-        dataset = pcr.get_dataset()
-        for line, target in dataset:
-            result = model(line)
-            prediction_index = result.numpy().argsort().astype(np.int32)
-            prediction_index = prediction_index[0][:-1 - config.config.NUMBER_OF_PREDICTIONS:-1]
-            prediction = c2v_vocabs.target_vocab.get_index_to_word_lookup_table().lookup(tf.constant(prediction_index))
-            print(target.numpy(), "->", prediction.numpy())
-            with open(f"tmp_data_for_code2var/result.{args.net}.csv", 'a', encoding='utf8') as file:
-                writer = csv.writer(file)
-                writer.writerow(np.concatenate([target.numpy().astype("U"), prediction.numpy().astype('U')]))
+                                csv_path=f"tmp_data_for_code2var/data.{args.net}.csv",
+                                prediction_batch_size=args.batch_size)
+        cache = open_cache(args.cache_dir, NetType(args.net))
+        predictor = Predictor(model, c2v_vocabs, cache=cache)
+        result_path = f"tmp_data_for_code2var/result.{args.net}.csv"
+        if cache is None:
+            predicted = predictor.predict_to_csv(pcr.get_dataset(), result_path)
+        else:
+            # Extractor output combined by preprocess_single_file.sh keeps all contexts of methods, csv has only
+            # MAX_CONTEXTS random ones, so methods with more contexts would get new cache key on every run.
+            data_path = f"tmp_data_for_code2var/data.code2{args.net}"
+            if not os.path.exists(data_path):
+                data_path = f"tmp_data_for_code2var/data.{args.net}.csv"
+            with open(data_path, "r", encoding="utf8") as file:
+                lines = [line for line in file.read().splitlines() if line]
+            predicted = predictor.write_csv(predictor.predict_lines(pcr, lines), result_path)
+            print(f"Took {cache.hits} predictions from cache, {cache.misses} were computed")
+            cache.close()
+        print(f"Predicted names for {predicted} functions")
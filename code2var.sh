@@ -9,15 +9,24 @@ if [ $# -eq 0 ]
 fi
 
 FILE=$1
+# Predictions of unchanged methods are taken from this cache on re-runs
+CACHE_DIR=${CODE2VAR_CACHE_DIR:-.code2var_cache}
 
 mkdir tmp_data_for_code2var/
 cp $FILE tmp_data_for_code2var/file.java
 
-chmod +x preprocess_single_file.sh
-./preprocess_single_file.sh tmp_data_for_code2var/file.java tmp_data_for_code2var
+# Running prediction_server.py keeps nets loaded, so file is sent to it instead of starting nets from scratch.
+# Host and port of server are taken from config.py by both calls.
+if ${PYTHON} prediction_server.py --check
+  then
+    ${PYTHON} prediction_server.py --client_file tmp_data_for_code2var/file.java --output_dir tmp_data_for_code2var
+  else
+    chmod +x preprocess_single_file.sh
+    ./preprocess_single_file.sh tmp_data_for_code2var/file.java tmp_data_for_code2var
 
-${PYTHON} code2var.py --net vec --dataset java-small --run true > tmp_data_for_code2var/code2vec.log
-${PYTHON} code2var.py --net var --dataset java-small --run true > tmp_data_for_code2var/code2var.log
+    ${PYTHON} code2var.py --net vec --dataset java-small --run true --cache_dir ${CACHE_DIR} > tmp_data_for_code2var/code2vec.log
+    ${PYTHON} code2var.py --net var --dataset java-small --run true --cache_dir ${CACHE_DIR} > tmp_data_for_code2var/code2var.log
+fi
 
 java -cp JavaExtractor/JPredict/target/JavaExtractor-0.0.1-SNAPSHOT.jar JavaExtractor.App --file $FILE
 #
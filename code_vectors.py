@@ -0,0 +1,242 @@
+#!/usr/bin/python
+import json
+import config
+import numpy as np
+import tensorflow as tf
+
+from argparse import ArgumentParser
+from typing import List, Optional, Tuple
+
+CHUNK_SIZE = 65536
+
+
+def export_code_vectors(vector_model: tf.keras.Model, dataset: tf.data.Dataset, path: str,
+                        dtype: str = "float32") -> int:
+    """
+    Writes code vectors of all dataset lines to path.vectors as raw row-major matrix, so it can be memory-mapped,
+    and names of lines to path.ids (line i of it is the name of vector i).
+    Args:
+        dataset: batched dataset of PathContextReader with is_train=False.
+        dtype: float32 or float16.
+    Returns:
+        number of written vectors.
+    """
+    from path_context_reader import contexts_signature
+    predict = tf.function(lambda inputs: vector_model(inputs, training=False), input_signature=[contexts_signature()])
+    count = 0
+    # Taken from model, so vectors of empty dataset can be loaded too.
+    dim = vector_model.output_shape[-1]
+    if dim is None:
+        raise ValueError("Code vectors of vector_model have unknown dimension")
+    with open(f"{path}.vectors", "wb") as vectors_file, open(f"{path}.ids", "w", encoding="utf8") as ids_file:
+        for inputs, targets in dataset:
+            vectors = predict(inputs).numpy().astype(dtype)
+            vectors_file.write(vectors.tobytes())
+            ids_file.writelines(target.decode("utf8") + "\n" for target in targets.numpy())
+            count += len(vectors)
+    with open(f"{path}.json", "w") as meta_file:
+        json.dump({"count": count, "dim": dim, "dtype": dtype}, meta_file)
+    return count
+
+
+def load_code_vectors(path: str) -> Tuple[np.memmap, List[str]]:
+    """Opens vectors written by export_code_vectors without reading them to memory and loads their names"""
+    with open(f"{path}.json") as meta_file:
+        meta = json.load(meta_file)
+    if meta["count"] == 0:
+        # Empty file can not be mapped.
+        vectors = np.zeros((0, meta["dim"]), dtype=meta["dtype"])
+    else:
+        vectors = np.memmap(f"{path}.vectors", dtype=meta["dtype"], mode="r", shape=(meta["count"], meta["dim"]))
+    with open(f"{path}.ids", encoding="utf8") as ids_file:
+        names = [line.rstrip("\n") for line in ids_file]
+    return vectors, names
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) > k:
+        best = np.argpartition(-scores, k)[:k]
+        ids, scores = ids[best], scores[best]
+    order = np.argsort(-scores)
+    return ids[order], scores[order]
+
+
+class BruteForceIndex:
+    """Exact cosine nearest neighbours, vectors are scanned by chunks"""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.norms = np.concatenate([np.linalg.norm(np.asarray(vectors[start:start + CHUNK_SIZE], np.float32), axis=1)
+                                     for start in range(0, len(vectors), CHUNK_SIZE)] or [np.zeros(0)])
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns ids and cosine similarities of k nearest vectors for every query, both of shape (queries, k)"""
+        queries = _normalized(queries)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self.vectors), CHUNK_SIZE):
+            chunk = np.asarray(self.vectors[start:start + CHUNK_SIZE], np.float32)
+            scores = queries @ chunk.T / np.maximum(self.norms[start:start + CHUNK_SIZE], 1e-12)
+            best_ids = np.concatenate([best_ids, np.broadcast_to(np.arange(start, start + len(chunk)), scores.shape)],
+                                      axis=1)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            if best_scores.shape[1] > k:
+                best = np.argpartition(-best_scores, k, axis=1)[:, :k]
+                best_ids = np.take_along_axis(best_ids, best, axis=1)
+                best_scores = np.take_along_axis(best_scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_ids, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+class IVFIndex:
+    """
+    Approximate cosine nearest neighbours with inverted file: vectors are clustered by k-means to lists,
+    query scans only vectors of n_probe lists with closest centroids. Vectors stay in given (memory-mapped) matrix,
+    index keeps centroids, norms and ids sorted by lists.
+    """
+
+    def __init__(self, vectors: np.ndarray, centroids: np.ndarray, norms: np.ndarray,
+                 ids: np.ndarray, list_offsets: np.ndarray):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.norms = norms
+        self.ids = ids
+        self.list_offsets = list_offsets
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, lists: int, iterations: int = 10, sample_size: int = 100000,
+              seed: int = 42) -> "IVFIndex":
+        """Clusters sample of vectors with spherical k-means and assigns every vector to the closest centroid"""
+        rng = np.random.default_rng(seed)
+        sample = _normalized(vectors[np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)),
+                                                        replace=False))])
+        lists = min(lists, len(sample))
+        centroids = sample[rng.choice(len(sample), lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=lists) == 0
+            # Empty lists get random vectors, so no centroid is wasted.
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalized(sums)
+
+        assignments = []
+        norms = []
+        for start in range(0, len(vectors), CHUNK_SIZE):
+            chunk = np.asarray(vectors[start:start + CHUNK_SIZE], np.float32)
+            assignments.append(np.argmax(chunk @ centroids.T, axis=1))
+            norms.append(np.linalg.norm(chunk, axis=1))
+        assignment = np.concatenate(assignments)
+        ids = np.argsort(assignment, kind="stable")
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=lists))])
+        return cls(vectors, centroids, np.concatenate(norms), ids, list_offsets)
+
+    def search(self, queries: np.ndarray, k: int, n_probe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns ids and cosine similarities of k nearest vectors found in n_probe lists for every query.
+        If less than k vectors were found, rows are padded with id -1.
+        """
+        queries = _normalized(queries)
+        n_probe = min(n_probe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+        result_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for row, (query, query_probes) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate([self.ids[self.list_offsets[probe]:self.list_offsets[probe + 1]]
+                                         for probe in query_probes])
+            # Sorted ids make reading of memory-mapped vectors sequential.
+            candidates.sort()
+            scores = np.asarray(self.vectors[candidates], np.float32) @ query / np.maximum(self.norms[candidates],
+                                                                                          1e-12)
+            ids, scores = _top_k(scores, candidates, k)
+            result_ids[row, :len(ids)] = ids
+            result_scores[row, :len(scores)] = scores
+        return result_ids, result_scores
+
+    def save(self, path: str):
+        np.savez(path, centroids=self.centroids, norms=self.norms, ids=self.ids, list_offsets=self.list_offsets)
+
+    @classmethod
+    def load(cls, path: str, vectors: np.ndarray) -> "IVFIndex":
+        with np.load(path) as index:
+            return cls(vectors, index["centroids"], index["norms"], index["ids"], index["list_offsets"])
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Exports code vectors of preprocessed csv and searches similar methods")
+    parser.add_argument("--net",
+                        dest="net",
+                        help="net used for vectors: var or vec",
+                        required=False,
+                        default="vec")
+    parser.add_argument("--data",
+                        dest="data",
+                        help="csv generated by preprocess, its code vectors are exported to --output",
+                        required=False)
+    parser.add_argument("--output",
+                        dest="output",
+                        help="prefix of .vectors, .ids and .json files",
+                        required=True)
+    parser.add_argument("--dtype",
+                        dest="dtype",
+                        choices=["float32", "float16"],
+                        default="float32")
+    parser.add_argument("--lists",
+                        dest="lists",
+                        help="build IVF index with this number of lists to --output.ivf.npz",
+                        type=int,
+                        required=False)
+    parser.add_argument("--similar_to",
+                        dest="similar_to",
+                        help="print names of vectors closest to vector with this id",
+                        type=int,
+                        required=False)
+    parser.add_argument("-k",
+                        dest="k",
+                        type=int,
+                        default=config.config.NUMBER_OF_PREDICTIONS)
+    parser.add_argument("--n_probe",
+                        dest="n_probe",
+                        type=int,
+                        default=8)
+    args = parser.parse_args()
+
+    if args.data is not None:
+        from net import load_net
+        from path_context_reader import PathContextReader
+        from net_type import NetType
+        from vocabulary import Code2VecVocabs
+
+        net = NetType(args.net)
+        vocabs = Code2VecVocabs(net)
+        reader = PathContextReader(vocabs=vocabs, csv_path=args.data, is_train=False)
+        exported = export_code_vectors(load_net(net, vocabs).vector_model, reader.get_dataset(), args.output,
+                                       args.dtype)
+        print(f"Exported {exported} code vectors to {args.output}.vectors")
+
+    code_vectors, vector_names = load_code_vectors(args.output)
+    index: Optional[IVFIndex] = None
+    if args.lists is not None:
+        index = IVFIndex.build(code_vectors, args.lists)
+        index.save(f"{args.output}.ivf.npz")
+        print(f"Built IVF index with {len(index.centroids)} lists")
+    if args.similar_to is not None:
+        query = np.asarray(code_vectors[args.similar_to:args.similar_to + 1], np.float32)
+        if index is None:
+            try:
+                index = IVFIndex.load(f"{args.output}.ivf.npz", code_vectors)
+            except FileNotFoundError:
+                pass
+        if index is None:
+            found_ids, found_scores = BruteForceIndex(code_vectors).search(query, args.k)
+        else:
+            found_ids, found_scores = index.search(query, args.k, args.n_probe)
+        for found_id, score in zip(found_ids[0], found_scores[0]):
+            if found_id >= 0:
+                print(f"{score:.4f} {found_id} {vector_names[found_id]}")
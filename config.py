@@ -1,9 +1,19 @@
 class config:
     DEFAULT_MIN_OCCURENCES = 50
     BATCH_SIZE = 10
-    READER_NUM_PARALLEL_BATCHES = 1
+    PREDICTION_BATCH_SIZE = 256
+    EVALUATION_BATCH_SIZE = 256
+    # Number of batches of lines parsed at once, -1 is tf.data.experimental.AUTOTUNE
+    READER_NUM_PARALLEL_BATCHES = -1
+    # Training lines are parsed by batches of this size and then shuffled one by one
+    READER_PARSE_BATCH_SIZE = 1024
+    # Bytes buffered by reader of every csv file or binary shards
+    READER_BUFFER_SIZE = 16 * 2 ** 20
+    # Cache of parsed training examples: None - no cache, "" - in memory, otherwise path of cache files on disk
+    READER_CACHE = None
     NUM_TRAIN_EPOCHS = 2
     SHUFFLE_BUFFER_SIZE = 10000
+    SHARD_SIZE = 100000
     CODE2VEC_VOCABS_PATH = ""
     VEC_TRAINING_FREQ_DICTS_PATH = "dataset/j-med/java-med.vec.c2v.dict"
     VAR_TRAINING_FREQ_DICTS_PATH = "dataset/java-small/java-small.var.c2v.dict"
@@ -12,6 +22,9 @@ class config:
     DEFAULT_STRING_LOOKUP_VALUE = "None"
     MAX_NUMBER_OF_WORDS_IN_FREQ_DICT = 10000000
     MAX_CONTEXTS = 300
+    # Training batches are grouped by number of contexts of methods to buckets split by these boundaries,
+    # so batch is padded only to its longest method. Empty list keeps order of methods
+    CONTEXTS_BUCKET_BOUNDARIES = [16, 32, 64, 128, 200]
     TARGET_VOCAB_SIZE = 35451
     TOKEN_EMBED_DIMENSION = 100
     PATH_EMBED_DIMENSION = 100
@@ -19,11 +32,60 @@ class config:
     VALIDATION_SIZE = 8192
     TEST_SIZE = 0
     NUMBER_OF_PREDICTIONS = 5
+    # 0 lets TensorFlow choose number of threads
+    CPU_INTER_OP_THREADS = 0
+    CPU_INTRA_OP_THREADS = 0
+    # Number of logical CPU devices model is mirrored over in training
+    CPU_REPLICAS = 1
+    USE_XLA = False
+    # Adam updating only rows of embeddings used in batch. Needs OptimizerV2 API of Keras 2 (tf_keras with
+    # TF_USE_LEGACY_KERAS=1), without it net is trained with Adam and warning is printed
+    USE_LAZY_ADAM = True
+    # Max rows of paths embedding, 0 means row for every path in vocab. Most frequent paths keep own rows,
+    # the rest share PATH_EMBEDDING_HASH_BUCKETS rows or are pruned to NOTHING if it is 0
+    PATH_EMBEDDING_ROWS = 0
+    PATH_EMBEDDING_HASH_BUCKETS = 0
+    # Number of targets sampled for sampled softmax in training, 0 means full softmax
+    NUM_SAMPLED_TARGETS = 0
+    # Log step time and input wait every this number of train steps, 0 turns it off
+    STEP_TIME_LOG_EVERY = 0
+    # Diagnostics of built net: summary printed to stdout and picture of its layers saved to path if it is not empty
+    PRINT_NET_SUMMARY = False
+    NET_PLOT_PATH = ""
+    # Training checkpoints kept by checkpoints.AsyncCheckpoint. It keeps host copy of all weights and optimizer slots
+    # (Adam has two per weight, so about 3x size of weights) for the whole training, on top of model itself.
+    # Full checkpoint copies all of them on training thread, delta of incremental one only changed rows of embeddings
+    CHECKPOINTS_TO_KEEP = 3
+    # Save only rows of embeddings changed since the previous checkpoint, every CHECKPOINT_FULL_EVERY one is full.
+    # Variables with less than CHECKPOINT_DELTA_MIN_ROWS rows are always saved whole
+    CHECKPOINT_INCREMENTAL_EMBEDDINGS = False
+    CHECKPOINT_FULL_EVERY = 10
+    CHECKPOINT_DELTA_MIN_ROWS = 10000
+    # Max size of checkpoint data file, 0 - one file. Needs TensorFlow with tf.train.experimental.MaxShardSizePolicy
+    CHECKPOINT_SHARD_BYTES = 512 * 2 ** 20
 
+    EXTRACTOR_JAR_PATH = "JavaExtractor/JPredict/target/JavaExtractor-0.0.1-SNAPSHOT.jar"
+    EXTRACTOR_MAX_PATH_LENGTH = 8
+    EXTRACTOR_MAX_PATH_WIDTH = 2
+    # Extractor writes paths as stable 64-bit FNV-1a hashes and path vocab is keyed by int64 instead of strings.
+    # Data, vocabs and weights made with and without it are not compatible.
+    HASHED_PATHS = False
+    PREDICTION_SERVER_HOST = "localhost"
+    PREDICTION_SERVER_PORT = 8765
+    PREDICTION_CACHE_MEMORY_ENTRIES = 100000
+    PREDICTION_CACHE_MAX_ENTRIES = 5000000
+    PREDICTION_CACHE_CHUNK_SIZE = 4096
+
+    # Weights written by code2var.py --train to {checkpoints_dir}/weights.hdf5, see train.sh. They are loaded only
+    # with weights.hdf5.json written next to them, it tells format version of net and vocabs they were trained with.
+    # Weights trained before NET_FORMAT_VERSION 2 have none and must be retrained. Net sizes are taken from vocabs,
+    # the ones below are used only if vocabs are not given to net.load_net
     VEC_NET_TOKEN_SIZE = 3610
     VEC_NET_PATH_SIZE = 1468667
     VEC_NET_TARGET_SIZE = 3212
+    VEC_NET_WEIGHTS_PATH = "training-vec/weights.hdf5"
 
     VAR_NET_TOKEN_SIZE = 440
     VAR_NET_PATH_SIZE = 312188
     VAR_NET_TARGET_SIZE = 679
+    VAR_NET_WEIGHTS_PATH = "training-var/weights.hdf5"
@@ -0,0 +1,58 @@
+import config
+import json
+import os
+import tensorflow as tf
+
+from typing import Tuple
+
+
+def configure_devices(inter_op_threads: int = config.config.CPU_INTER_OP_THREADS,
+                      intra_op_threads: int = config.config.CPU_INTRA_OP_THREADS,
+                      cpu_replicas: int = config.config.CPU_REPLICAS,
+                      xla: bool = config.config.USE_XLA):
+    """
+    Sets up TensorFlow runtime. Has to be called before any tensor is created.
+    Args:
+        inter_op_threads: threads running independent ops in parallel, 0 lets TensorFlow choose.
+        intra_op_threads: threads used inside one op (matmul, gather, ...), 0 lets TensorFlow choose.
+        cpu_replicas: number of logical CPU devices the physical CPU is split to. Each of them runs its
+            own model replica, so a multi-socket machine is used by several smaller ops instead of one.
+        xla: compile models with XLA.
+    """
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if cpu_replicas > 1:
+        cpu = tf.config.list_physical_devices("CPU")[0]
+        tf.config.set_logical_device_configuration(
+            cpu, [tf.config.LogicalDeviceConfiguration() for _ in range(cpu_replicas)])
+    tf.config.optimizer.set_jit(xla)
+
+
+def get_strategy() -> tf.distribute.Strategy:
+    """
+    Returns strategy models are built and trained with: mirrored over all GPUs if there are any,
+    mirrored over logical CPUs if CPU was split by configure_devices, default one-device strategy otherwise.
+    """
+    gpus = tf.config.list_logical_devices("GPU")
+    if gpus:
+        return tf.distribute.MirroredStrategy([gpu.name for gpu in gpus])
+    cpus = tf.config.list_logical_devices("CPU")
+    if len(cpus) > 1:
+        return tf.distribute.MirroredStrategy([cpu.name for cpu in cpus],
+                                              cross_device_ops=tf.distribute.ReductionToOneDevice())
+    return tf.distribute.get_strategy()
+
+
+def get_multi_worker_strategy() -> tf.distribute.Strategy:
+    """
+    Returns strategy mirroring model over worker processes described by TF_CONFIG environment variable.
+    Has to be created before any other TensorFlow op.
+    """
+    return tf.distribute.experimental.MultiWorkerMirroredStrategy()
+
+
+def get_worker_info() -> Tuple[int, int]:
+    """Returns number of workers and index of this worker from TF_CONFIG, (1, 0) if it is not set"""
+    tf_config = json.loads(os.environ.get("TF_CONFIG", "{}"))
+    workers = tf_config.get("cluster", {}).get("worker", [])
+    return max(1, len(workers)), tf_config.get("task", {}).get("index", 0)
@@ -0,0 +1,177 @@
+#!/usr/bin/python
+import config
+import tensorflow as tf
+
+from argparse import ArgumentParser
+from typing import Dict, List, Optional
+
+
+def top_k_predictions(predictions: tf.Tensor, k: int, number_of_special: int = 1) -> tf.Tensor:
+    """Indices of k most probable targets, special words (NOTHING) are never predicted"""
+    if predictions.shape[-1] is not None:
+        k = min(k, predictions.shape[-1] - number_of_special)
+    return tf.math.top_k(predictions[:, number_of_special:], k=k).indices + number_of_special
+
+
+def _true_targets(y_true: tf.Tensor) -> tf.Tensor:
+    """Targets of batch as vector of indices or strings"""
+    y_true = tf.reshape(y_true, [-1])
+    return y_true if y_true.dtype == tf.string else tf.cast(y_true, tf.int32)
+
+
+class TopKAccuracy(tf.keras.metrics.Metric):
+    """
+    Share of examples which original name is among k most probable predictions. Original names can be given
+    as target indices or as target strings, the latter needs index_to_word_table.
+    """
+
+    def __init__(self, k: int = 1, index_to_word_table: Optional[tf.lookup.StaticHashTable] = None,
+                 name: Optional[str] = None, **kwargs):
+        super(TopKAccuracy, self).__init__(name=name or ("accuracy" if k == 1 else f"top{k}_accuracy"), **kwargs)
+        self.k = k
+        self.index_to_word_table = index_to_word_table
+        self.hits = self.add_weight(name="hits", shape=(), initializer=tf.zeros_initializer)
+        self.total = self.add_weight(name="total", shape=(), initializer=tf.zeros_initializer)
+
+    def update_state(self, y_true, y_pred, sample_weight=None):
+        targets = _true_targets(y_true)
+        predicted = top_k_predictions(y_pred, self.k)
+        if targets.dtype == tf.string:
+            predicted = self.index_to_word_table.lookup(predicted)
+        hits = tf.reduce_any(tf.equal(predicted, targets[:, tf.newaxis]), axis=1)
+        self.hits.assign_add(tf.reduce_sum(tf.cast(hits, self.dtype)))
+        self.total.assign_add(tf.cast(tf.shape(targets)[0], self.dtype))
+
+    def result(self):
+        return tf.math.divide_no_nan(self.hits, self.total)
+
+    def reset_states(self):
+        for variable in self.variables:
+            variable.assign(tf.zeros_like(variable))
+
+
+class SubtokenMetric(tf.keras.metrics.Metric):
+    """
+    Precision, recall or F1 of subtokens of the most probable name against subtokens of original one,
+    e.g. "get|max|value" predicted for "get|value" gives 2 true positives and 1 false positive.
+    Counts are accumulated over all batches, so the result is micro-averaged over corpus.
+    """
+
+    def __init__(self, kind: str, index_to_word_table: tf.lookup.StaticHashTable, subtokens_delimiter: str = "|",
+                 name: Optional[str] = None, **kwargs):
+        if kind not in ("precision", "recall", "f1"):
+            raise ValueError(f"Unknown subtoken metric {kind}")
+        super(SubtokenMetric, self).__init__(name=name or f"subtoken_{kind}", **kwargs)
+        self.kind = kind
+        self.index_to_word_table = index_to_word_table
+        self.subtokens_delimiter = subtokens_delimiter
+        self.true_positives = self.add_weight(name="true_positives", shape=(), initializer=tf.zeros_initializer)
+        self.false_positives = self.add_weight(name="false_positives", shape=(), initializer=tf.zeros_initializer)
+        self.false_negatives = self.add_weight(name="false_negatives", shape=(), initializer=tf.zeros_initializer)
+
+    def update_state(self, y_true, y_pred, sample_weight=None):
+        targets = _true_targets(y_true)
+        if targets.dtype != tf.string:
+            targets = self.index_to_word_table.lookup(targets)
+        predicted = self.index_to_word_table.lookup(top_k_predictions(y_pred, 1)[:, 0])
+
+        true_subtokens = tf.strings.split(targets, self.subtokens_delimiter)
+        predicted_subtokens = tf.strings.split(predicted, self.subtokens_delimiter)
+        true_dense = true_subtokens.to_tensor("")
+        predicted_dense = predicted_subtokens.to_tensor("")
+        true_mask = tf.sequence_mask(true_subtokens.row_lengths(), tf.shape(true_dense)[1])
+        predicted_mask = tf.sequence_mask(predicted_subtokens.row_lengths(), tf.shape(predicted_dense)[1])
+        # [batch, predicted subtoken, true subtoken]
+        equal = tf.logical_and(tf.equal(predicted_dense[:, :, tf.newaxis], true_dense[:, tf.newaxis, :]),
+                               tf.logical_and(predicted_mask[:, :, tf.newaxis], true_mask[:, tf.newaxis, :]))
+
+        true_positives = tf.reduce_sum(tf.cast(tf.reduce_any(equal, axis=2), self.dtype))
+        found_true = tf.reduce_sum(tf.cast(tf.reduce_any(equal, axis=1), self.dtype))
+        self.true_positives.assign_add(true_positives)
+        self.false_positives.assign_add(tf.reduce_sum(tf.cast(predicted_mask, self.dtype)) - true_positives)
+        self.false_negatives.assign_add(tf.reduce_sum(tf.cast(true_mask, self.dtype)) - found_true)
+
+    def result(self):
+        precision = tf.math.divide_no_nan(self.true_positives, self.true_positives + self.false_positives)
+        recall = tf.math.divide_no_nan(self.true_positives, self.true_positives + self.false_negatives)
+        if self.kind == "precision":
+            return precision
+        if self.kind == "recall":
+            return recall
+        return tf.math.divide_no_nan(2 * precision * recall, precision + recall)
+
+    def reset_states(self):
+        for variable in self.variables:
+            variable.assign(tf.zeros_like(variable))
+
+
+def create_metrics(index_to_word_table: Optional[tf.lookup.StaticHashTable] = None,
+                   k: int = config.config.NUMBER_OF_PREDICTIONS) -> List[tf.keras.metrics.Metric]:
+    """Top-1 and top-k accuracy, subtoken precision, recall and F1 if index_to_word_table is given"""
+    metrics = [TopKAccuracy(1, index_to_word_table), TopKAccuracy(k, index_to_word_table)]
+    if index_to_word_table is not None:
+        metrics += [SubtokenMetric(kind, index_to_word_table) for kind in ("precision", "recall", "f1")]
+    return metrics
+
+
+def evaluate(model: tf.keras.Model, dataset: tf.data.Dataset,
+             metrics: List[tf.keras.metrics.Metric]) -> Dict[str, float]:
+    """
+    Streams batched dataset of (inputs, original names) through model and metrics.
+    Original names can be target indices or strings, e.g. from PathContextReader with is_train=False,
+    then names out of target vocab are counted as misses too.
+    """
+
+    # Batches differ in number of contexts and targets can be indices or strings, so shapes are generalized.
+    @tf.function(reduce_retracing=True)
+    def evaluate_batch(inputs, targets):
+        predictions = model(inputs, training=False)
+        for metric in metrics:
+            metric.update_state(targets, predictions)
+
+    for metric in metrics:
+        metric.reset_states()
+    for inputs, targets in dataset:
+        evaluate_batch(inputs, targets)
+    return {metric.name: float(metric.result()) for metric in metrics}
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Evaluates trained net on csv generated by preprocess")
+    parser.add_argument("--net",
+                        dest="net",
+                        help="net to evaluate: var or vec",
+                        required=False,
+                        default="vec")
+    parser.add_argument("--data",
+                        dest="data",
+                        help="test csv generated by preprocess",
+                        required=True)
+    parser.add_argument("--weights",
+                        dest="weights",
+                        help="weights to evaluate instead of ones from config",
+                        required=False)
+    parser.add_argument("--batch_size",
+                        dest="batch_size",
+                        type=int,
+                        required=False,
+                        default=config.config.EVALUATION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from net import check_weights_info, load_net
+    from path_context_reader import PathContextReader
+    from net_type import NetType
+    from vocabulary import Code2VecVocabs
+
+    net = NetType(args.net)
+    vocabs = Code2VecVocabs(net)
+    model = load_net(net, vocabs)
+    if args.weights is not None:
+        check_weights_info(args.weights, vocabs)
+        model.load_weights(args.weights)
+    reader = PathContextReader(vocabs=vocabs, csv_path=args.data, is_train=False,
+                               prediction_batch_size=args.batch_size)
+    results = evaluate(model.model, reader.get_dataset(),
+                       create_metrics(vocabs.target_vocab.get_index_to_word_lookup_table()))
+    for name, value in results.items():
+        print(f"{name}: {value:.4f}")
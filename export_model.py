@@ -0,0 +1,212 @@
+#!/usr/bin/python
+import os
+import time
+import config
+import numpy as np
+import tensorflow as tf
+
+from argparse import ArgumentParser
+from typing import Callable, Iterator, List, Optional, Tuple
+from net import Predictor, code2vec, load_net
+from path_context_reader import PathContextReader
+from net_type import NetType
+from vocabulary import Code2VecVocabs
+
+QUANTIZATIONS = ["none", "float16", "dynamic", "int8"]
+
+
+def _input_specs() -> List[tf.TensorSpec]:
+    """Specs of batched inputs given by PathContextReader, number of contexts differs from batch to batch"""
+    return [tf.TensorSpec([None, None, 1], tf.int32, name=name)
+            for name in ["source_tokens", "paths", "target_tokens"]]
+
+
+def export_saved_model(model: code2vec, path: str):
+    """
+    Writes model and vector_model as SavedModel with signatures:
+        serving_default - target probabilities;
+        code_vectors - vectors of code.
+    """
+    module = tf.Module()
+    module.model = model.model
+    module.vector_model = model.vector_model
+    specs = _input_specs()
+
+    @tf.function(input_signature=specs)
+    def predict(source_tokens, paths, target_tokens):
+        return {"probabilities": module.model([source_tokens, paths, target_tokens], training=False)}
+
+    @tf.function(input_signature=specs)
+    def code_vectors(source_tokens, paths, target_tokens):
+        return {"code_vectors": module.vector_model([source_tokens, paths, target_tokens], training=False)}
+
+    tf.saved_model.save(module, path, signatures={"serving_default": predict, "code_vectors": code_vectors})
+
+
+def export_tflite(saved_model_path: str, path: str, quantization: str = "dynamic",
+                  representative_dataset: Optional[Callable[[], Iterator]] = None):
+    """
+    Converts serving_default signature of SavedModel to TFLite flatbuffer.
+    Args:
+        quantization: none - float32;
+                      float16 - weights are stored in float16;
+                      dynamic - weights of embeddings and dense layers are stored in int8, activations stay float;
+                      int8 - weights and activations are int8, ranges of activations are taken from
+                             representative_dataset. Inputs and outputs stay int32 indices and float probabilities.
+    """
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_path, signature_keys=["serving_default"])
+    if quantization != "none":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        if representative_dataset is None:
+            raise ValueError("int8 quantization needs representative dataset")
+        converter.representative_dataset = representative_dataset
+        # Ops without int8 kernels are left in float.
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+    with open(path, "wb") as file:
+        file.write(converter.convert())
+
+
+def representative_inputs(dataset: tf.data.Dataset, size: int) -> Callable[[], Iterator]:
+    """Returns generator of size single-example inputs from dataset batched by PathContextReader"""
+
+    def generator():
+        for inputs, _ in dataset.unbatch().batch(1).take(size):
+            yield [tensor.numpy() for tensor in inputs]
+
+    return generator
+
+
+class ExportedPredictor:
+    """
+    Predicts top-k names with exported SavedModel dir or .tflite file, no Keras model is built.
+    Yields the same as net.Predictor.
+    """
+
+    def __init__(self, path: str, vocabs: Code2VecVocabs, k: int = config.config.NUMBER_OF_PREDICTIONS):
+        self.index_to_word = vocabs.target_vocab.index_to_word
+        self.number_of_special = vocabs.target_vocab.number_of_special
+        self.k = k
+        if path.endswith(".tflite"):
+            self.interpreter = tf.lite.Interpreter(model_path=path)
+            self.signature = None
+        else:
+            self.interpreter = None
+            self.signature = tf.saved_model.load(path).signatures["serving_default"]
+
+    def _predict_probabilities(self, inputs: List[np.ndarray]) -> np.ndarray:
+        if self.signature is not None:
+            source_tokens, paths, target_tokens = inputs
+            return self.signature(source_tokens=source_tokens, paths=paths,
+                                  target_tokens=target_tokens)["probabilities"].numpy()
+        input_details = self.interpreter.get_input_details()
+        named_inputs = dict(zip(["source_tokens", "paths", "target_tokens"], inputs))
+        for detail in input_details:
+            self.interpreter.resize_tensor_input(detail["index"], named_inputs[self._input_name(detail)].shape)
+        self.interpreter.allocate_tensors()
+        for detail in input_details:
+            self.interpreter.set_tensor(detail["index"], named_inputs[self._input_name(detail)])
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.interpreter.get_output_details()[0]["index"])
+
+    @staticmethod
+    def _input_name(detail) -> str:
+        # TFLite names inputs as "serving_default_paths:0".
+        return next(name for name in ["source_tokens", "target_tokens", "paths"] if name in detail["name"])
+
+    def predict_batch(self, inputs: List[np.ndarray]) -> Tuple[List[List[str]], np.ndarray]:
+        """Returns top-k names and their probabilities for batch, special words are skipped as in top_k_predictions"""
+        probabilities = self._predict_probabilities(inputs)
+        candidates = probabilities[:, self.number_of_special:]
+        k = min(self.k, candidates.shape[1])
+        # Only k best are sorted, not the whole target vocab.
+        top_k = np.argpartition(-candidates, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(candidates, top_k, axis=1), axis=1, kind="stable")
+        top_k = np.take_along_axis(top_k, order, axis=1) + self.number_of_special
+        names = [[self.index_to_word[index] for index in indices] for indices in top_k.tolist()]
+        return names, np.take_along_axis(probabilities, top_k, axis=1)
+
+    def predict(self, dataset: tf.data.Dataset) -> Iterator[Tuple[str, List[str]]]:
+        """Yields original target and predicted names for each line of dataset"""
+        for inputs, targets in dataset:
+            names, _ = self.predict_batch([tensor.numpy() for tensor in inputs])
+            for target, target_names in zip(targets.numpy(), names):
+                yield target.decode("utf8"), target_names
+
+
+def evaluate_predictor(predictor, dataset: tf.data.Dataset) -> Tuple[float, float]:
+    """
+    Returns share of examples with original name among top-k predictions (as top-k accuracy of evaluation counts it)
+    and mean prediction time of one example in milliseconds.
+    """
+    hits = 0
+    examples = 0
+    start = time.perf_counter()
+    for target, names in predictor.predict(dataset):
+        hits += target in names
+        examples += 1
+    return hits / max(1, examples), 1000 * (time.perf_counter() - start) / max(1, examples)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Exports trained net to SavedModel and quantized TFLite flatbuffers")
+    parser.add_argument("--net",
+                        dest="net",
+                        help="net to export: var or vec",
+                        required=False,
+                        default="vec")
+    parser.add_argument("--output_dir",
+                        dest="output_dir",
+                        required=False,
+                        default="exported")
+    parser.add_argument("--quantization",
+                        dest="quantizations",
+                        help="one of " + ", ".join(QUANTIZATIONS) + ", can be given several times. dynamic by default",
+                        choices=QUANTIZATIONS,
+                        action="append",
+                        required=False)
+    parser.add_argument("--data",
+                        dest="data",
+                        help="csv generated by preprocess used for int8 calibration and accuracy/latency report",
+                        required=False)
+    parser.add_argument("--representative_size",
+                        dest="representative_size",
+                        type=int,
+                        required=False,
+                        default=200)
+    args = parser.parse_args()
+
+    net = NetType(args.net)
+    quantizations = args.quantizations or ["dynamic"]
+    output_dir = os.path.join(args.output_dir, net.value)
+    saved_model_path = os.path.join(output_dir, "saved_model")
+
+    vocabs = Code2VecVocabs(net)
+    model = load_net(net, vocabs)
+    export_saved_model(model, saved_model_path)
+    print("Exported", saved_model_path)
+
+    dataset = None
+    if args.data is not None:
+        dataset = PathContextReader(vocabs=vocabs, csv_path=args.data, is_train=False).get_dataset()
+    elif "int8" in quantizations:
+        parser.error("int8 quantization needs --data for calibration")
+
+    artifacts = {"saved model": saved_model_path}
+    for quantization in quantizations:
+        tflite_path = os.path.join(output_dir, f"model.{quantization}.tflite")
+        export_tflite(saved_model_path, tflite_path, quantization,
+                      representative_inputs(dataset, args.representative_size) if dataset is not None else None)
+        print("Exported", tflite_path, f"({os.path.getsize(tflite_path) / 2 ** 20:.1f} MB)")
+        artifacts[f"tflite {quantization}"] = tflite_path
+
+    if dataset is not None:
+        accuracy, latency = evaluate_predictor(Predictor(model, vocabs), dataset)
+        print(f"{'keras float32':>16}: top-{config.config.NUMBER_OF_PREDICTIONS} accuracy {accuracy:.4f}, "
+              f"{latency:.3f} ms/example")
+        for name, path in artifacts.items():
+            accuracy, latency = evaluate_predictor(ExportedPredictor(path, vocabs), dataset)
+            print(f"{name:>16}: top-{config.config.NUMBER_OF_PREDICTIONS} accuracy {accuracy:.4f}, "
+                  f"{latency:.3f} ms/example")
@@ -0,0 +1,85 @@
+import json
+import subprocess
+import threading
+import config
+
+from typing import Dict, List, Optional
+from net_type import NetType
+
+
+class JavaExtractorDaemon:
+    """
+    Keeps one JavaExtractor JVM running in --daemon mode, so JVM start and JavaParser warm-up are paid once.
+    Each file is sent over stdin and path-context lines for code2vec and code2var come back over stdout.
+    extract can be called from several threads at once, JVM extracts up to num_threads files concurrently.
+    """
+
+    def __init__(self,
+                 jar_path: str = config.config.EXTRACTOR_JAR_PATH,
+                 max_path_length: int = config.config.EXTRACTOR_MAX_PATH_LENGTH,
+                 max_path_width: int = config.config.EXTRACTOR_MAX_PATH_WIDTH,
+                 obfuscate: bool = True,
+                 stderr=subprocess.DEVNULL,
+                 hash64: bool = config.config.HASHED_PATHS,
+                 num_threads: int = 1):
+        """hash64 - paths are written as 64-bit FNV-1a hashes instead of 32-bit String.hashCode"""
+        command = ["java", "-cp", jar_path, "JavaExtractor.App", "--daemon", "--num_threads", str(num_threads),
+                   "--max_path_length", str(max_path_length), "--max_path_width", str(max_path_width)]
+        if obfuscate:
+            command += ["--obfuscate"]
+        if hash64:
+            command += ["--hash64"]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr,
+                                        universal_newlines=True, encoding="utf8", bufsize=1)
+        self.lock = threading.Lock()
+        self.requests_number = 0
+        # Responses come in order of finished extractions, reader thread hands them to waiting requests by id.
+        self.responses: Dict[int, dict] = {}
+        self.responded = threading.Condition(self.lock)
+        self.exited = False
+        self.reader = threading.Thread(target=self._read_responses, daemon=True)
+        self.reader.start()
+
+    def _read_responses(self):
+        for line in self.process.stdout:
+            response = json.loads(line)
+            with self.lock:
+                self.responses[response["id"]] = response
+                self.responded.notify_all()
+        with self.lock:
+            self.exited = True
+            self.responded.notify_all()
+
+    def extract(self, path: Optional[str] = None, code: Optional[str] = None) -> Dict[NetType, List[str]]:
+        """
+        Extracts path-context lines from java file by path or from given source code.
+        Raises:
+            RuntimeError if extractor failed to process file or exited.
+        """
+        with self.lock:
+            self.requests_number += 1
+            request_id = self.requests_number
+            try:
+                self.process.stdin.write(json.dumps({"id": request_id, "path": path, "code": code}) + "\n")
+                self.process.stdin.flush()
+            except (BrokenPipeError, ValueError):
+                self.exited = True
+            self.responded.wait_for(lambda: request_id in self.responses or self.exited)
+            response = self.responses.pop(request_id, None)
+        if response is None:
+            raise RuntimeError(f"JavaExtractor exited with code {self.process.wait()}")
+        if "error" in response:
+            raise RuntimeError(f"JavaExtractor failed to process {path or 'code'}: {response['error']}")
+        return {NetType.code2vec: response["vec"], NetType.code2var: response["var"]}
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+        self.reader.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,483 @@
+import csv
+import json
+import os
+import config
+import tensorflow as tf
+
+from abc import ABC
+from tensorflow.python.keras.utils import tf_utils
+from typing import Iterable, Iterator, List, Optional, Tuple
+from evaluation import create_metrics, top_k_predictions
+from net_type import NetType
+from path_context_reader import PathContextReader, contexts_signature
+from prediction_cache import PredictionCache
+from preprocess import create_csv_line
+from vocabulary import Code2VecVocabs
+
+
+class ContextMask(tf.keras.layers.Layer):
+    """Marks real contexts of batch: padding has index 0 of source token, path and target token"""
+
+    def call(self, inputs):
+        mask = tf.reduce_any(tf.not_equal(tf.stack(inputs), 0), axis=0)
+        # Indices may come with trailing axis of size 1, as PathContextReader gives them.
+        return tf.reshape(mask, [tf.shape(mask)[0], -1])
+
+
+class MaskedAttentionPooling(tf.keras.layers.Layer):
+    """
+    Code vector as sum of contexts weighted by softmax of their scores. Softmax is taken over real contexts only,
+    padding gets zero weight, method without contexts gets zero vector. Layer has no weights.
+    Inputs: contexts (batch, contexts, dim), scores (batch, contexts, 1), mask (batch, contexts).
+    """
+
+    def call(self, inputs):
+        contexts, scores, mask = inputs
+        scores = tf.squeeze(scores, axis=-1)
+        scores = tf.where(mask, scores, tf.fill(tf.shape(scores), scores.dtype.min))
+        weights = tf.nn.softmax(scores, axis=1) * tf.cast(mask, scores.dtype)
+        return tf.einsum("bc,bcd->bd", weights, contexts)
+
+
+class GPUEmbedding(tf.keras.layers.Embedding):
+    """Fixes problem with tf.keras.layers.Embedding. Original one does not want to work with GPU in Eager Mode."""
+
+    @tf_utils.shape_type_conversion
+    def build(self, input_shape):
+        self.embeddings = self.add_weight(
+            shape=(self.input_dim, self.output_dim),
+            initializer=self.embeddings_initializer,
+            name="embeddings",
+            regularizer=self.embeddings_regularizer,
+            constraint=self.embeddings_constraint,
+            trainable=True
+        )
+        self.built = True
+
+
+class CappedEmbedding(GPUEmbedding):
+    """
+    Embedding of vocab sorted by frequency with at most rows rows. Most frequent words keep own rows, the rest are
+    hashed to last hash_buckets rows or, if hash_buckets is 0, pruned to NOTHING row.
+    """
+
+    def __init__(self, input_dim, rows, hash_buckets=0, **kwargs):
+        if hash_buckets >= rows:
+            raise ValueError(f"hash_buckets ({hash_buckets}) must be less than rows ({rows})")
+        super(CappedEmbedding, self).__init__(input_dim=min(input_dim, rows), **kwargs)
+        self.vocab_size = input_dim
+        self.hash_buckets = hash_buckets
+
+    def call(self, inputs):
+        indices = tf.cast(inputs, tf.int32)
+        own_rows = self.input_dim - self.hash_buckets
+        if self.hash_buckets > 0:
+            capped = own_rows + (indices - own_rows) % self.hash_buckets
+        else:
+            capped = tf.zeros_like(indices)
+        return super(CappedEmbedding, self).call(tf.where(indices < own_rows, indices, capped))
+
+    def get_config(self):
+        config = super(CappedEmbedding, self).get_config()
+        config.update({"input_dim": self.vocab_size, "rows": self.input_dim, "hash_buckets": self.hash_buckets})
+        return config
+
+
+def _optimizer_v2_adam():
+    """Adam of Keras 2 OptimizerV2 API, its sparse update is overridden by LazyAdam. Keras 3 has no such Adam"""
+    try:
+        return tf.keras.optimizers.legacy.Adam
+    except (AttributeError, ImportError):
+        return tf.keras.optimizers.Adam
+
+
+class LazyAdam(_optimizer_v2_adam()):
+    """
+    Adam which applies sparse gradients (embedding lookups) only to rows used in batch: moments of other rows are
+    not decayed and their weights are not moved. Dense gradients are applied as in Adam.
+    Works only with OptimizerV2 API of Keras 2 (tf_keras, TF_USE_LEGACY_KERAS=1), other optimizers never call
+    _resource_apply_sparse, so it raises instead of silently being dense Adam.
+    """
+
+    @staticmethod
+    def is_supported() -> bool:
+        return hasattr(_optimizer_v2_adam(), "_resource_apply_sparse")
+
+    def __init__(self, *args, **kwargs):
+        if not LazyAdam.is_supported():
+            raise RuntimeError("LazyAdam needs OptimizerV2 API of Keras 2: install tf_keras and set "
+                               "TF_USE_LEGACY_KERAS=1 or turn USE_LAZY_ADAM off")
+        super(LazyAdam, self).__init__(*args, **kwargs)
+
+    def _resource_apply_sparse(self, grad, var, indices, apply_state=None):
+        var_dtype = var.dtype.base_dtype
+        lr_t = self._decayed_lr(var_dtype)
+        beta_1_t = self._get_hyper("beta_1", var_dtype)
+        beta_2_t = self._get_hyper("beta_2", var_dtype)
+        local_step = tf.cast(self.iterations + 1, var_dtype)
+        beta_1_power = tf.math.pow(beta_1_t, local_step)
+        beta_2_power = tf.math.pow(beta_2_t, local_step)
+        epsilon_t = tf.convert_to_tensor(self.epsilon, var_dtype)
+        lr = lr_t * tf.math.sqrt(1 - beta_2_power) / (1 - beta_1_power)
+
+        m = self.get_slot(var, "m")
+        m_t_slice = beta_1_t * tf.gather(m, indices) + (1 - beta_1_t) * grad
+        m_update = self._resource_scatter_update(m, indices, m_t_slice)
+
+        v = self.get_slot(var, "v")
+        v_t_slice = beta_2_t * tf.gather(v, indices) + (1 - beta_2_t) * tf.math.square(grad)
+        v_update = self._resource_scatter_update(v, indices, v_t_slice)
+
+        var_update = self._resource_scatter_sub(var, indices, lr * m_t_slice / (tf.math.sqrt(v_t_slice) + epsilon_t))
+        return tf.group(var_update, m_update, v_update)
+
+    def _resource_scatter_sub(self, x, i, v):
+        with tf.control_dependencies([tf.raw_ops.ResourceScatterSub(resource=x.handle, indices=i, updates=v)]):
+            return x.value()
+
+
+class SampledSoftmaxTrainer(tf.keras.Model):
+    """
+    Trains full_model with sampled softmax over targets instead of full softmax over the whole target vocab.
+    Full softmax is computed only in evaluation and predictions, weights are saved and loaded in full_model format.
+    Candidates are sampled with log-uniform distribution, so target vocab has to be sorted by frequency.
+    """
+
+    def __init__(self,
+                 full_model: tf.keras.Model,
+                 vector_model: tf.keras.Model,
+                 targets_layer: tf.keras.layers.Dense,
+                 num_sampled: int,
+                 dropout_rate: float):
+        super(SampledSoftmaxTrainer, self).__init__()
+        self.full_model = full_model
+        self.vector_model = vector_model
+        self.targets_layer = targets_layer
+        self.num_sampled = num_sampled
+        self.dropout = tf.keras.layers.Dropout(dropout_rate)
+        self.loss_tracker = tf.keras.metrics.Mean(name="loss")
+
+    @property
+    def metrics(self):
+        return [self.loss_tracker] + self.full_model.metrics
+
+    def call(self, inputs, training=None):
+        return self.full_model(inputs, training=training)
+
+    def train_step(self, data):
+        inputs, targets = data
+        with tf.GradientTape() as tape:
+            code_vectors = self.dropout(self.vector_model(inputs, training=True), training=True)
+            losses = tf.nn.sampled_softmax_loss(weights=tf.transpose(self.targets_layer.kernel),
+                                                biases=self.targets_layer.bias,
+                                                labels=tf.reshape(tf.cast(targets, tf.int64), (-1, 1)),
+                                                inputs=code_vectors,
+                                                num_sampled=self.num_sampled,
+                                                num_classes=self.targets_layer.units)
+            # Loss is averaged over global batch, so gradients are summed correctly over replicas.
+            loss = tf.nn.compute_average_loss(losses)
+        variables = self.full_model.trainable_variables
+        self.optimizer.apply_gradients(zip(tape.gradient(loss, variables), variables))
+        self.loss_tracker.update_state(tf.reduce_mean(losses))
+        return {"loss": self.loss_tracker.result()}
+
+    def test_step(self, data):
+        return self.full_model.test_step(data)
+
+    def save_weights(self, *args, **kwargs):
+        return self.full_model.save_weights(*args, **kwargs)
+
+    def load_weights(self, *args, **kwargs):
+        return self.full_model.load_weights(*args, **kwargs)
+
+
+class code2vec(tf.keras.Model, ABC):
+    def __init__(self,
+                 token_vocab_size,
+                 target_vocab_size,
+                 path_vocab_size,
+                 custom_metrics: List,
+                 max_contexts=config.config.MAX_CONTEXTS,
+                 token_embed_dim=config.config.TOKEN_EMBED_DIMENSION,
+                 path_embed_dim=config.config.PATH_EMBED_DIMENSION,
+                 dropout_keep_rate=config.config.DROPOUT_KEEP_RATE,
+                 num_sampled_targets=config.config.NUM_SAMPLED_TARGETS,
+                 strategy: Optional[tf.distribute.Strategy] = None,
+                 lazy_adam=config.config.USE_LAZY_ADAM,
+                 path_embedding_rows=config.config.PATH_EMBEDDING_ROWS,
+                 path_hash_buckets=config.config.PATH_EMBEDDING_HASH_BUCKETS,
+                 index_to_word_table: Optional[tf.lookup.StaticHashTable] = None):
+        """index_to_word_table - table of target vocab, subtoken metrics are computed only if it is given"""
+        super(code2vec, self).__init__()
+        self.max_contexts: int = max_contexts
+        self.token_vocab_size: int = token_vocab_size
+        self.target_vocab_size: int = target_vocab_size
+        self.path_vocab_size: int = path_vocab_size
+        self.token_embed_dim: int = token_embed_dim
+        self.path_embed_dim: int = path_embed_dim
+        self.dropout_rate: float = 1 - dropout_keep_rate
+        self.code_embed_dim: int = 2 * self.token_embed_dim + self.path_embed_dim
+        self.custom_metrics = custom_metrics
+        self.history = None
+        self.model = None  # TODO (RKulagin): look at tf github and check, how they store models
+        self.vector_model = None
+        self.num_sampled_targets: int = num_sampled_targets
+        self.train_model = None
+        self.strategy: tf.distribute.Strategy = strategy or tf.distribute.get_strategy()
+        self.lazy_adam: bool = lazy_adam
+        self.path_embedding_rows: int = path_embedding_rows
+        self.path_hash_buckets: int = path_hash_buckets
+        self.index_to_word_table = index_to_word_table
+
+    @property
+    def samples_targets(self) -> bool:
+        """Is net trained with sampled softmax, see SampledSoftmaxTrainer"""
+        return 0 < self.num_sampled_targets < self.target_vocab_size
+
+    @property
+    def checkpoint_monitor(self) -> str:
+        """Value of train logs the best checkpoints are chosen by, sampled softmax training logs only loss"""
+        return "loss" if self.samples_targets else "accuracy"
+
+    def build_model(self, **kwargs):
+        if self.model is None:
+            # Variables, metrics and optimizer have to be created in scope to be mirrored.
+            with self.strategy.scope():
+                # Number of contexts differs from batch to batch, see PathContextReader._batch_contexts.
+                input_source_token_embed = tf.keras.Input(shape=(None,), dtype=tf.int32,
+                                                          name="input_source_token")
+                input_target_token_embed = tf.keras.Input(shape=(None,), dtype=tf.int32,
+                                                          name="input_target_token")
+                token_embed = GPUEmbedding(input_dim=self.token_vocab_size,
+                                           output_dim=self.token_embed_dim,
+                                           embeddings_initializer='uniform',
+                                           dtype=tf.float32,
+                                           name="token_embed")
+                token_source_embed_model = tf.keras.Sequential([input_source_token_embed, token_embed])
+                token_target_embed_model = tf.keras.Sequential([input_target_token_embed, token_embed])
+                input_paths_embed = tf.keras.Input(shape=(None,), dtype=tf.int32,
+                                                   name="input_paths")
+                if 0 < self.path_embedding_rows < self.path_vocab_size:
+                    paths_embed = CappedEmbedding(input_dim=self.path_vocab_size,
+                                                  rows=self.path_embedding_rows,
+                                                  hash_buckets=self.path_hash_buckets,
+                                                  output_dim=self.path_embed_dim,
+                                                  dtype=tf.float32,
+                                                  embeddings_initializer='uniform',
+                                                  name="paths_embed")
+                else:
+                    paths_embed = GPUEmbedding(input_dim=self.path_vocab_size,
+                                               output_dim=self.path_embed_dim,
+                                               dtype=tf.float32,
+                                               embeddings_initializer='uniform',
+                                               name="paths_embed")
+                path_embed_model = tf.keras.Sequential([input_paths_embed, paths_embed])
+                concatenated_embeds = tf.keras.layers.Concatenate(name="concatenated_embeds")(
+                    [token_source_embed_model.output, path_embed_model.output, token_target_embed_model.output])
+
+                dropped_embeds = tf.keras.layers.Dropout(self.dropout_rate)(concatenated_embeds)
+                flatten_embeds = tf.keras.layers.Reshape((-1, self.code_embed_dim), name="flatten_embeds")(dropped_embeds)
+                combined_context_vector = tf.keras.layers.Dense(self.code_embed_dim, activation='sigmoid',
+                                                                name="combined_context_vector")(flatten_embeds)
+                # Scores of contexts, they are turned to attention weights by softmax over real contexts of method.
+                context_weights = tf.keras.layers.Dense(1, name="context_weights")(combined_context_vector)
+                context_mask = ContextMask(name="context_mask")(
+                    [input_source_token_embed, input_paths_embed, input_target_token_embed])
+                code_vectors = MaskedAttentionPooling(name="attention_pooling")(
+                    [combined_context_vector, context_weights, context_mask])
+                dropped_code_vectors = tf.keras.layers.Dropout(self.dropout_rate)(code_vectors)
+                targets_layer = tf.keras.layers.Dense(self.target_vocab_size, activation="softmax",
+                                                      name="possible_targets")
+                possible_targets = targets_layer(dropped_code_vectors)
+
+                inputs = [token_source_embed_model.input, path_embed_model.input, token_target_embed_model.input]
+                self.model = tf.keras.Model(inputs=inputs, outputs=possible_targets)
+                self.vector_model = tf.keras.Model(inputs=inputs, outputs=code_vectors)
+                self.model.compile(optimizer=self._create_optimizer(), metrics=create_metrics(self.index_to_word_table),
+                                   loss=tf.keras.losses.SparseCategoricalCrossentropy())
+                if self.samples_targets:
+                    self.train_model = SampledSoftmaxTrainer(self.model, self.vector_model, targets_layer,
+                                                             self.num_sampled_targets, self.dropout_rate)
+                    self.train_model.compile(optimizer=self._create_optimizer())
+                else:
+                    self.train_model = self.model
+            # self.vector_model.compile()
+            if config.config.PRINT_NET_SUMMARY:
+                self.model.summary()
+            if config.config.NET_PLOT_PATH:
+                # Needs pydot and graphviz.
+                tf.keras.utils.plot_model(self.model, to_file=config.config.NET_PLOT_PATH, show_shapes=True)
+
+    def _create_optimizer(self) -> tf.keras.optimizers.Optimizer:
+        if self.lazy_adam and not LazyAdam.is_supported():
+            # Default Keras 3 of TensorFlow has no OptimizerV2, training goes on with dense updates instead of failing.
+            print("Warning: LazyAdam needs OptimizerV2 API of Keras 2 (tf_keras, TF_USE_LEGACY_KERAS=1), "
+                  "net is trained with Adam, which moves all rows of embeddings every step")
+            self.lazy_adam = False
+        return LazyAdam() if self.lazy_adam else tf.keras.optimizers.Adam()
+
+    def get_vector(self, inputs):
+        return self.vector_model(inputs)
+
+    def train(self,
+              dataset,
+              epochs,
+              callbacks: List[tf.keras.callbacks.Callback],
+              **kwargs):
+        if self.model is None:
+            self.build_model()
+        self.history = self.train_model.fit(dataset, epochs=epochs, callbacks=callbacks, **kwargs)
+
+    def load_weights(self, *args, **kwargs):
+        if self.model is None:
+            self.build_model()
+        self.model.load_weights(*args, **kwargs)
+
+    def evaluate(self,
+                 *args, **kwargs):
+        if self.model is None:
+            self.build_model()
+        self.model.evaluate(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return self.model(*args, **kwargs)
+
+
+class Predictor:
+    """Predicts top-k names for batched dataset with in-graph top_k and index to word lookup"""
+
+    def __init__(self, model: code2vec, vocabs: Code2VecVocabs, k: int = config.config.NUMBER_OF_PREDICTIONS,
+                 cache: Optional[PredictionCache] = None):
+        """cache - predictions of lines given to predict_lines are taken from it and saved to it"""
+        self.model = model
+        self.index_to_word_table = vocabs.target_vocab.get_index_to_word_lookup_table()
+        self.number_of_special = vocabs.target_vocab.number_of_special
+        self.k = min(k, model.target_vocab_size - self.number_of_special)
+        self.cache = cache
+
+    @tf.function(input_signature=[contexts_signature()])
+    def predict_batch(self, inputs):
+        """Returns top-k names and their probabilities for batch, special words (NOTHING) are never predicted"""
+        probabilities = self.model.model(inputs, training=False)
+        indices = top_k_predictions(probabilities, self.k, self.number_of_special)
+        return self.index_to_word_table.lookup(indices), tf.gather(probabilities, indices, batch_dims=1)
+
+    def predict(self, dataset: tf.data.Dataset) -> Iterator[Tuple[str, List[str]]]:
+        """Yields original target and predicted names for each line of dataset"""
+        for inputs, targets in dataset:
+            names, _ = self.predict_batch(inputs)
+            for target, target_names in zip(targets.numpy(), names.numpy()):
+                yield target.decode("utf8"), [name.decode("utf8") for name in target_names]
+
+    def predict_lines(self, reader: PathContextReader, lines: List[str],
+                      chunk_size: int = config.config.PREDICTION_CACHE_CHUNK_SIZE) -> Iterator[Tuple[str, List[str]]]:
+        """
+        Yields original target and predicted names for each line "target source,path,target ...", raw extractor
+        output or csv generated by preprocess. Only lines missed in cache go through the net. Cache keys are computed
+        from all contexts of lines, before methods with more than MAX_CONTEXTS contexts are randomly sampled,
+        so such methods are found in cache too.
+        """
+        for start in range(0, len(lines), chunk_size):
+            chunk = lines[start:start + chunk_size]
+            if self.cache is None:
+                yield from self.predict(reader.get_dataset_from_lines(self._csv_lines(chunk)))
+                continue
+            keys, found = self.cache.lookup(chunk)
+            missed = {key: line for line, key in zip(chunk, keys) if key not in found}
+            if missed:
+                predicted = [names for _, names in
+                             self.predict(reader.get_dataset_from_lines(self._csv_lines(missed.values())))]
+                found.update(zip(missed, predicted))
+                self.cache.put_many(zip(missed, predicted))
+            for line, key in zip(chunk, keys):
+                yield line.split(" ", 1)[0], found[key]
+
+    @staticmethod
+    def _csv_lines(lines: Iterable[str]) -> List[str]:
+        """Lines with exactly MAX_CONTEXTS contexts, as preprocess writes them"""
+        csv_lines = []
+        for line in lines:
+            fields = line.rstrip("\n").split(" ")
+            contexts = [context for context in fields[1:] if context]
+            csv_lines.append(create_csv_line(fields[0], contexts, config.config.MAX_CONTEXTS))
+        return csv_lines
+
+    def predict_to_csv(self, dataset: tf.data.Dataset, path: str) -> int:
+        """Writes "target,name_1,...,name_k" lines to path. Returns number of written lines"""
+        return self.write_csv(self.predict(dataset), path)
+
+    @staticmethod
+    def write_csv(predictions: Iterator[Tuple[str, List[str]]], path: str) -> int:
+        lines_number = 0
+        with open(path, "w", encoding="utf8", buffering=1 << 20) as file:
+            writer = csv.writer(file)
+            for target, names in predictions:
+                writer.writerow([target, *names])
+                lines_number += 1
+        return lines_number
+
+
+# Version of layers and weights saved by code2vec. Version 2 attends contexts by context_weights and is trained on
+# vocabs ordered by frequency, weights of version 1 (no info file) give garbage predictions and must be retrained.
+NET_FORMAT_VERSION = 2
+
+
+def _weights_info_path(weights_path: str) -> str:
+    return f"{weights_path}.json"
+
+
+def save_weights_info(weights_path: str, vocabs: Code2VecVocabs):
+    """Saves format version of net and fingerprint of vocabs weights were trained with next to weights"""
+    with open(_weights_info_path(weights_path), "w") as file:
+        json.dump({"net_format": NET_FORMAT_VERSION, "vocabs": vocabs.fingerprint().hex()}, file)
+
+
+def check_weights_info(weights_path: str, vocabs: Optional[Code2VecVocabs] = None):
+    """
+    Raises RuntimeError if weights were saved by other version of net or trained with other vocabs than given ones,
+    their predictions would be garbage without any error.
+    """
+    info_path = _weights_info_path(weights_path)
+    if not os.path.exists(weights_path):
+        raise RuntimeError(f"There are no weights {weights_path}, train net with code2var.py --train true "
+                           f"--checkpoints_dir {os.path.dirname(weights_path) or '.'}, see README.md")
+    if not os.path.exists(info_path):
+        raise RuntimeError(f"{weights_path} has no {info_path}, it was saved by net format older than "
+                           f"{NET_FORMAT_VERSION}, model has to be retrained")
+    with open(info_path, "r") as file:
+        info = json.load(file)
+    if info.get("net_format") != NET_FORMAT_VERSION:
+        raise RuntimeError(f"{weights_path} was saved by net format {info.get('net_format')}, "
+                           f"net format is {NET_FORMAT_VERSION} now, model has to be retrained")
+    if vocabs is not None and info.get("vocabs") != vocabs.fingerprint().hex():
+        raise RuntimeError(f"{weights_path} was trained with other vocabs than {vocabs.training_freq_dict_path}, "
+                           f"use its vocabs or retrain model")
+
+
+def load_net(net: NetType, vocabs: Optional[Code2VecVocabs] = None) -> code2vec:
+    """
+    Builds trained code2vec or code2var net with vocab sizes and weights path from config.
+    vocabs - vocabs net is used with, refused if weights were trained with other ones. Vocab sizes are taken from
+    them, as training takes them
+    """
+    if net == NetType.code2vec:
+        tokens_numbers = config.config.VEC_NET_TOKEN_SIZE
+        target_numbers = config.config.VEC_NET_TARGET_SIZE
+        path_numbers = config.config.VEC_NET_PATH_SIZE
+        model_path = config.config.VEC_NET_WEIGHTS_PATH
+    else:
+        tokens_numbers = config.config.VAR_NET_TOKEN_SIZE
+        target_numbers = config.config.VAR_NET_TARGET_SIZE
+        path_numbers = config.config.VAR_NET_PATH_SIZE
+        model_path = config.config.VAR_NET_WEIGHTS_PATH
+    if vocabs is not None:
+        tokens_numbers = len(vocabs.token_vocab.word_to_index)
+        target_numbers = len(vocabs.target_vocab.word_to_index)
+        path_numbers = len(vocabs.path_vocab.word_to_index)
+    model = code2vec(token_vocab_size=tokens_numbers,
+                     target_vocab_size=target_numbers,
+                     path_vocab_size=path_numbers,
+                     custom_metrics=[])
+    check_weights_info(model_path, vocabs)
+    model.load_weights(model_path)
+    return model
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class NetType(Enum):
+    code2var = "var"
+    code2vec = "vec"
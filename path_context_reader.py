@@ -1,7 +1,9 @@
+import os
 import tensorflow as tf
 import config
 
-from typing import NamedTuple, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from preprocess import SHARD_HEADER, shard_header
 from vocabulary import Code2VecVocabs
 
 
@@ -19,6 +21,14 @@ class ReaderInputTensors(NamedTuple):
     path_target_token_strings: Optional[tf.Tensor] = None
 
 
+def contexts_signature() -> Tuple[tf.TensorSpec, tf.TensorSpec, tf.TensorSpec]:
+    """
+    Specs of batched source tokens, paths and target tokens given by PathContextReader. Number of contexts differs
+    from batch to batch, tf.function given them as input_signature is traced once for all batches.
+    """
+    return tuple(tf.TensorSpec([None, None, 1], tf.int32) for _ in range(3))
+
+
 class PathContextReader:
     """
     Parses Code2VecVocabs to acceptable for code2vec and code2var tensors
@@ -28,18 +38,35 @@ class PathContextReader:
                  vocabs: Code2VecVocabs,
                  csv_path: str,
                  is_train: bool,
-                 repeat_dataset: bool = False):
+                 repeat_dataset: bool = False,
+                 shards_dir: Optional[str] = None,
+                 prediction_batch_size: int = config.config.PREDICTION_BATCH_SIZE,
+                 num_workers: int = 1,
+                 worker_index: int = 0):
+        """
+        shards_dir - directory with binary shards generated by preprocess.export_shards, used instead of csv_path
+        prediction_batch_size - batch size of dataset when is_train is False
+        num_workers, worker_index - in multi-worker training every worker reads only its own part of lines
+        """
         self.is_train = is_train
+        self.prediction_batch_size = prediction_batch_size
         self.repeat = repeat_dataset
         self.vocabs = vocabs
         self.csv_path = csv_path
+        self.shards_dir = shards_dir
+        self.num_workers = num_workers
+        self.worker_index = worker_index
         self.dataset: Optional[tf.data.Dataset] = None
         self.val_dataset: Optional[tf.data.Dataset] = None
         self.test_dataset: Optional[tf.data.Dataset] = None
 
-        self.vocabs.token_vocab.create_word_lookup()
-        self.vocabs.path_vocab.create_word_lookup()
-        self.vocabs.target_vocab.create_word_lookup()
+        if self.shards_dir is None:
+            self.vocabs.token_vocab.create_word_lookup()
+            self.vocabs.path_vocab.create_word_lookup()
+            self.vocabs.target_vocab.create_word_lookup()
+        else:
+            # Shards already contain indices, so only target strings should be looked up.
+            self.vocabs.target_vocab.create_index_lookup()
 
     def get_dataset(self) -> tf.data.Dataset:
         """Returns suitable dataset for code2vec and code2var"""
@@ -47,56 +74,232 @@ class PathContextReader:
             self.dataset = self._generate_dataset()
         return self.dataset
 
+    def get_dataset_from_lines(self, lines: List[str]) -> tf.data.Dataset:
+        """Returns dataset of inputs and target strings for in-memory lines in format of csv generated by preprocess"""
+        dataset = tf.data.Dataset.from_tensor_slices(tf.constant(lines, dtype=tf.string))
+        return self._parse_batches(dataset, self.prediction_batch_size, self._generate_input_tensors,
+                                   lambda x: x.target_string)
+
+    @staticmethod
+    def _real_lengths(contexts) -> tf.Tensor:
+        """
+        Number of contexts up to the last real one of every example of (..., MAX_CONTEXTS, 1) index tensors.
+        Preprocess puts empty filler contexts at the end, they and contexts out of all vocabs have index 0 everywhere.
+        """
+        is_real = tf.reduce_any(tf.not_equal(tf.concat(contexts, axis=-1), 0), axis=-1)
+        positions = tf.range(1, tf.shape(is_real)[-1] + 1)
+        return tf.reduce_max(tf.where(is_real, positions, 0), axis=-1)
+
     @staticmethod
     def _parse_reader_input_tensor(tensor):
-        return (tensor.path_source_token_indices,
-                tensor.path_indices,
-                tensor.path_target_token_indices)
+        """
+        Index tensors of contexts cut after the last real one. Tensor can be a single example
+        or a batch of them, the batch is cut after the last real context of its longest example.
+        """
+        contexts = (tensor.path_source_token_indices,
+                    tensor.path_indices,
+                    tensor.path_target_token_indices)
+        length = tf.reduce_max(PathContextReader._real_lengths(contexts))
+        return tuple(context[..., :length, :] for context in contexts)
+
+    @staticmethod
+    def _batch_contexts(dataset: tf.data.Dataset, batch_size: int,
+                        bucket_boundaries: Optional[List[int]] = None) -> tf.data.Dataset:
+        """
+        Batches examples of different number of contexts, contexts of batch are padded with 0 to the longest of them.
+        If bucket_boundaries are given, examples are grouped to batches by number of contexts, so short methods
+        are not padded to long ones. Grouping changes order of examples.
+        """
+        if not bucket_boundaries:
+            return dataset.padded_batch(batch_size)
+        return dataset.apply(tf.data.experimental.bucket_by_sequence_length(
+            lambda inputs, target: tf.shape(inputs[0])[0],
+            bucket_boundaries,
+            [batch_size] * (len(bucket_boundaries) + 1)))
+
+    def _read_lines(self) -> tf.data.Dataset:
+        """
+        Reads csv lines, csv_path can be a glob of several csv files. Files are read in parallel,
+        but their lines are interleaved in the same order every time, so validation and test splits do not change.
+        """
+        files = sorted(tf.io.gfile.glob(self.csv_path)) or [self.csv_path]
+        if len(files) == 1:
+            dataset = tf.data.TextLineDataset(files[0], buffer_size=config.config.READER_BUFFER_SIZE)
+        else:
+            dataset = tf.data.Dataset.from_tensor_slices(files).interleave(
+                lambda path: tf.data.TextLineDataset(path, buffer_size=config.config.READER_BUFFER_SIZE),
+                cycle_length=len(files),
+                num_parallel_calls=len(files),
+                deterministic=True)
+        return dataset.filter(lambda line: tf.strings.length(line) > 0)
+
+    def _parse_batches(self, dataset: tf.data.Dataset, batch_size: int, generate_input_tensors,
+                       get_target) -> tf.data.Dataset:
+        """
+        Batches lines or shard rows of dataset first and then parses every batch at once to inputs cut
+        to the longest example of batch and targets. Keeps order of lines.
+        """
+        return dataset.batch(batch_size).map(
+            lambda lines: self._inputs_and_target(generate_input_tensors(lines), get_target),
+            num_parallel_calls=config.config.READER_NUM_PARALLEL_BATCHES,
+            deterministic=True).prefetch(tf.data.experimental.AUTOTUNE)
+
+    def _inputs_and_target(self, tensors: ReaderInputTensors, get_target):
+        return self._parse_reader_input_tensor(tensors), get_target(tensors)
+
+    def get_stage_datasets(self) -> Dict[str, tf.data.Dataset]:
+        """
+        Datasets of consecutive stages of reading, each of them adds one stage to the previous one:
+            read - batches of csv lines or shard rows;
+            split - contexts split to source token, path and target token strings (csv only);
+            lookup - strings looked up to indices in vocabs;
+            batch - the whole dataset as get_dataset returns it.
+        Used to find out which stage limits throughput, see profiling.py.
+        """
+        batch_size = config.config.BATCH_SIZE if self.is_train else self.prediction_batch_size
+        if self.shards_dir is None:
+            read = self._read_lines().batch(batch_size)
+            stages = {"read": read,
+                      "split": read.map(lambda lines: self._split_contexts(self._decode_lines(lines)[1]),
+                                        num_parallel_calls=config.config.READER_NUM_PARALLEL_BATCHES),
+                      "lookup": read.map(self._generate_input_tensors,
+                                         num_parallel_calls=config.config.READER_NUM_PARALLEL_BATCHES)}
+        else:
+            read = self._read_shards().batch(batch_size)
+            stages = {"read": read,
+                      "lookup": read.map(self._generate_input_tensors_from_shard,
+                                         num_parallel_calls=config.config.READER_NUM_PARALLEL_BATCHES)}
+        stages["batch"] = self.get_dataset()
+        return stages
 
     def _generate_dataset(self) -> tf.data.Dataset:
-        """Generates dataset for code2vec|code2var from vocabs"""
-        dataset = tf.data.experimental.CsvDataset(self.csv_path,
-                                                  [""] * (config.config.MAX_CONTEXTS + 1),
-                                                  field_delim=" ",
-                                                  use_quote_delim=False)
-        if self.is_train:
-            self.val_dataset = dataset.take(config.config.VALIDATION_SIZE)
-            self.test_dataset = dataset.skip(config.config.VALIDATION_SIZE).take(config.config.TEST_SIZE)
-            dataset = dataset.skip(config.config.VALIDATION_SIZE + config.config.TEST_SIZE)
-            if not self.repeat and config.config.NUM_TRAIN_EPOCHS > 1:
-                dataset = dataset.repeat(config.config.NUM_TRAIN_EPOCHS)
-            dataset = dataset.shuffle(config.config.SHUFFLE_BUFFER_SIZE,
-                                      reshuffle_each_iteration=True)
-
-        dataset = dataset.map(self._generate_input_tensors)
+        """
+        Generates dataset for code2vec|code2var from vocabs.
+        Lines are parsed by batches, many batches at once, and the whole dataset is prefetched,
+        so reading overlaps with training. Training examples are parsed once and split back to single ones
+        to be shuffled and grouped to buckets, parsed epoch can be cached, see READER_CACHE.
+        """
+        if self.shards_dir is None:
+            dataset = self._read_lines()
+            generate_input_tensors = self._generate_input_tensors
+        else:
+            dataset = self._read_shards()
+            generate_input_tensors = self._generate_input_tensors_from_shard
+        if not self.is_train:
+            # Predictions keep order of lines, so they are not grouped to buckets.
+            return self._parse_batches(dataset, self.prediction_batch_size, generate_input_tensors,
+                                       lambda x: x.target_string)
+
+        val_dataset = dataset.take(config.config.VALIDATION_SIZE)
+        test_dataset = dataset.skip(config.config.VALIDATION_SIZE).take(config.config.TEST_SIZE)
+        dataset = dataset.skip(config.config.VALIDATION_SIZE + config.config.TEST_SIZE)
+        if self.num_workers > 1:
+            dataset = self._shard_for_worker(dataset)
+            val_dataset = self._shard_for_worker(val_dataset)
+        self.val_dataset = self._parse_batches(val_dataset, config.config.EVALUATION_BATCH_SIZE,
+                                               generate_input_tensors, lambda x: x.target_index)
+        self.test_dataset = self._parse_batches(test_dataset, config.config.EVALUATION_BATCH_SIZE,
+                                                generate_input_tensors, lambda x: x.target_index)
+
+        dataset = dataset.batch(config.config.READER_PARSE_BATCH_SIZE).map(
+            lambda lines: self._training_example(generate_input_tensors(lines)),
+            num_parallel_calls=config.config.READER_NUM_PARALLEL_BATCHES,
+            deterministic=False).unbatch()
+        if config.config.READER_CACHE is not None:
+            dataset = dataset.cache(config.config.READER_CACHE)
+        if not self.repeat and config.config.NUM_TRAIN_EPOCHS > 1:
+            dataset = dataset.repeat(config.config.NUM_TRAIN_EPOCHS)
+        dataset = dataset.shuffle(config.config.SHUFFLE_BUFFER_SIZE,
+                                  reshuffle_each_iteration=True)
         if self.repeat:
             dataset = dataset.repeat()
+        dataset = dataset.map(lambda inputs, target, length: (tuple(context[:length] for context in inputs), target),
+                              num_parallel_calls=config.config.READER_NUM_PARALLEL_BATCHES,
+                              deterministic=False)
+        dataset = self._batch_contexts(dataset, config.config.BATCH_SIZE, config.config.CONTEXTS_BUCKET_BOUNDARIES)
+        return dataset.prefetch(tf.data.experimental.AUTOTUNE)
 
-        if self.is_train:
+    def _training_example(self, tensors: ReaderInputTensors):
+        """
+        Leaves only index tensors and number of real contexts, so unbatched, cached and shuffled examples
+        take less memory and are cut without looking for their last real context again.
+        """
+        contexts = (tensors.path_source_token_indices,
+                    tensors.path_indices,
+                    tensors.path_target_token_indices)
+        return contexts, tensors.target_index, self._real_lengths(contexts)
 
-            dataset = dataset.map(lambda x: (self._parse_reader_input_tensor(x), x.target_index))
-            self.val_dataset = self.val_dataset.map(self._generate_input_tensors)
-            self.test_dataset = self.test_dataset.map(self._generate_input_tensors)
+    def _shard_for_worker(self, dataset: tf.data.Dataset) -> tf.data.Dataset:
+        """Leaves every num_workers line for this worker. Distribution strategy must not shard it again"""
+        options = tf.data.Options()
+        options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+        return dataset.shard(self.num_workers, self.worker_index).with_options(options)
 
-            self.val_dataset = self.val_dataset.map(lambda x: (self._parse_reader_input_tensor(x), x.target_index)).batch(1)
-            self.test_dataset = self.test_dataset.map(lambda x: (self._parse_reader_input_tensor(x), x.target_index)).batch(1)
-            dataset = dataset.batch(config.config.BATCH_SIZE)
-        else:
-            dataset = dataset.map(lambda x: (self._parse_reader_input_tensor(x), x.target_string))
-            dataset = dataset.batch(1)
-        return dataset
-
-    @tf.function
-    def _generate_input_tensors(self, *line):
-        """Parses line to ReaderInputTensors"""
-        target = line[0]
-        target_index = self.vocabs.target_vocab.get_word_to_index_lookup_table().lookup(target)
+    def _read_shards(self) -> tf.data.Dataset:
+        """
+        Reads rows of binary shards generated by preprocess.export_shards. Shards are read one after another,
+        so rows keep order of csv and splits are the same as for csv.
+        """
+        shards = sorted(tf.io.gfile.glob(os.path.join(self.shards_dir, "shard-*.bin")))
+        if len(shards) == 0:
+            raise ValueError(f"No binary shards found in {self.shards_dir}")
+        header = shard_header(self.vocabs, config.config.MAX_CONTEXTS)
+        for shard in shards:
+            self._check_shard_header(shard, header)
+        record_bytes = 4 * (1 + 3 * config.config.MAX_CONTEXTS)
+        return tf.data.FixedLengthRecordDataset(shards, record_bytes, header_bytes=SHARD_HEADER.size,
+                                                buffer_size=config.config.READER_BUFFER_SIZE)
+
+    @staticmethod
+    def _check_shard_header(shard: str, header: bytes):
+        """Raises ValueError if shard was exported with other vocabs or number of contexts"""
+        with tf.io.gfile.GFile(shard, "rb") as file:
+            shard_header = file.read(SHARD_HEADER.size)
+        if shard_header == header:
+            return
+        if len(shard_header) < SHARD_HEADER.size or SHARD_HEADER.unpack(shard_header)[0] != header[:8]:
+            raise ValueError(f"{shard} is not a binary shard of this version, export shards again")
+        _, *found = SHARD_HEADER.unpack(shard_header)
+        _, *expected = SHARD_HEADER.unpack(header)
+        raise ValueError(f"{shard} was exported with other vocabs or MAX_CONTEXTS: max contexts, "
+                         f"token, path and target vocab sizes are {found[:4]}, expected {expected[:4]}"
+                         + ("" if found[:4] != expected[:4] else ", vocabs of the same sizes differ"))
+
+    def _generate_input_tensors_from_shard(self, records):
+        """Parses batch of binary shard rows to ReaderInputTensors"""
+        rows = tf.io.decode_raw(records, tf.int32, little_endian=True)
+        target_index = rows[:, 0]
+        contexts = tf.reshape(rows[:, 1:], [-1, 3, config.config.MAX_CONTEXTS, 1])
+        target = self.vocabs.target_vocab.get_index_to_word_lookup_table().lookup(target_index)
 
-        contexts = tf.strings.split(tf.stack(line[1:]), sep=",").to_tensor()
+        return ReaderInputTensors(target_index=target_index,
+                                  path_source_token_indices=contexts[:, 0],
+                                  path_indices=contexts[:, 1],
+                                  path_target_token_indices=contexts[:, 2],
+                                  target_string=target)
+
+    @staticmethod
+    def _decode_lines(lines):
+        """Splits batch of csv lines to targets and (batch, MAX_CONTEXTS) context strings"""
+        fields = tf.io.decode_csv(lines,
+                                  [""] * (config.config.MAX_CONTEXTS + 1),
+                                  field_delim=" ",
+                                  use_quote_delim=False)
+        return fields[0], tf.stack(fields[1:], axis=-1)
+
+    @staticmethod
+    def _split_contexts(contexts):
+        """Splits "source,path,target" context strings of any shape to three string tensors of shape (..., 1)"""
+        parts = tf.strings.split(contexts, sep=",")
+        parts = parts.to_tensor(default_value="", shape=tf.concat([tf.shape(contexts, out_type=tf.int64), [3]], 0))
+        return parts[..., 0:1], parts[..., 1:2], parts[..., 2:3]
+
+    def _generate_input_tensors(self, lines):
+        """Parses batch of csv lines to ReaderInputTensors, all lines are split and looked up at once"""
+        target, contexts = self._decode_lines(lines)
+        target_index = self.vocabs.target_vocab.get_word_to_index_lookup_table().lookup(target)
 
-        path_sources = tf.slice(contexts, [0, 0], [-1, 1])
-        paths = tf.slice(contexts, [0, 1], [-1, 1])
-        path_targets = tf.slice(contexts, [0, 2], [-1, 1])
+        path_sources, paths, path_targets = self._split_contexts(contexts)
 
         path_sources_lookup = self.vocabs.token_vocab.get_lookup_index(path_sources)
         paths_lookup = self.vocabs.path_vocab.get_lookup_index(paths)
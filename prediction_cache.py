@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import config
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from net_type import NetType
+
+
+def net_version(net: NetType) -> str:
+    """
+    Version of net weights and vocabs from config. Changes when any of their files is replaced,
+    so predictions of old net are never returned for new one.
+    """
+    if net == NetType.code2vec:
+        weights_path = config.config.VEC_NET_WEIGHTS_PATH
+        freq_dicts_path = config.config.VEC_TRAINING_FREQ_DICTS_PATH
+    else:
+        weights_path = config.config.VAR_NET_WEIGHTS_PATH
+        freq_dicts_path = config.config.VAR_TRAINING_FREQ_DICTS_PATH
+    vocabs_path = freq_dicts_path if config.config.CREATE_VOCAB else config.config.CODE2VEC_VOCABS_PATH
+    parts = [net.value, str(config.config.MAX_CONTEXTS), str(config.config.NUMBER_OF_PREDICTIONS)]
+    for path in [weights_path, vocabs_path]:
+        parts.append(path)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            parts += [str(stat.st_size), str(stat.st_mtime_ns)]
+    return hashlib.sha256("\n".join(parts).encode("utf8")).hexdigest()[:16]
+
+
+class PredictionCache:
+    """
+    Predicted names keyed by hash of method contexts and net version. Recently used predictions are kept in memory,
+    all of them are kept in sqlite file, which holds at most max_entries least recently used ones.
+    """
+
+    def __init__(self, path: str, version: str,
+                 memory_entries: int = config.config.PREDICTION_CACHE_MEMORY_ENTRIES,
+                 max_entries: int = config.config.PREDICTION_CACHE_MAX_ENTRIES):
+        self.version = version
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.memory: "OrderedDict[str, List[str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS predictions "
+                                "(key TEXT PRIMARY KEY, names TEXT NOT NULL, last_used INTEGER NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)")
+        self.connection.commit()
+        self.disk_entries = self.connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def key(self, line: str) -> str:
+        """
+        Key of line in format of csv generated by preprocess. Contexts are sorted and padding is dropped,
+        so the same method gives the same key whatever order extractor wrote its contexts in.
+        Original name is not a part of key, as net does not see it.
+        """
+        contexts = sorted(context for context in line.rstrip("\n").split(" ")[1:] if context)
+        return hashlib.sha256("\n".join([self.version, *contexts]).encode("utf8")).hexdigest()
+
+    def _remember(self, key: str, names: List[str]):
+        self.memory[key] = names
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """Returns cached names of keys that were found"""
+        found = {}
+        on_disk = []
+        for key in set(keys):
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                found[key] = self.memory[key]
+            else:
+                on_disk.append(key)
+        # sqlite limits number of query parameters.
+        for start in range(0, len(on_disk), 500):
+            part = on_disk[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT key, names FROM predictions WHERE key IN ({','.join('?' * len(part))})", part).fetchall()
+            for key, names in rows:
+                found[key] = json.loads(names)
+                self._remember(key, found[key])
+        if found:
+            now = time.time_ns()
+            self.connection.executemany("UPDATE predictions SET last_used = ? WHERE key = ?",
+                                        [(now, key) for key in found])
+            self.connection.commit()
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, List[str]]]):
+        """Caches names of keys and evicts least recently used entries if there are more than max_entries"""
+        now = time.time_ns()
+        rows = []
+        for key, names in items:
+            self._remember(key, names)
+            rows.append((key, json.dumps(names), now))
+        before = self.connection.total_changes
+        self.connection.executemany("INSERT OR IGNORE INTO predictions (key, names, last_used) VALUES (?, ?, ?)", rows)
+        self.disk_entries += self.connection.total_changes - before
+        if self.disk_entries > self.max_entries:
+            evicted = self.disk_entries - self.max_entries
+            self.connection.execute("DELETE FROM predictions WHERE key IN "
+                                    "(SELECT key FROM predictions ORDER BY last_used LIMIT ?)", (evicted,))
+            self.disk_entries -= evicted
+        self.connection.commit()
+
+    def lookup(self, lines: List[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Returns keys of lines and cached names of found keys, counts hits and misses"""
+        keys = [self.key(line) for line in lines]
+        found = self.get_many(keys)
+        hits = sum(key in found for key in keys)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return keys, found
+
+    def close(self):
+        self.connection.close()
+
+
+def open_cache(cache_dir: Optional[str], net: NetType) -> Optional[PredictionCache]:
+    """Opens cache of net predictions in cache_dir, returns None if cache_dir is not given"""
+    if cache_dir is None:
+        return None
+    os.makedirs(cache_dir, exist_ok=True)
+    return PredictionCache(os.path.join(cache_dir, f"predictions.{net.value}.sqlite"), net_version(net))
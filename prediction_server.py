@@ -0,0 +1,177 @@
+#!/usr/bin/python
+import csv
+import json
+import os
+import sys
+import traceback
+import config
+
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List, Optional
+from urllib import error as url_error, request as url_request
+from java_extractor import JavaExtractorDaemon
+from net_type import NetType
+
+
+class PredictionServer:
+    """Keeps code2vec and code2var nets with their vocabs and lookup tables loaded between requests"""
+
+    def __init__(self, nets: List[NetType], cache_dir: Optional[str] = None):
+        """cache_dir - dir with prediction caches of nets, nothing is cached if it is None"""
+        # TensorFlow is imported here, so client does not pay for it.
+        from net import Predictor, load_net
+        from path_context_reader import PathContextReader
+        from prediction_cache import open_cache
+        from vocabulary import Code2VecVocabs
+
+        self.models = {}
+        self.vocabs = {}
+        self.readers = {}
+        self.predictors = {}
+        self.extractor: Optional[JavaExtractorDaemon] = None
+        for net in nets:
+            print("Loading", net.value, "net")
+            self.vocabs[net] = Code2VecVocabs(net)
+            self.models[net] = load_net(net, self.vocabs[net])
+            self.readers[net] = PathContextReader(vocabs=self.vocabs[net], csv_path=None, is_train=False)
+            self.predictors[net] = Predictor(self.models[net], self.vocabs[net], cache=open_cache(cache_dir, net))
+        print("Loaded nets:", ", ".join(net.value for net in nets))
+
+    def predict_lines(self, net: NetType, lines: List[str]) -> List[Dict]:
+        """
+        Predicts NUMBER_OF_PREDICTIONS names for extracted path-context lines "target source,path,target ...".
+        Lines can be raw extractor output or already processed csv lines.
+        """
+        predictions = self.predictors[net].predict_lines(self.readers[net], lines)
+        return [{"target": target, "names": names} for target, names in predictions]
+
+    def handle(self, query: Dict) -> Dict:
+        """
+        Handles one of queries:
+            {"java": "source code"} - predicts names with all loaded nets;
+            {"net": "vec", "lines": ["target source,path,target ..."]}.
+        Returns:
+            dict with list of {"target": ..., "names": [...]} for every used net.
+        """
+        if "java" in query:
+            if self.extractor is None:
+                self.extractor = JavaExtractorDaemon()
+            contexts = self.extractor.extract(code=query["java"])
+            return {net.value: self.predict_lines(net, contexts[net]) for net in self.models}
+        net = NetType(query["net"])
+        if net not in self.models:
+            raise ValueError(f"Net {net.value} is not loaded")
+        return {net.value: self.predict_lines(net, query["lines"])}
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """POST / with json query handled by PredictionServer.handle, GET / to check that server is alive"""
+
+    def _send_json(self, code: int, body: Dict):
+        encoded = json.dumps(body).encode("utf8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def do_GET(self):
+        self._send_json(200, {"nets": [net.value for net in self.server.predictions.models]})
+
+    def do_POST(self):
+        """Bad queries get 400, any other failure (extractor, TensorFlow) gets 500, client always gets an answer"""
+        try:
+            query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if not isinstance(query, dict):
+                raise ValueError("Query must be a json object")
+            response = self.server.predictions.handle(query)
+        except (KeyError, ValueError) as e:
+            self.log_error("Bad query: %r", e)
+            self._send_json(400, {"error": repr(e)})
+        except Exception as e:
+            self.log_error("Query failed: %r", e)
+            traceback.print_exc(file=sys.stderr)
+            self._send_json(500, {"error": repr(e)})
+        else:
+            self._send_json(200, response)
+
+
+class PredictionHTTPServer(HTTPServer):
+    def __init__(self, address, predictions: PredictionServer):
+        super(PredictionHTTPServer, self).__init__(address, PredictionRequestHandler)
+        self.predictions = predictions
+
+
+def request_predictions(url: str, query: Dict) -> Dict:
+    """Sends query to running prediction server, raises RuntimeError with error of server if query failed"""
+    http_request = url_request.Request(url, data=json.dumps(query).encode("utf8"),
+                                       headers={"Content-Type": "application/json"})
+    try:
+        with url_request.urlopen(http_request) as response:
+            return json.loads(response.read())
+    except url_error.HTTPError as e:
+        raise RuntimeError(f"Prediction server answered {e.code}: {e.read().decode('utf8', 'replace')}") from e
+
+
+def server_is_running(url: str) -> bool:
+    """Is prediction server answering on url, nets it loaded are listed by GET"""
+    try:
+        with url_request.urlopen(url, timeout=5) as response:
+            return "nets" in json.loads(response.read())
+    except (url_error.URLError, OSError, ValueError):
+        return False
+
+
+def write_results(predictions: List[Dict], path: str):
+    """Writes predictions to csv in the same format as code2var.py --run"""
+    with open(path, "w", encoding="utf8") as file:
+        writer = csv.writer(file)
+        for prediction in predictions:
+            writer.writerow([prediction["target"], *prediction["names"]])
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--host",
+                        dest="host",
+                        default=config.config.PREDICTION_SERVER_HOST)
+    parser.add_argument("--port",
+                        dest="port",
+                        type=int,
+                        default=config.config.PREDICTION_SERVER_PORT)
+    parser.add_argument("--net",
+                        dest="nets",
+                        help="net to load: var or vec. Both are loaded by default",
+                        action="append",
+                        required=False)
+    parser.add_argument("--cache_dir",
+                        dest="cache_dir",
+                        help="dir with prediction caches, methods with unchanged contexts are not predicted again",
+                        required=False)
+    parser.add_argument("--client_file",
+                        dest="client_file",
+                        help="send java file to running server and write result.{net}.csv files to --output_dir",
+                        required=False)
+    parser.add_argument("--output_dir",
+                        dest="output_dir",
+                        default="tmp_data_for_code2var")
+    parser.add_argument("--check",
+                        dest="check",
+                        help="exit with code 0 if server is running on --host and --port, 1 otherwise",
+                        action="store_true")
+    args = parser.parse_args()
+
+    url = f"http://{args.host}:{args.port}/"
+    if args.check:
+        sys.exit(0 if server_is_running(url) else 1)
+    elif args.client_file is not None:
+        with open(args.client_file, "r", encoding="utf8") as file:
+            results = request_predictions(url, {"java": file.read()})
+        for net_name, net_predictions in results.items():
+            write_results(net_predictions, os.path.join(args.output_dir, f"result.{net_name}.csv"))
+    else:
+        nets = [NetType(net) for net in args.nets] if args.nets else list(NetType)
+        server = PredictionHTTPServer((args.host, args.port), PredictionServer(nets, args.cache_dir))
+        print("Serving predictions on", url)
+        server.serve_forever()
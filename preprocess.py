@@ -1,27 +1,29 @@
 #!/usr/bin/python
 import fnmatch
+import heapq
+import multiprocessing
 import os
 import pickle
 import random
-import pandas as pd
+import shutil
+import struct
 import config
 
 from argparse import ArgumentParser
-from collections import namedtuple
-from enum import Enum
-from typing import Optional, List, Callable
+from collections import Counter, namedtuple
+from typing import Any, Optional, List, Callable, Dict, Set, Tuple
+from net_type import NetType
 
 FreqDictLine = namedtuple("FreqDictLine", ["name", "frequency"])
 
+SHARD_MAGIC = b"C2VSHRD1"
+# max contexts, token, path and target vocab sizes, fingerprint of vocabs
+SHARD_HEADER = struct.Struct("<8sIQQQ32s")
+
 APPROVED_SHORT_TARGETS = {"i", "j", "k", "e", "s", "o", "db", "fs", "it", "is", "in", "to"}
 BAD_LONG_TARGETS = {"element", "object", "variable", "var", "func", "function"}
 
 
-class NetType(Enum):
-    code2var = "var"
-    code2vec = "vec"
-
-
 default_filters = [
     lambda line: line.frequency > config.config.DEFAULT_MIN_OCCURENCES,
 ]
@@ -29,7 +31,8 @@ default_filters = [
 
 def parse_vocab(path: str,
                 limit: Optional[int] = None,
-                filters: Optional[List[Callable]] = default_filters):
+                filters: Optional[List[Callable]] = default_filters,
+                key: Callable[[str], Any] = str):
     """
         Parse histogram files containing target|token|path and their frequency pairs.
         Creates word to frequency dicts for future uploading to the Vocab.
@@ -39,7 +42,9 @@ def parse_vocab(path: str,
     Args:
         path (): string contains path to file with parsed pairs "word frequency"
         limit (): optional hyper-parameter that should protect freq_dicts from being too big if minimal frequency is too low.
+            Only limit most frequent words are kept.
         filters (): functions used to filter inappropriate targets
+        key (): type of words, int for hashed paths
     Raises:
         ValueError if file opened from path is empty or doesn't content any matching required pair line.
     Returns:
@@ -48,10 +53,12 @@ def parse_vocab(path: str,
 
     with open(path, "r") as file:
         word_to_freq = (line.rstrip("\n").split(" ") for line in file)
-        word_to_freq = (FreqDictLine(line[0], int(line[1])) for line in word_to_freq if len(line) == 2)
+        word_to_freq = (FreqDictLine(key(line[0]), int(line[1])) for line in word_to_freq if len(line) == 2)
         word_to_freq = filter(lambda line: all(f(line) for f in filters), word_to_freq)
-        word_to_freq = sorted(word_to_freq, key=lambda line: line.frequency)
-        word_to_freq = dict(word_to_freq[:limit])
+        if limit is not None:
+            # Bounded heap keeps only limit most frequent lines in memory.
+            word_to_freq = heapq.nlargest(limit, word_to_freq, key=lambda line: line.frequency)
+        word_to_freq = dict(word_to_freq)
     if len(word_to_freq) != 0:
         return word_to_freq
     raise ValueError(f"Empty or incorrect file given. Path: {path}")
@@ -59,43 +66,207 @@ def parse_vocab(path: str,
 
 def save_dictionaries(path_freq, target_freq_train, word_freq, output_filename):
     """
-        Dumps generated word to frequency dictionaries to .c2v.dict file using pickle
+        Dumps generated word to frequency dictionaries to .c2v.dict file using pickle.
+        Fingerprint of vocabs created from them is dumped after them, so it is not computed on every load.
     """
+    from vocabulary import Code2VecFreqDicts, freq_dicts_fingerprint
+
     output_file_path = output_filename + ".c2v.dict"
+    fingerprint = freq_dicts_fingerprint(Code2VecFreqDicts(token_freq_dict=word_freq, path_freq_dict=path_freq,
+                                                           target_freq_dict=target_freq_train))
     with open(output_file_path, "wb") as file:
         pickle.dump(word_freq, file)
         pickle.dump(path_freq, file)
         pickle.dump(target_freq_train, file)
+        pickle.dump(fingerprint, file)
         print(f"Frequency dictionaries saved to: {output_filename}.c2v.dict")
 
 
-def process_file(file_path, max_contexts, out_file_path, target_freq=None):
+def _split_to_chunks(file_path: str, chunks_number: int) -> List[Tuple[int, int]]:
+    """
+        Splits file to byte ranges [start, end) that begin and end on line boundaries.
+    """
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, "rb") as file:
+        for idx in range(1, chunks_number):
+            file.seek(max(size * idx // chunks_number - 1, boundaries[-1]))
+            file.readline()
+            boundaries.append(file.tell())
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+def _process_chunk(file_path: str, start: int, end: int, max_contexts: int, out_file_path: str,
+                   targets: Optional[Set[str]], seed: str) -> Tuple[Counter, Counter]:
+    """
+        Processes lines starting in [start, end) byte range of file_path the same way as process_file does.
+        Contexts are sampled with own generator seeded by seed, forked workers share state of random module.
+    Returns:
+        token and path frequencies of contexts written to out_file_path.
+    """
+    token_freq, path_freq = Counter(), Counter()
+    rng = random.Random(seed)
+    with open(file_path, "rb") as file, open(out_file_path, "w") as output:
+        file.seek(start)
+        position = start
+        for line in file:
+            if position >= end:
+                break
+            position += len(line)
+            contexts = line.decode("utf-8").rstrip("\n").split(" ")
+            target, contexts = contexts[0], contexts[1:]
+            if targets is None or target in targets:
+                line = create_csv_line(target, contexts, max_contexts, rng)
+                output.write(f"{line}\n")
+                for context in line.split(" ")[1:]:
+                    context = context.split(",")
+                    if len(context) == 3:
+                        token_freq[context[0]] += 1
+                        path_freq[context[1]] += 1
+                        token_freq[context[2]] += 1
+    return token_freq, path_freq
+
+
+def process_file(file_path, max_contexts, out_file_path, target_freq=None, workers: Optional[int] = None,
+                 seed: int = 42):
     """
         Process file with AST paths, generate new csv file with correct number of context (each line should have similar
         number of tuple (leave, path, leave) even if it is empty
+
+        File is split to byte ranges processed by separate processes, so token and path histograms are counted
+        in the same pass. Empty contexts used as filler are not counted.
     Args:
         file_path (): path to file containing AST paths to be parsed
         max_contexts (): limit max number of paths in AST for each fucntion.
             Functions with lower number of paths will be filled with empty ones.
         out_file_path (): path to csv file that will be generated
         target_freq (): word to frequency dict that will filter functions before adding them to csv.
+        workers (): number of processes, all cores are used by default.
+        seed (): contexts of chunk are sampled with generator seeded by seed and index of chunk, so csv is
+            the same for the same number of workers.
     Returns:
-        None
-    """
-    with open(file_path, 'r') as file:
-        with open(out_file_path + '.csv', 'w') as output:
-            for idx, line in enumerate(file):
-                contexts = line.rstrip('\n').split(" ")
-                if len(contexts) == 0:
-                    raise RuntimeError(f"One of lines in your file has wrong size. Line {idx}: {line}")
-                target, contexts = contexts[0], contexts[1:]
-                if target_freq is None or target in target_freq:
-                    if len(contexts) > max_contexts:
-                        contexts = random.sample(contexts, max_contexts)
-                    empty_filler = " " * (max_contexts - len(contexts))
-                    output.write(f"{target} {' '.join(contexts)}{empty_filler}\n")
+        token and path frequencies of contexts written to csv.
+    """
+    chunks = _split_to_chunks(file_path, workers or os.cpu_count())
+    part_paths = [f"{out_file_path}.csv.part{idx}" for idx in range(len(chunks))]
+    targets = None if target_freq is None else set(target_freq)
+    token_freq, path_freq = Counter(), Counter()
+    if len(chunks) != 0:
+        with multiprocessing.Pool(len(chunks)) as pool:
+            results = pool.starmap(_process_chunk,
+                                   [(file_path, start, end, max_contexts, part_path, targets, f"{seed}:{idx}")
+                                    for idx, ((start, end), part_path) in enumerate(zip(chunks, part_paths))])
+        for chunk_token_freq, chunk_path_freq in results:
+            token_freq.update(chunk_token_freq)
+            path_freq.update(chunk_path_freq)
+    with open(out_file_path + '.csv', 'wb') as output:
+        for part_path in part_paths:
+            with open(part_path, "rb") as part:
+                shutil.copyfileobj(part, output)
+            os.remove(part_path)
     print(f"processed {file_path}")
     print(f"generated {out_file_path}.csv")
+    return token_freq, path_freq
+
+
+def save_histogram(freq: Dict[str, int], path: str):
+    """
+        Saves frequencies to file with "word frequency" lines that can be parsed by parse_vocab
+    """
+    with open(path, "w") as file:
+        for word, frequency in freq.items():
+            file.write(f"{word} {frequency}\n")
+
+
+def create_csv_line(target: str, contexts: List[str], max_contexts: int, rng: Optional[random.Random] = None) -> str:
+    """
+        Creates csv line with exactly max_contexts contexts. Random contexts are taken if function has more of them,
+        missing ones are filled with empty fields. rng - generator contexts are sampled with, random module by default.
+    """
+    if len(contexts) > max_contexts:
+        contexts = (rng or random).sample(contexts, max_contexts)
+    empty_filler = " " * (max_contexts - len(contexts))
+    return f"{' '.join([target, *contexts])}{empty_filler}"
+
+
+def shard_header(vocabs, max_contexts: int) -> bytes:
+    """Header of binary shards exported with vocabs, shards are readable only with the same vocabs"""
+    return SHARD_HEADER.pack(SHARD_MAGIC, max_contexts, len(vocabs.token_vocab.index_to_word),
+                             len(vocabs.path_vocab.index_to_word), len(vocabs.target_vocab.index_to_word),
+                             vocabs.fingerprint())
+
+
+def export_shards(csv_path: str, vocabs, output_dir: str, max_contexts: int,
+                  shard_size: int = config.config.SHARD_SIZE):
+    """
+        Converts csv file generated by process_file to binary shards with already looked up vocab indices,
+        so PathContextReader can stream them without any string parsing.
+
+        Each shard is SHARD_HEADER followed by raw little-endian int32 matrix. Every row is
+        [target, source tokens (max_contexts), paths (max_contexts), target tokens (max_contexts)],
+        words out of vocab are filled with DEFAULT_INT32_LOOKUP_VALUE.
+        Header keeps sizes and fingerprint of vocabs, so PathContextReader refuses shards of other vocabs.
+        Rows keep csv order, so validation and test splits made by PathContextReader stay the same.
+    Args:
+        csv_path (): path to csv file generated by process_file
+        vocabs (): Code2VecVocabs used for training
+        output_dir (): directory where shard-xxxxx.bin files will be generated
+        max_contexts (): number of contexts in each csv line
+        shard_size (): max number of rows in one shard
+    Returns:
+        list of paths to generated shards
+    """
+    import numpy as np
+
+    default_value = config.config.DEFAULT_INT32_LOOKUP_VALUE
+    token_to_index = vocabs.token_vocab.word_to_index
+    path_to_index = vocabs.path_vocab.word_to_index
+    target_to_index = vocabs.target_vocab.word_to_index
+    path_key = str
+    if vocabs.path_vocab.int_keys:
+        # Empty path is not in vocab, the same as for Vocab.get_lookup_index.
+        path_key = lambda path: int(path) if path else None
+
+    # Empty filler fields are looked up by PathContextReader as empty strings, so shards do the same.
+    empty_row = np.full(1 + 3 * max_contexts, token_to_index.get("", default_value), dtype="<i4")
+    empty_row[1 + max_contexts:1 + 2 * max_contexts] = path_to_index.get("", default_value)
+
+    os.makedirs(output_dir, exist_ok=True)
+    rows = np.tile(empty_row, (shard_size, 1))
+    shards = []
+    header = shard_header(vocabs, max_contexts)
+
+    def write_shard(rows_number):
+        shard_path = os.path.join(output_dir, f"shard-{len(shards):05d}.bin")
+        with open(shard_path, "wb") as shard:
+            shard.write(header)
+            shard.write(rows[:rows_number].tobytes())
+        shards.append(shard_path)
+        rows[:] = empty_row
+
+    rows_number = 0
+    with open(csv_path, "r") as file:
+        for line in file:
+            fields = line.rstrip("\n").split(" ")
+            row = rows[rows_number]
+            row[0] = target_to_index.get(fields[0], default_value)
+            for idx, context in enumerate(fields[1:max_contexts + 1]):
+                context = context.split(",")
+                if len(context) != 3:
+                    continue
+                source, path, target = context
+                row[1 + idx] = token_to_index.get(source, default_value)
+                row[1 + max_contexts + idx] = path_to_index.get(path_key(path), default_value)
+                row[1 + 2 * max_contexts + idx] = token_to_index.get(target, default_value)
+            rows_number += 1
+            if rows_number == shard_size:
+                write_shard(rows_number)
+                rows_number = 0
+    if rows_number != 0:
+        write_shard(rows_number)
+    print(f"exported {csv_path} to {len(shards)} shards in {output_dir}")
+    return shards
 
 
 def _find(pattern, path):
@@ -107,23 +278,37 @@ def _find(pattern, path):
     return result
 
 
-def create_target_vocab(data_files: List[str], output_name: str, min_folders: Optional[int] = 1, combined_data=None):
-    if min_folders != 0:
-        df = []
-        for file_path in data_files:
-            df.append(pd.read_csv(file_path, sep=" ", usecols=[0], names=["Target"], header=None))
-            df[-1]["Frequency"] = 1
-            df[-1] = df[-1].groupby("Target").sum().reset_index()
-            df[-1]["Folders"] = 1
-        vocab = pd.concat(df)
-        vocab = vocab.groupby(["Target"]).sum().reset_index()
-        vocab = vocab.query(f"Folders > {min_folders}")
-        with open(output_name, "w") as file:
-            for target, freq in zip(vocab["Target"], vocab["Frequency"]):
-                file.write(f"{target} {freq}\n")
-    else:
-        os.system(
-            f"cat {combined_data} | cut -d' ' -f1 |" + " awk '{n[$0]++} END {for (i in n) print i,n[i]}' " + f" > {output_name}")
+def _count_targets(file_path: str) -> Counter:
+    """
+        Counts targets (first words of lines) in .data.log file
+    """
+    targets = Counter()
+    with open(file_path, "rb") as file:
+        for line in file:
+            target = line.split(b" ", 1)[0].rstrip(b"\n")
+            if target:
+                targets[target.decode("utf-8")] += 1
+    return targets
+
+
+def create_target_vocab(data_files: List[str], output_name: str, min_folders: int = 1,
+                        workers: Optional[int] = None):
+    """
+        Counts targets in all data files in parallel and saves ones found in more than min_folders files
+        to "target frequency" histogram. Each .data.log file is generated for single folder.
+    Args:
+        data_files (): paths to .data.log files
+        output_name (): path to generated histogram
+        min_folders (): targets should be found in more than min_folders files to be saved
+        workers (): number of processes, all cores are used by default.
+    """
+    target_freq, target_folders = Counter(), Counter()
+    with multiprocessing.Pool(min(workers or os.cpu_count(), len(data_files))) as pool:
+        for file_targets in pool.imap_unordered(_count_targets, data_files):
+            target_freq.update(file_targets)
+            target_folders.update(file_targets.keys())
+    save_histogram({target: frequency for target, frequency in target_freq.items()
+                    if target_folders[target] > min_folders}, output_name)
 
 
 def process_net(data_dir_path: str, combined_data_path: str, output_name: str, net_type: NetType,
@@ -155,33 +340,41 @@ def process_net(data_dir_path: str, combined_data_path: str, output_name: str, n
     target_vocab_path = f"{output_name}.{net_type.value}.target.vocab"
     token_vocab_path = f"{output_name}.{net_type.value}.token.vocab"
     path_vocab_path = f"{output_name}.{net_type.value}.path.vocab"
-    create_target_vocab(data_files, target_vocab_path, min_folders, combined_data=combined_data_path)
+    create_target_vocab(data_files, target_vocab_path, min_folders, workers=args.workers)
 
     target_freq = parse_vocab(target_vocab_path, filters=target_filters)
 
-    process_file(file_path=combined_data_path,
-                 max_contexts=args.max_contexts,
-                 target_freq=target_freq,
-                 out_file_path=f"{args.output_name}.{net_type.value}")
-
-    # Generate token - frequency file to future parsing in parse_vocab.
-    # Splits csv file by space remove path and generate frequency for each line.
-    # csv is split instead of .code2vec/var because we don't want redundant tokens from not filtered functions to be included.
-    os.system(f"cut -d' ' -f2- < {args.output_name}.{net_type.value}.csv | tr ' ' '\n' | cut -d',' -f1,3 | tr ',' '\n' | "
-              "awk '{n[$0]++} END {for (i in n) print i,n[i]}' > " + token_vocab_path)
-    # Generate path - frequency file to future parsing in parse_vocab.
-    # Splits csv file by space remove tokens and generate frequency for each line.
-    # csv is split instead of .code2vec/var because we don't want redundant paths from not filtered functions to be included.
-    os.system(f"cut -d' ' -f2- < {args.output_name}.{net_type.value}.csv | tr ' ' '\n' | cut -d',' -f2 | "
-              "awk '{n[$0]++} END {for (i in n) print i,n[i]}' > " + path_vocab_path)
+    token_freq, path_freq = process_file(file_path=combined_data_path,
+                                         max_contexts=args.max_contexts,
+                                         target_freq=target_freq,
+                                         out_file_path=f"{args.output_name}.{net_type.value}",
+                                         workers=args.workers)
+
+    # Token and path histograms are counted from generated csv instead of .code2vec/var,
+    # because we don't want redundant tokens and paths from not filtered functions to be included.
+    save_histogram(token_freq, token_vocab_path)
+    save_histogram(path_freq, path_vocab_path)
+    # Hashed paths are kept as int64 keys, so path vocab and its lookup table are smaller and faster.
     path_freq = parse_vocab(path_vocab_path, config.config.MAX_NUMBER_OF_WORDS_IN_FREQ_DICT,
-                            filters=[lambda line: True])
+                            filters=[lambda line: True], key=int if config.config.HASHED_PATHS else str)
     word_freq = parse_vocab(token_vocab_path)
 
     save_dictionaries(target_freq_train=target_freq, path_freq=path_freq,
                       word_freq=word_freq,
                       output_filename=f"{args.output_name}.{net_type.value}")
 
+    if args.export_shards or args.save_vocabs:
+        from vocabulary import Code2VecVocabs
+        vocabs = Code2VecVocabs(net_type, freq_dicts_path=f"{args.output_name}.{net_type.value}.c2v.dict")
+    if args.save_vocabs:
+        vocabs.save(f"{args.output_name}.{net_type.value}.c2v.vocabs")
+    if args.export_shards:
+        export_shards(csv_path=f"{args.output_name}.{net_type.value}.csv",
+                      vocabs=vocabs,
+                      output_dir=f"{args.output_name}.{net_type.value}.shards",
+                      max_contexts=args.max_contexts,
+                      shard_size=args.shard_size)
+
 
 if __name__ == '__main__':
     parser = ArgumentParser()
@@ -212,11 +405,29 @@ if __name__ == '__main__':
                         help="Minimal folders number for target to be found for passing filter.",
                         type=int,
                         default=1)
+    parser.add_argument("--workers",
+                        dest="workers",
+                        help="Number of processes used to process data files. All cores are used by default.",
+                        type=int,
+                        default=None)
     parser.add_argument("--output_name",
                         dest="output_name",
                         metavar="FILE",
                         required=True,
                         default='data')
+    parser.add_argument("--export_shards",
+                        dest="export_shards",
+                        help="export generated csv to binary shards with vocab indices for PathContextReader",
+                        action="store_true")
+    parser.add_argument("--save_vocabs",
+                        dest="save_vocabs",
+                        help="save vocabs created from generated frequency dicts in mapped format",
+                        action="store_true")
+    parser.add_argument("--shard_size",
+                        dest="shard_size",
+                        help="Max number of functions in one binary shard.",
+                        type=int,
+                        default=config.config.SHARD_SIZE)
     args = parser.parse_args()
 
     net: NetType = NetType(args.net)
@@ -63,20 +63,14 @@ cd JavaExtractor/JPredict/ && mvn clean -q install && cd ../..
 echo "Obfuscating flag set " ${OBFUSCATING}
 
 
-# Extract AST path for code2vec
+# Extract AST path for code2vec and code2var with one parse of every file
 echo "Processing train files from "${TRAIN_FILES_DIR}
 ${PYTHON} JavaExtractor/extract.py -maxlen ${MAX_PATH_LENGTH} -maxwidth ${MAX_PATH_WIDTH} -j ${EXTRACTOR_JAR} \
-  --dir ${TRAIN_FILES_DIR} --obfuscate ${OBFUSCATING} 2>&1 | tee ${TRAIN_FILES_DIR}var_processing.log
+  --dir ${TRAIN_FILES_DIR} --both_modes true --obfuscate ${OBFUSCATING} 2>&1 | tee ${TRAIN_FILES_DIR}var_processing.log
 
 find ${TRAIN_FILES_DIR} -name '*vec.data.log' -exec cat {} > ${TRAIN_PATH_VEC} \;
 echo "Done. Generated ${TRAIN_PATH_VEC}"
 
-
-# Extract AST path for code2var
-echo "Processing train files from "${TRAIN_FILES_DIR}
-${PYTHON} JavaExtractor/extract.py -maxlen ${MAX_PATH_LENGTH} -maxwidth ${MAX_PATH_WIDTH} -j ${EXTRACTOR_JAR} \
-  --dir ${TRAIN_FILES_DIR} --only_for_vars true  --obfuscate ${OBFUSCATING} 2>&1 | tee ${TRAIN_FILES_DIR}var_processing.log
-
 find ${TRAIN_FILES_DIR} -name '*var.data.log' -exec cat {} > ${TRAIN_PATH_VAR} \;
 echo "Done. Generated ${TRAIN_PATH_VAR}"
 
@@ -7,16 +7,17 @@ PYTHON=python3
 FILE=$1
 OUTPUT_DIR=$2
 
-cd JavaExtractor/JPredict/ && mvn clean -q install && cd ../..
+# Extractor is built only once instead of on every call.
+if [ ! -f ${EXTRACTOR_JAR} ]
+  then
+    cd JavaExtractor/JPredict/ && mvn clean -q install && cd ../..
+fi
 
 chmod +x JavaExtractor/extract.py
 mkdir "$OUTPUT_DIR"/t/
 mv "$FILE" "$OUTPUT_DIR"/t/
 ${PYTHON} JavaExtractor/extract.py -maxlen ${MAX_PATH_LENGTH} -maxwidth ${MAX_PATH_WIDTH} -j ${EXTRACTOR_JAR} \
-  --dir "$OUTPUT_DIR"/ --obfuscate true  2>&1 | tee "$OUTPUT_DIR"/processing.log
-
-${PYTHON} JavaExtractor/extract.py -maxlen ${MAX_PATH_LENGTH} -maxwidth ${MAX_PATH_WIDTH} -j ${EXTRACTOR_JAR} \
-  --dir "$OUTPUT_DIR"/ --only_for_vars true --obfuscate true  2>&1 | tee "$OUTPUT_DIR"/processing.log
+  --dir "$OUTPUT_DIR"/ --both_modes true --obfuscate true --cache_dir "${EXTRACTION_CACHE_DIR:-.extraction_cache}" 2>&1 | tee "$OUTPUT_DIR"/processing.log
 
 chmod +x preprocess.py
 
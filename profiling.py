@@ -0,0 +1,178 @@
+#!/usr/bin/python
+import time
+import numpy as np
+import tensorflow as tf
+
+from argparse import ArgumentParser
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+
+def _examples_in(element) -> int:
+    """Number of examples in dataset element: size of the first axis of batched tensors, 1 for scalars"""
+    first = tf.nest.flatten(element)[0]
+    return int(tf.shape(first)[0]) if first.shape.rank else 1
+
+
+def measure_throughput(dataset: tf.data.Dataset, max_elements: int, warmup_elements: int = 1) -> float:
+    """
+    Returns examples per second given by dataset. The first warmup_elements are not measured,
+    as they include tracing of map functions and filling of shuffle buffer.
+    """
+    iterator = iter(dataset)
+    for _ in range(warmup_elements):
+        if next(iterator, None) is None:
+            break
+    examples = 0
+    start = time.perf_counter()
+    for _, element in zip(range(max_elements), iterator):
+        examples += _examples_in(element)
+    return examples / max(time.perf_counter() - start, 1e-9)
+
+
+def profile_reader_stages(reader, batches: int) -> Dict[str, float]:
+    """
+    Measures examples per second of every stage of PathContextReader, see get_stage_datasets.
+    Stage which is much slower than the previous one is the bottleneck of reading.
+    """
+    return {name: measure_throughput(dataset, batches) for name, dataset in reader.get_stage_datasets().items()}
+
+
+class InputTimer:
+    """
+    Records when batches of training dataset become ready, so StepTimeCallback can tell
+    how long every step waited for its batch.
+    """
+
+    def __init__(self):
+        self.ready: Deque[Tuple[float, int]] = deque()
+
+    def wrap(self, dataset: tf.data.Dataset) -> tf.data.Dataset:
+        """Adds the last stage to batched dataset of (inputs, targets) which records time of every batch"""
+
+        def record(targets):
+            self.ready.append((time.perf_counter(), int(targets.shape[0])))
+            return targets
+
+        def stage(inputs, targets):
+            recorded = tf.py_function(record, [targets], targets.dtype)
+            recorded.set_shape(targets.shape)
+            return inputs, recorded
+
+        return dataset.map(stage)
+
+    def pop(self) -> Optional[Tuple[float, int]]:
+        """Returns ready time and size of the oldest not consumed batch"""
+        return self.ready.popleft() if self.ready else None
+
+    def clear(self):
+        self.ready.clear()
+
+
+class StepTimeCallback(tf.keras.callbacks.Callback):
+    """
+    Logs mean step time, examples per second consumed by fit and input wait fraction, i.e. share of step time
+    spent waiting for batch which was not ready yet when the step began. Wait fraction close to 1 means
+    that reader is the bottleneck, close to 0 - the model.
+    Epoch means are added to logs as step_time_ms, examples_per_sec and input_wait, so CSVLogger
+    and TensorBoard placed after this callback record them.
+    Step wait is known only if training dataset is wrapped by input_timer.
+    """
+
+    def __init__(self, log_every: int = 100, input_timer: Optional[InputTimer] = None):
+        super(StepTimeCallback, self).__init__()
+        self.log_every = log_every
+        self.input_timer = input_timer
+        self.step_begin = 0.
+        self.epoch_totals = np.zeros(4)
+        self.window_totals = np.zeros(4)
+
+    def on_epoch_begin(self, epoch, logs=None):
+        # step time, wait time, examples, steps
+        self.epoch_totals = np.zeros(4)
+        self.window_totals = np.zeros(4)
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self.step_begin = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        step_end = time.perf_counter()
+        wait = 0.
+        examples = 0
+        ready = self.input_timer.pop() if self.input_timer is not None else None
+        if ready is not None:
+            ready_time, examples = ready
+            wait = min(max(ready_time - self.step_begin, 0.), step_end - self.step_begin)
+        step = np.array([step_end - self.step_begin, wait, examples, 1])
+        self.epoch_totals += step
+        self.window_totals += step
+        if self.log_every > 0 and (batch + 1) % self.log_every == 0:
+            print(f"\nstep {batch + 1}: {self._format(self.window_totals)}")
+            self.window_totals = np.zeros(4)
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self.input_timer is not None:
+            # Batches prefetched by iterator of finished epoch are never consumed.
+            self.input_timer.clear()
+        step_time, wait, examples, steps = self.epoch_totals
+        if steps == 0:
+            return
+        print(f"\nepoch {epoch + 1}: {self._format(self.epoch_totals)}")
+        if logs is not None:
+            logs["step_time_ms"] = float(1000 * step_time / steps)
+            logs["input_wait"] = float(wait / max(step_time, 1e-9))
+            if self.input_timer is not None:
+                logs["examples_per_sec"] = float(examples / max(step_time, 1e-9))
+
+    def _format(self, totals: np.ndarray) -> str:
+        step_time, wait, examples, steps = totals
+        message = f"{1000 * step_time / steps:.1f} ms/step"
+        if self.input_timer is not None:
+            message += (f", {examples / max(step_time, 1e-9):.0f} examples/sec, "
+                        f"input wait {100 * wait / max(step_time, 1e-9):.1f}%")
+        return message
+
+
+def parse_profile_steps(value: str) -> Tuple[int, int]:
+    """Parses "start,stop" window of train steps traced by tf.profiler"""
+    start, stop = (int(step) for step in value.split(","))
+    if not 0 < start <= stop:
+        raise ValueError(f"Wrong profile steps window {value}, expected start,stop with 0 < start <= stop")
+    return start, stop
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measures examples per second of every stage of PathContextReader")
+    parser.add_argument("--net",
+                        dest="net",
+                        help="net destination type var or vec",
+                        required=False,
+                        default="vec")
+    parser.add_argument("--data",
+                        dest="data",
+                        help="csv generated by preprocess",
+                        required=False)
+    parser.add_argument("--shards_dir",
+                        dest="shards_dir",
+                        help="Dir with binary shards generated by preprocess.py --export_shards, used instead of csv",
+                        required=False,
+                        default=None)
+    parser.add_argument("--batches",
+                        dest="batches",
+                        help="number of batches read from every stage",
+                        type=int,
+                        required=False,
+                        default=200)
+    args = parser.parse_args()
+
+    from path_context_reader import PathContextReader
+    from net_type import NetType
+    from vocabulary import Code2VecVocabs
+
+    reader = PathContextReader(vocabs=Code2VecVocabs(NetType(args.net)), csv_path=args.data, is_train=True,
+                               shards_dir=args.shards_dir)
+    previous = None
+    for stage, examples_per_sec in profile_reader_stages(reader, args.batches).items():
+        slowdown = f" (x{previous / examples_per_sec:.2f} slower than previous)" if previous else ""
+        print(f"{stage:>8}: {examples_per_sec:10.0f} examples/sec{slowdown}")
+        previous = examples_per_sec
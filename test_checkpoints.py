@@ -0,0 +1,56 @@
+import numpy as np
+import os
+import tensorflow as tf
+
+from checkpoints import AsyncCheckpoint, restore_latest
+
+ROWS = 12000
+
+
+def create_model():
+    inputs = tf.keras.Input(shape=(None,), dtype=tf.int32)
+    embedded = tf.keras.layers.Embedding(ROWS, 4, name="paths_embed")(inputs)
+    outputs = tf.keras.layers.Dense(3, activation="softmax", name="possible_targets")(
+        tf.keras.layers.GlobalAveragePooling1D()(embedded))
+    model = tf.keras.Model(inputs, outputs)
+    model.compile(optimizer=tf.keras.optimizers.SGD(0.5), loss="sparse_categorical_crossentropy")
+    return model
+
+
+def train(model, rows):
+    model.fit(tf.constant(rows, shape=(len(rows), 1)), tf.zeros(len(rows), tf.int32), epochs=1, verbose=0)
+
+
+def assert_same_weights(model, other):
+    for weight, other_weight in zip(model.weights, other.weights):
+        np.testing.assert_array_equal(np.array(weight), np.array(other_weight))
+
+
+def test_checkpoint_is_restored_with_its_deltas(tmp_path):
+    model = create_model()
+    checkpoint = AsyncCheckpoint(str(tmp_path), max_to_keep=1, incremental=True, full_every=3)
+    checkpoint.set_model(model)
+    for epoch, rows in enumerate([[1, 2, 3], [5], [7, 8], [9], [10]]):
+        train(model, rows)
+        checkpoint.on_epoch_end(epoch)
+    checkpoint.on_train_end()
+    # Full checkpoints after epochs 1 and 4, the first one is deleted with its deltas.
+    files = sorted(os.listdir(tmp_path))
+    assert not any(name.startswith("ckpt-1.") for name in files)
+    assert any(name.startswith("ckpt-4.delta-000005.") for name in files)
+
+    restored = create_model()
+    assert restore_latest(str(tmp_path), restored, restored.optimizer) == 5
+    assert_same_weights(model, restored)
+    assert int(restored.optimizer.iterations.numpy()) == int(model.optimizer.iterations.numpy())
+
+
+def test_only_improved_checkpoints_are_saved(tmp_path):
+    model = create_model()
+    checkpoint = AsyncCheckpoint(str(tmp_path), monitor="loss")
+    checkpoint.set_model(model)
+    checkpoint.on_epoch_end(0, {"loss": 2.})
+    checkpoint.on_epoch_end(1, {"loss": 3.})
+    checkpoint.wait()
+    assert tf.train.latest_checkpoint(str(tmp_path)).endswith("ckpt-1")
+    assert restore_latest(str(tmp_path / "empty"), create_model()) == 0
@@ -0,0 +1,64 @@
+import json
+import numpy as np
+
+from code_vectors import BruteForceIndex, IVFIndex, load_code_vectors
+
+
+def random_vectors(count=2000, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    return (centers[rng.integers(0, 20, count)] + 0.3 * rng.normal(size=(count, dim))).astype(np.float32)
+
+
+def test_brute_force_finds_itself():
+    vectors = random_vectors()
+    ids, scores = BruteForceIndex(vectors).search(vectors[:10], 3)
+    assert ids.shape == (10, 3)
+    assert list(ids[:, 0]) == list(range(10))
+    assert np.allclose(scores[:, 0], 1, atol=1e-5)
+
+
+def test_ivf_probing_all_lists_is_exact():
+    vectors = random_vectors()
+    queries = random_vectors(count=20, seed=1)
+    exact_ids, exact_scores = BruteForceIndex(vectors).search(queries, 5)
+    index = IVFIndex.build(vectors, lists=16)
+    ids, scores = index.search(queries, 5, n_probe=16)
+    assert np.allclose(scores, exact_scores, atol=1e-5)
+    assert (ids == exact_ids).mean() > 0.95
+
+
+def test_ivf_save_load(tmp_path):
+    vectors = random_vectors()
+    index = IVFIndex.build(vectors, lists=8)
+    index.save(str(tmp_path / "index.npz"))
+    loaded = IVFIndex.load(str(tmp_path / "index.npz"), vectors)
+    assert np.array_equal(loaded.search(vectors[:5], 4)[0], index.search(vectors[:5], 4)[0])
+
+
+def test_load_code_vectors(tmp_path):
+    vectors = random_vectors(count=10).astype(np.float16)
+    prefix = str(tmp_path / "vectors")
+    vectors.tofile(prefix + ".vectors")
+    with open(prefix + ".ids", "w") as file:
+        file.writelines(f"name{i}\n" for i in range(10))
+    with open(prefix + ".json", "w") as file:
+        json.dump({"count": 10, "dim": 16, "dtype": "float16"}, file)
+    loaded, names = load_code_vectors(prefix)
+    assert np.array_equal(loaded, vectors)
+    assert names[3] == "name3"
+
+
+def test_export_empty_code_vectors(tmp_path):
+    import tensorflow as tf
+    from code_vectors import export_code_vectors
+    inputs = [tf.keras.Input(shape=(None, 1), dtype=tf.int32) for _ in range(3)]
+    outputs = tf.keras.layers.GlobalAveragePooling2D()(
+        tf.keras.layers.Embedding(10, 6)(tf.keras.layers.Concatenate(axis=1)(inputs)))
+    empty = tf.data.Dataset.from_tensor_slices(
+        (tuple(tf.zeros((0, 2, 1), tf.int32) for _ in range(3)), tf.constant([], tf.string))).batch(4)
+    prefix = str(tmp_path / "vectors")
+    assert export_code_vectors(tf.keras.Model(inputs, outputs), empty, prefix) == 0
+    vectors, names = load_code_vectors(prefix)
+    assert vectors.shape == (0, 6)
+    assert names == []
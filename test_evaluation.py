@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from evaluation import SubtokenMetric, TopKAccuracy
+
+WORDS = ["NOTHING", "get|value", "get|max|value", "set|value", "size"]
+
+
+def index_to_word_table():
+    return tf.lookup.StaticHashTable(
+        tf.lookup.KeyValueTensorInitializer(tf.range(len(WORDS), dtype=tf.int32), tf.constant(WORDS)),
+        default_value="NOTHING")
+
+
+def predictions():
+    # NOTHING is the most probable for every example and must be skipped.
+    return tf.constant([[0.9, 0.05, 0.03, 0.01, 0.01],
+                        [0.9, 0.01, 0.06, 0.02, 0.01],
+                        [0.9, 0.01, 0.01, 0.02, 0.06]])
+
+
+def test_top_k_accuracy_counts_all_examples():
+    top1 = TopKAccuracy(1)
+    top2 = TopKAccuracy(2)
+    targets = tf.constant([[1], [1], [3]])
+    for metric in [top1, top2]:
+        metric.update_state(targets, predictions())
+        metric.update_state(targets, predictions())
+    assert top1.result().numpy() == pytest.approx(1 / 3)
+    assert top2.result().numpy() == pytest.approx(2 / 3)
+
+
+def test_top_k_accuracy_of_string_targets():
+    metric = TopKAccuracy(1, index_to_word_table())
+    metric.update_state(tf.constant(["get|value", "unknown|name", "size"]), predictions())
+    assert metric.result().numpy() == pytest.approx(2 / 3)
+
+
+def test_subtoken_metrics():
+    targets = tf.constant(["get|value", "get|value", "set|value"])
+    results = {}
+    for kind in ["precision", "recall", "f1"]:
+        metric = SubtokenMetric(kind, index_to_word_table())
+        metric.update_state(targets, predictions())
+        results[kind] = metric.result().numpy()
+    # get|value / get|value: 2 tp; get|max|value / get|value: 2 tp, 1 fp; size / set|value: 1 fp, 2 fn.
+    assert results["precision"] == pytest.approx(4 / 6)
+    assert results["recall"] == pytest.approx(4 / 6)
+    assert results["f1"] == pytest.approx(4 / 6)
+    assert np.isfinite(results["f1"])
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+from vocabulary import Vocab
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Net is built with Keras 2, which is chosen on the first import of TensorFlow, so it runs in its own process.
+SAVED_MODEL_PARITY = """
+import os
+import sys
+import config
+from net import Predictor, code2vec
+from export_model import ExportedPredictor, export_saved_model
+from path_context_reader import PathContextReader
+from preprocess import create_csv_line, save_dictionaries
+from vocabulary import Code2VecVocabs
+
+directory = sys.argv[1]
+config.config.MAX_CONTEXTS = 3
+config.config.CREATE_VOCAB = True
+lines = [create_csv_line(f"name|{i % 7}", [f"a{i % 3},{i % 5},b{i % 2}", f"b{i % 4},{i % 3},a{i % 2}"], 3)
+         for i in range(30)]
+with open(os.path.join(directory, "data.csv"), "w") as file:
+    file.write("".join(line + "\\n" for line in lines))
+save_dictionaries({str(path): 1 for path in range(5)}, {f"name|{target}": 1 for target in range(7)},
+                  {f"{token}{i}": 1 for token in "ab" for i in range(4)}, os.path.join(directory, "data"))
+vocabs = Code2VecVocabs(freq_dicts_path=os.path.join(directory, "data.c2v.dict"))
+model = code2vec(token_vocab_size=len(vocabs.token_vocab.word_to_index),
+                 target_vocab_size=len(vocabs.target_vocab.word_to_index),
+                 path_vocab_size=len(vocabs.path_vocab.word_to_index),
+                 custom_metrics=[], max_contexts=3, token_embed_dim=4, path_embed_dim=4, lazy_adam=False)
+model.build_model()
+export_saved_model(model, os.path.join(directory, "saved_model"))
+
+dataset = PathContextReader(vocabs, os.path.join(directory, "data.csv"), is_train=False,
+                            prediction_batch_size=8).get_dataset()
+predictor = Predictor(model, vocabs)
+keras_predictions = list(predictor.predict(dataset))
+# The last batch is smaller, it must not trace predict_batch again.
+assert predictor.predict_batch.experimental_get_tracing_count() == 1
+exported_predictions = list(ExportedPredictor(os.path.join(directory, "saved_model"), vocabs).predict(dataset))
+assert len(keras_predictions) == 30
+assert keras_predictions == exported_predictions, (keras_predictions, exported_predictions)
+assert all("NOTHING" not in names and len(names) == 5 for _, names in exported_predictions)
+"""
+
+
+def test_exported_predictor_skips_special_words():
+    from export_model import ExportedPredictor
+    predictor = ExportedPredictor.__new__(ExportedPredictor)
+    predictor.index_to_word = Vocab(["a", "b", "c"]).index_to_word
+    predictor.number_of_special = 1
+    predictor.k = 2
+    predictor._predict_probabilities = lambda inputs: np.array([[0.7, 0.1, 0.05, 0.15], [0.1, 0.2, 0.4, 0.3]])
+    names, probabilities = predictor.predict_batch([])
+    assert names == [["c", "a"], ["b", "c"]]
+    np.testing.assert_allclose(probabilities, [[0.15, 0.1], [0.4, 0.3]])
+
+
+def test_saved_model_predicts_as_keras_net(tmp_path):
+    pytest.importorskip("tf_keras")
+    result = subprocess.run([sys.executable, "-c", SAVED_MODEL_PARITY, str(tmp_path)], cwd=ROOT,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                            env=dict(os.environ, TF_USE_LEGACY_KERAS="1"))
+    assert result.returncode == 0, result.stderr[-3000:]
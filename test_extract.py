@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+from argparse import Namespace
+
+import java_extractor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "JavaExtractor"))
+from extract import ExtractFeaturesForDirWithCache
+
+# Stands for JavaExtractor.App --daemon: answers requests from several threads and counts how many were in flight.
+FAKE_DAEMON = """
+import json
+import os
+import sys
+import threading
+import time
+
+threads = int(sys.argv[sys.argv.index("--num_threads") + 1])
+lock = threading.Lock()
+slots = threading.Semaphore(threads)
+in_flight = peak = 0
+
+
+def handle(request):
+    global in_flight, peak
+    with lock:
+        in_flight += 1
+        peak = max(peak, in_flight)
+    time.sleep(0.2)
+    name = os.path.basename(request["path"])[:-len(".java")]
+    response = {"id": request["id"], "vec": [name + " a,1,b"], "var": [name + " c,2,d"]}
+    with lock:
+        in_flight -= 1
+        print(json.dumps(response), flush=True)
+    slots.release()
+
+
+workers = []
+for line in sys.stdin:
+    slots.acquire()
+    workers.append(threading.Thread(target=handle, args=(json.loads(line),)))
+    workers[-1].start()
+for worker in workers:
+    worker.join()
+with open(os.environ["FAKE_DAEMON_PEAK"], "w") as file:
+    file.write(str(peak))
+"""
+
+
+def test_cold_cache_extracts_files_of_dir_concurrently(tmp_path, monkeypatch):
+    fake_daemon = tmp_path / "fake_daemon.py"
+    fake_daemon.write_text(FAKE_DAEMON)
+    jar = tmp_path / "extractor.jar"
+    jar.write_text("")
+    project = tmp_path / "project"
+    project.mkdir()
+    for i in range(8):
+        (project / f"File{i}.java").write_text(f"class File{i} {{}}")
+    popen = subprocess.Popen
+    monkeypatch.setattr(java_extractor.subprocess, "Popen",
+                        lambda command, **kwargs: popen([sys.executable, str(fake_daemon)] + command, **kwargs))
+    monkeypatch.setenv("FAKE_DAEMON_PEAK", str(tmp_path / "peak"))
+    args = Namespace(jar=str(jar), max_path_length=8, max_path_width=2, obfuscate=False, hash64=False,
+                     num_threads=4, cache_dir=str(tmp_path / "cache"), both_modes=True, only_vars=False)
+
+    assert ExtractFeaturesForDirWithCache(args, str(project))[2] == 0
+    assert int((tmp_path / "peak").read_text()) == 4
+    assert (tmp_path / "project.vec.data.log").read_text() == "".join(f"File{i} a,1,b\n" for i in range(8))
+    assert (tmp_path / "project.var.data.log").read_text() == "".join(f"File{i} c,2,d\n" for i in range(8))
+
+    # Warm cache does not start daemon at all.
+    monkeypatch.setattr(java_extractor.subprocess, "Popen", None)
+    assert ExtractFeaturesForDirWithCache(args, str(project))[2] == 0
+    assert (tmp_path / "project.vec.data.log").read_text() == "".join(f"File{i} a,1,b\n" for i in range(8))
@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Keras version is chosen on the first import of TensorFlow, so every check runs in its own process.
+LAZY_ADAM_STEPS = """
+import numpy as np
+import tensorflow as tf
+from net import GPUEmbedding, LazyAdam
+
+embedding = GPUEmbedding(100, 4)
+embedding.build(None)
+before = embedding.embeddings.numpy().copy()
+optimizer = LazyAdam(0.1)
+for _ in range(3):
+    with tf.GradientTape() as tape:
+        loss = tf.reduce_sum(embedding(tf.constant([[1, 2]])) ** 2)
+    optimizer.apply_gradients(zip(tape.gradient(loss, embedding.trainable_variables), embedding.trainable_variables))
+after = embedding.embeddings.numpy()
+assert np.array_equal(before[3:], after[3:]), "rows out of batch were moved"
+assert not np.allclose(before[1:3], after[1:3]), "rows of batch were not moved"
+"""
+
+SAMPLED_SOFTMAX_CHECKPOINTS = """
+import sys
+import numpy as np
+import tensorflow as tf
+from checkpoints import AsyncCheckpoint
+from net import code2vec
+
+model = code2vec(token_vocab_size=10, target_vocab_size=50, path_vocab_size=10, custom_metrics=[],
+                 max_contexts=3, token_embed_dim=4, path_embed_dim=4, num_sampled_targets=5, lazy_adam=False)
+assert model.checkpoint_monitor == "loss"
+random = np.random.default_rng(0)
+inputs = tuple(tf.constant(random.integers(1, 10, (64, 3, 1)), tf.int32) for _ in range(3))
+dataset = tf.data.Dataset.from_tensor_slices((inputs, random.integers(1, 50, 64).astype(np.int32))).batch(16)
+checkpoint = AsyncCheckpoint(sys.argv[1], max_to_keep=1, monitor=model.checkpoint_monitor)
+model.train(dataset, 3, [checkpoint], verbose=0)
+assert checkpoint.best is not None, "checkpoints were saved without comparison"
+assert checkpoint.best == min(model.history.history["loss"])
+"""
+
+
+def run_with_keras(legacy: bool, code: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code, *args], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, env=dict(os.environ, TF_USE_LEGACY_KERAS="1" if legacy else "0"))
+
+
+def test_lazy_adam_moves_only_rows_of_batch():
+    pytest.importorskip("tf_keras")
+    result = run_with_keras(True, LAZY_ADAM_STEPS)
+    assert result.returncode == 0, result.stderr
+
+
+def test_lazy_adam_is_refused_without_optimizer_v2():
+    result = run_with_keras(False, "from net import LazyAdam\nLazyAdam()")
+    assert "LazyAdam needs OptimizerV2 API" in result.stderr
+
+
+def test_net_falls_back_to_adam_without_optimizer_v2():
+    code = ("from net import LazyAdam, code2vec\n"
+            "model = code2vec(token_vocab_size=10, target_vocab_size=10, path_vocab_size=10, custom_metrics=[],\n"
+            "                 lazy_adam=True)\n"
+            "assert not isinstance(model._create_optimizer(), LazyAdam)\n")
+    env = dict(os.environ)
+    # Default command of training, TensorFlow picks Keras 3.
+    env.pop("TF_USE_LEGACY_KERAS", None)
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True, env=env)
+    assert result.returncode == 0, result.stderr
+    assert "net is trained with Adam" in result.stdout
+
+
+class FakeVocabs:
+    training_freq_dict_path = "data.c2v.dict"
+
+    def __init__(self, fingerprint: bytes):
+        self._fingerprint = fingerprint
+
+    def fingerprint(self) -> bytes:
+        return self._fingerprint
+
+
+def test_weights_are_refused_without_matching_info(tmp_path):
+    from net import NET_FORMAT_VERSION, check_weights_info, save_weights_info
+    weights_path = str(tmp_path / "weights.hdf5")
+    with pytest.raises(RuntimeError, match="train net with code2var.py --train"):
+        check_weights_info(weights_path)
+    (tmp_path / "weights.hdf5").write_text("")
+    with pytest.raises(RuntimeError, match="has to be retrained"):
+        check_weights_info(weights_path)
+    save_weights_info(weights_path, FakeVocabs(b"vocabs"))
+    check_weights_info(weights_path)
+    check_weights_info(weights_path, FakeVocabs(b"vocabs"))
+    with pytest.raises(RuntimeError, match="other vocabs"):
+        check_weights_info(weights_path, FakeVocabs(b"other"))
+    (tmp_path / "weights.hdf5.json").write_text(f'{{"net_format": {NET_FORMAT_VERSION - 1}, "vocabs": ""}}')
+    with pytest.raises(RuntimeError, match="has to be retrained"):
+        check_weights_info(weights_path)
+
+
+def test_sampled_softmax_checkpoints_keep_the_best_loss(tmp_path):
+    pytest.importorskip("tf_keras")
+    result = run_with_keras(True, SAMPLED_SOFTMAX_CHECKPOINTS, str(tmp_path))
+    assert result.returncode == 0, result.stderr[-3000:]
+    assert "without comparison" not in result.stdout
@@ -4,7 +4,7 @@ import tensorflow as tf
 import pytest
 import typing
 import config
-from path_context_reader import PathContextReader
+from path_context_reader import PathContextReader, ReaderInputTensors
 from vocabulary import Code2VecVocabs
 
 
@@ -19,3 +19,121 @@ def test_get_dataset():
     it = it.get_next()
     assert it.target_index.shape[0] == it.path_source_token_indices.shape[0]
 
+
+
+def test_padding_is_cut_after_last_real_context():
+    contexts = tf.constant([[[4], [0], [2], [0], [0]],
+                            [[0], [0], [3], [0], [0]],
+                            [[1], [0], [0], [0], [0]]])
+    tensors = ReaderInputTensors(path_source_token_indices=contexts[0],
+                                 path_indices=contexts[1],
+                                 path_target_token_indices=contexts[2])
+    source, paths, target = PathContextReader._parse_reader_input_tensor(tensors)
+    assert source.shape == (3, 1)
+    assert list(paths.numpy()[:, 0]) == [0, 0, 3]
+
+
+def test_batch_contexts_pads_to_the_longest_in_batch():
+    lengths = [1, 7, 2, 8, 1, 2]
+    dataset = tf.data.Dataset.from_generator(
+        lambda: ((tuple(tf.ones((length, 1), tf.int32) for _ in range(3)), length) for length in lengths),
+        output_signature=(tuple(tf.TensorSpec((None, 1), tf.int32) for _ in range(3)), tf.TensorSpec((), tf.int32)))
+    padded = [inputs[0].shape[1] for inputs, _ in PathContextReader._batch_contexts(dataset, 2)]
+    assert padded == [7, 8, 2]
+    bucketed = [sorted(targets.numpy()) for _, targets in PathContextReader._batch_contexts(dataset, 2, [4])]
+    assert sorted(map(list, bucketed)) == [[1, 2], [1, 2], [7, 8]]
+
+
+def test_padding_of_batch_is_cut_after_its_longest_example():
+    contexts = tf.constant([[[[4], [0], [0], [0]], [[1], [2], [0], [0]]],
+                            [[[0], [0], [0], [0]], [[0], [0], [3], [0]]],
+                            [[[1], [0], [0], [0]], [[0], [0], [0], [0]]]])
+    tensors = ReaderInputTensors(path_source_token_indices=contexts[0],
+                                 path_indices=contexts[1],
+                                 path_target_token_indices=contexts[2])
+    source, paths, target = PathContextReader._parse_reader_input_tensor(tensors)
+    assert source.shape == (2, 3, 1)
+    assert list(paths.numpy()[1, :, 0]) == [0, 0, 3]
+
+
+def test_split_contexts_of_batch_pads_empty_contexts():
+    contexts = tf.constant([["a,1,b", ""], ["c,2,d", "e,3,f"]])
+    sources, paths, targets = PathContextReader._split_contexts(contexts)
+    assert sources.shape == (2, 2, 1)
+    assert [[p.decode() for p in row] for row in paths.numpy()[:, :, 0]] == [["1", ""], ["2", "3"]]
+    sources, paths, targets = PathContextReader._split_contexts(tf.constant([["", ""]]))
+    assert targets.shape == (1, 2, 1)
+
+
+def write_csv_and_freq_dicts(tmp_path, lines):
+    from preprocess import save_dictionaries
+    csv_path = tmp_path / "data.csv"
+    csv_path.write_text("".join(line + "\n" for line in lines))
+    contexts = [context.split(",") for line in lines for context in line.split(" ")[1:] if context]
+    save_dictionaries({context[1]: 1 for context in contexts},
+                      {line.split(" ")[0]: 1 for line in lines},
+                      {token: 1 for context in contexts for token in (context[0], context[2])},
+                      str(tmp_path / "data"))
+    return str(csv_path), str(tmp_path / "data.c2v.dict")
+
+
+def test_shards_are_read_as_csv(tmp_path, monkeypatch):
+    from preprocess import create_csv_line, export_shards
+    monkeypatch.setattr(config.config, "MAX_CONTEXTS", 4)
+    monkeypatch.setattr(config.config, "CREATE_VOCAB", True)
+    lines = [create_csv_line("get|name", ["a,1,b", "c,2,d"], 4),
+             create_csv_line("set|name", ["a,3,d", "e,1,b", "c,2,a", "b,3,e"], 4),
+             create_csv_line("run", ["d,2,c"], 4)]
+    csv_path, freq_dicts_path = write_csv_and_freq_dicts(tmp_path, lines)
+    vocabs = Code2VecVocabs(freq_dicts_path=freq_dicts_path)
+    export_shards(csv_path, vocabs, str(tmp_path / "shards"), 4, shard_size=2)
+
+    from_csv = list(PathContextReader(vocabs, csv_path, is_train=False, prediction_batch_size=2).get_dataset())
+    from_shards = list(PathContextReader(vocabs, csv_path, is_train=False, prediction_batch_size=2,
+                                         shards_dir=str(tmp_path / "shards")).get_dataset())
+    assert len(from_csv) == len(from_shards) == 2
+    for (csv_inputs, csv_targets), (shard_inputs, shard_targets) in zip(from_csv, from_shards):
+        for csv_input, shard_input in zip(csv_inputs, shard_inputs):
+            assert csv_input.numpy().tolist() == shard_input.numpy().tolist()
+        assert csv_targets.numpy().tolist() == shard_targets.numpy().tolist()
+
+
+def test_shards_of_other_vocabs_are_refused(tmp_path, monkeypatch):
+    from preprocess import create_csv_line, export_shards
+    monkeypatch.setattr(config.config, "MAX_CONTEXTS", 2)
+    monkeypatch.setattr(config.config, "CREATE_VOCAB", True)
+    lines = [create_csv_line("get", ["a,1,b"], 2), create_csv_line("set", ["b,2,a"], 2)]
+    csv_path, freq_dicts_path = write_csv_and_freq_dicts(tmp_path, lines)
+    vocabs = Code2VecVocabs(freq_dicts_path=freq_dicts_path)
+    export_shards(csv_path, vocabs, str(tmp_path / "shards"), 2)
+    # Words of the same frequency are indexed in order of freq dicts, so reversed lines give other indices.
+    (tmp_path / "other").mkdir()
+    _, other_freq_dicts_path = write_csv_and_freq_dicts(tmp_path / "other", lines[::-1])
+    other_vocabs = Code2VecVocabs(freq_dicts_path=other_freq_dicts_path)
+    with pytest.raises(ValueError, match="vocabs of the same sizes differ"):
+        PathContextReader(other_vocabs, csv_path, is_train=False, shards_dir=str(tmp_path / "shards")).get_dataset()
+    monkeypatch.setattr(config.config, "MAX_CONTEXTS", 3)
+    with pytest.raises(ValueError, match="other vocabs or MAX_CONTEXTS"):
+        PathContextReader(vocabs, csv_path, is_train=False, shards_dir=str(tmp_path / "shards")).get_dataset()
+
+
+def test_shards_of_hashed_paths_are_read_as_csv(tmp_path, monkeypatch):
+    from preprocess import create_csv_line, export_shards, save_dictionaries
+    monkeypatch.setattr(config.config, "MAX_CONTEXTS", 4)
+    monkeypatch.setattr(config.config, "CREATE_VOCAB", True)
+    lines = [create_csv_line("get", ["a,-7,b", "c,9223372036854775807,d"], 4),
+             create_csv_line("set", ["a,,d", "e,-7,b", ",,"], 4),
+             create_csv_line("run", [], 4)]
+    csv_path, _ = write_csv_and_freq_dicts(tmp_path, lines)
+    save_dictionaries({-7: 2, 9223372036854775807: 1}, {"get": 1, "set": 1, "run": 1},
+                      {token: 1 for token in "abcde"}, str(tmp_path / "hashed"))
+    vocabs = Code2VecVocabs(freq_dicts_path=str(tmp_path / "hashed.c2v.dict"))
+    assert vocabs.path_vocab.int_keys
+    export_shards(csv_path, vocabs, str(tmp_path / "shards"), 4)
+
+    from_csv = list(PathContextReader(vocabs, csv_path, is_train=False).get_dataset())
+    from_shards = list(PathContextReader(vocabs, csv_path, is_train=False,
+                                         shards_dir=str(tmp_path / "shards")).get_dataset())
+    for csv_input, shard_input in zip(from_csv[0][0], from_shards[0][0]):
+        assert csv_input.numpy().tolist() == shard_input.numpy().tolist()
+    assert from_shards[0][0][1].numpy()[:, :, 0].tolist() == [[1, 2], [0, 1], [0, 0]]
@@ -0,0 +1,57 @@
+from prediction_cache import PredictionCache
+
+
+def test_key_does_not_depend_on_contexts_order_and_padding():
+    cache = PredictionCache(":memory:", "v1")
+    assert cache.key("get a,1,b c,2,d  ") == cache.key("other c,2,d a,1,b")
+    assert cache.key("get a,1,b") != cache.key("get a,1,c")
+    assert cache.key("get a,1,b") != PredictionCache(":memory:", "v2").key("get a,1,b")
+
+
+def test_cached_predictions_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = PredictionCache(path, "v1", memory_entries=1)
+    cache.put_many([("a", ["x", "y"]), ("b", ["z"])])
+    assert cache.get_many(["a", "b", "c"]) == {"a": ["x", "y"], "b": ["z"]}
+    cache.close()
+    assert PredictionCache(path, "v1").get_many(["b"]) == {"b": ["z"]}
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    cache = PredictionCache(str(tmp_path / "cache.sqlite"), "v1", memory_entries=0, max_entries=2)
+    cache.put_many([("a", ["1"])])
+    cache.put_many([("b", ["2"])])
+    cache.get_many(["a"])
+    cache.put_many([("c", ["3"])])
+    assert cache.disk_entries == 2
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+
+
+def test_lookup_counts_hits():
+    cache = PredictionCache(":memory:", "v1")
+    cache.put_many([(cache.key("f a,1,b"), ["f"])])
+    keys, found = cache.lookup(["g a,1,b", "h c,2,d"])
+    assert found == {keys[0]: ["f"]}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_methods_with_more_than_max_contexts_are_found(monkeypatch):
+    import config
+    from net import Predictor
+    monkeypatch.setattr(config.config, "MAX_CONTEXTS", 3)
+    predicted = []
+
+    class Reader:
+        def get_dataset_from_lines(self, lines):
+            assert all(len(line.split(" ")) == 4 for line in lines)
+            predicted.extend(lines)
+            return lines
+
+    predictor = Predictor.__new__(Predictor)
+    predictor.cache = PredictionCache(":memory:", "v1")
+    predictor.predict = lambda lines: [(line.split(" ")[0], ["name"]) for line in lines]
+    line = "get " + " ".join(f"a,{path},b" for path in range(10))
+    for _ in range(3):
+        assert list(predictor.predict_lines(Reader(), [line])) == [("get", ["name"])]
+    assert len(predicted) == 1
+    assert (predictor.cache.hits, predictor.cache.misses) == (2, 1)
@@ -0,0 +1,82 @@
+import threading
+import pytest
+
+from net_type import NetType
+from prediction_server import PredictionHTTPServer, PredictionServer, request_predictions, server_is_running
+
+
+class EchoPredictor:
+    """Predicts contexts number of every csv line as its only name"""
+
+    def predict_lines(self, reader, lines):
+        return [(line.split(" ")[0], [str(len([context for context in line.split(" ")[1:] if context]))])
+                for line in lines]
+
+
+class Extractor:
+    def extract(self, code):
+        return {NetType.code2vec: [f"{code} a,1,b c,2,d"], NetType.code2var: [f"{code} a,1,b"]}
+
+
+def create_server(nets):
+    server = PredictionServer.__new__(PredictionServer)
+    server.models = {net: None for net in nets}
+    server.readers = {net: None for net in nets}
+    server.predictors = {net: EchoPredictor() for net in nets}
+    server.extractor = Extractor()
+    return server
+
+
+def test_handle_lines_and_java_queries():
+    server = create_server([NetType.code2vec, NetType.code2var])
+    assert server.handle({"net": "vec", "lines": ["get a,1,b c,2,d  "]}) == \
+        {"vec": [{"target": "get", "names": ["2"]}]}
+    assert server.handle({"java": "run"}) == {"vec": [{"target": "run", "names": ["2"]}],
+                                              "var": [{"target": "run", "names": ["1"]}]}
+
+
+def test_handle_bad_queries():
+    server = create_server([NetType.code2vec])
+    with pytest.raises(ValueError):
+        server.handle({"net": "var", "lines": []})
+    with pytest.raises(ValueError):
+        server.handle({"net": "other", "lines": []})
+    with pytest.raises(KeyError):
+        server.handle({"lines": []})
+
+
+class FailingPredictions:
+    models = {}
+
+    def handle(self, query):
+        if "lines" in query:
+            raise ValueError("bad lines")
+        raise TypeError("failed")
+
+
+@pytest.mark.parametrize("query, code, error", [({"lines": []}, 400, "bad lines"),
+                                                ({"java": ""}, 500, "failed"),
+                                                ([1], 400, "json object")])
+def test_failed_queries_are_answered(query, code, error):
+    http_server = PredictionHTTPServer(("localhost", 0), FailingPredictions())
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with pytest.raises(RuntimeError, match=f"answered {code}:.*{error}"):
+            request_predictions(f"http://localhost:{http_server.server_port}/", query)
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+
+
+def test_running_server_is_found():
+    http_server = PredictionHTTPServer(("localhost", 0), create_server([NetType.code2var]))
+    url = f"http://localhost:{http_server.server_port}/"
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        assert server_is_running(url)
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+    assert not server_is_running(url)
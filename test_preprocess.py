@@ -0,0 +1,54 @@
+from collections import Counter
+from preprocess import create_target_vocab, parse_vocab, process_file
+
+
+def test_process_file_in_chunks(tmp_path):
+    lines = [f"target{i % 3} {' '.join(f'a{j},p{i % 5},b{j}' for j in range(i % 4 + 1))}" for i in range(50)]
+    data_path = tmp_path / "data.log"
+    data_path.write_text("\n".join(lines) + "\n")
+    token_freq, path_freq = process_file(str(data_path), 3, str(tmp_path / "out"), {"target0", "target1"},
+                                         workers=4)
+    csv_lines = (tmp_path / "out.csv").read_text().split("\n")[:-1]
+    kept = [line for line in lines if line.split(" ")[0] != "target2"]
+    assert [line.split(" ")[0] for line in csv_lines] == [line.split(" ")[0] for line in kept]
+    assert all(len(line.split(" ")) == 4 for line in csv_lines)
+    contexts = [context.split(",") for line in csv_lines for context in line.split(" ")[1:] if context]
+    assert token_freq == Counter([context[0] for context in contexts] + [context[2] for context in contexts])
+    assert path_freq == Counter(context[1] for context in contexts)
+
+
+def test_chunks_sample_contexts_independently(tmp_path):
+    # Every chunk has the same lines, contexts sampled with state of random module inherited by workers would match.
+    chunk = "".join(f"target{i} {' '.join(f'a{j},p{j},b{j}' for j in range(20))}\n" for i in range(10))
+    data_path = tmp_path / "data.log"
+    data_path.write_text(chunk * 4)
+    process_file(str(data_path), 3, str(tmp_path / "out"), workers=4)
+    csv_lines = (tmp_path / "out.csv").read_text().split("\n")[:-1]
+    assert len({tuple(csv_lines[i:i + 10]) for i in range(0, 40, 10)}) == 4
+    process_file(str(data_path), 3, str(tmp_path / "again"), workers=4)
+    assert (tmp_path / "again.csv").read_text() == (tmp_path / "out.csv").read_text()
+
+
+def test_create_target_vocab(tmp_path):
+    data_files = []
+    for folder, targets in enumerate([["get", "set", "get"], ["get", "run"], ["run", "is"]]):
+        data_path = tmp_path / f"{folder}.vec.data.log"
+        data_path.write_text("".join(f"{target} a,p,b\n" for target in targets))
+        data_files.append(str(data_path))
+    create_target_vocab(data_files, str(tmp_path / "all.vocab"), min_folders=0, workers=2)
+    create_target_vocab(data_files, str(tmp_path / "common.vocab"), min_folders=1, workers=2)
+    assert parse_vocab(str(tmp_path / "all.vocab"), filters=[]) == {"get": 3, "set": 1, "run": 2, "is": 1}
+    assert parse_vocab(str(tmp_path / "common.vocab"), filters=[]) == {"get": 3, "run": 2}
+
+
+def test_parse_vocab_keeps_most_frequent(tmp_path):
+    vocab_path = tmp_path / "words.vocab"
+    vocab_path.write_text("rare 1\nint 100\na 2\nc 10\n")
+    assert list(parse_vocab(str(vocab_path), 2, filters=[]).items()) == [("int", 100), ("c", 10)]
+    assert parse_vocab(str(vocab_path), filters=[]) == {"rare": 1, "int": 100, "a": 2, "c": 10}
+
+
+def test_parse_vocab_of_hashed_paths(tmp_path):
+    vocab_path = tmp_path / "path.vocab"
+    vocab_path.write_text("-8070450532247928832 3\n42 1\n")
+    assert parse_vocab(str(vocab_path), filters=[], key=int) == {-8070450532247928832: 3, 42: 1}
@@ -0,0 +1,43 @@
+import pytest
+import tensorflow as tf
+
+from profiling import InputTimer, StepTimeCallback, measure_throughput, parse_profile_steps
+
+
+def batched_dataset(batches=5, batch_size=4):
+    inputs = tf.zeros((batches * batch_size, 3, 1), dtype=tf.int32)
+    targets = tf.range(batches * batch_size)
+    return tf.data.Dataset.from_tensor_slices(((inputs, inputs, inputs), targets)).batch(batch_size)
+
+
+def test_measure_throughput_counts_examples_of_batches():
+    assert measure_throughput(batched_dataset(), max_elements=10) > 0
+    assert measure_throughput(tf.data.Dataset.range(3), max_elements=10) > 0
+
+
+def test_input_timer_records_every_batch():
+    timer = InputTimer()
+    batches = list(timer.wrap(batched_dataset()))
+    assert len(batches) == 5
+    assert [size for _, size in timer.ready] == [4] * 5
+    assert list(batches[1][1].numpy()) == [4, 5, 6, 7]
+
+
+def test_step_time_callback_adds_epoch_means_to_logs():
+    timer = InputTimer()
+    callback = StepTimeCallback(log_every=0, input_timer=timer)
+    callback.on_epoch_begin(0)
+    for batch, _ in enumerate(timer.wrap(batched_dataset(batches=3))):
+        callback.on_train_batch_begin(batch)
+        callback.on_train_batch_end(batch)
+    logs = {}
+    callback.on_epoch_end(0, logs)
+    assert set(logs) == {"step_time_ms", "input_wait", "examples_per_sec"}
+    assert 0 <= logs["input_wait"] <= 1
+    assert len(timer.ready) == 0
+
+
+def test_parse_profile_steps():
+    assert parse_profile_steps("100,110") == (100, 110)
+    with pytest.raises(ValueError):
+        parse_profile_steps("10,5")
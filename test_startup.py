@@ -0,0 +1,12 @@
+import pytest
+
+from benchmark_startup import LIGHT_COMMANDS, heavy_imports
+
+
+@pytest.mark.parametrize("name", sorted(LIGHT_COMMANDS))
+def test_light_commands_do_not_import_heavy_modules(name):
+    assert heavy_imports(LIGHT_COMMANDS[name]) == []
+
+
+def test_heavy_imports_are_found():
+    assert "tensorflow" in heavy_imports(["-c", "import path_context_reader"])
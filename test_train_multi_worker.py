@@ -0,0 +1,66 @@
+import os
+import pytest
+import config
+
+from train_multi_worker import create_tf_configs, get_free_ports, run_workers
+
+
+def test_create_tf_configs():
+    configs = create_tf_configs([2222, 2223])
+    assert [config["task"] for config in configs] == [{"type": "worker", "index": 0},
+                                                      {"type": "worker", "index": 1}]
+    assert all(config["cluster"] == {"worker": ["localhost:2222", "localhost:2223"]} for config in configs)
+
+
+def test_get_free_ports():
+    ports = get_free_ports(3)
+    assert len(set(ports)) == 3
+
+
+def write_tiny_dataset(directory, max_contexts, lines_number=40):
+    from preprocess import create_csv_line, save_dictionaries
+    lines = [create_csv_line(f"name|{i}", [f"a{i % 3},{i % 5},b{i % 2}", f"b{i % 2},{i % 7},a{i % 3}"], max_contexts)
+             for i in range(lines_number)]
+    csv_path = os.path.join(directory, "dataset", "tiny", "tiny.vec.csv")
+    os.makedirs(os.path.dirname(csv_path))
+    with open(csv_path, "w") as file:
+        file.write("".join(line + "\n" for line in lines))
+    freq_dicts_path = os.path.join(directory, "dataset", "tiny", "tiny.vec.c2v.dict")
+    save_dictionaries({str(path): 1 for path in range(7)},
+                      {f"name|{i}": 1 for i in range(lines_number)},
+                      {token: 1 for token in ["a0", "a1", "a2", "b0", "b1"]},
+                      freq_dicts_path[:-len(".c2v.dict")])
+    return csv_path, freq_dicts_path
+
+
+def test_workers_read_their_own_lines(tmp_path, monkeypatch):
+    from path_context_reader import PathContextReader
+    from vocabulary import Code2VecVocabs
+    for name, value in [("MAX_CONTEXTS", 2), ("VALIDATION_SIZE", 4), ("TEST_SIZE", 0), ("NUM_TRAIN_EPOCHS", 1),
+                        ("CREATE_VOCAB", True)]:
+        monkeypatch.setattr(config.config, name, value)
+    csv_path, freq_dicts_path = write_tiny_dataset(str(tmp_path), 2)
+    targets = []
+    for worker_index in range(2):
+        reader = PathContextReader(Code2VecVocabs(freq_dicts_path=freq_dicts_path), csv_path, is_train=True,
+                                   num_workers=2, worker_index=worker_index)
+        targets.append([int(target) for _, batch in reader.get_dataset() for target in batch.numpy()])
+    assert len(targets[0]) == len(targets[1]) == 18
+    assert sorted(targets[0] + targets[1]) == list(range(5, 41))
+
+
+def test_two_workers_train_one_model(tmp_path, monkeypatch):
+    pytest.importorskip("net")
+    write_tiny_dataset(str(tmp_path), config.config.MAX_CONTEXTS)
+    monkeypatch.chdir(tmp_path)
+    # Net is written for Keras 2, TensorFlow 2.16+ has it as tf_keras.
+    monkeypatch.setenv("TF_USE_LEGACY_KERAS", "1")
+    return_code = run_workers(2, ["--dataset", "tiny", "--net", "vec", "--freq_dicts", "dataset/tiny/tiny.vec.c2v.dict",
+                                  "--epochs", "1", "--steps_per_epoch", "1", "--validation_size", "0",
+                                  "--checkpoints_dir", "checkpoints"], "logs")
+    assert return_code == 0
+    # Only chief saves checkpoints and logs.
+    assert (tmp_path / "checkpoints" / "weights.hdf5").exists()
+    assert (tmp_path / "checkpoints" / "weights.hdf5.json").exists()
+    assert (tmp_path / "training.log").exists()
+    assert "saved to" not in (tmp_path / "logs" / "worker-1.log").read_text()
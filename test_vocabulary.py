@@ -1,3 +1,4 @@
+import hashlib
 from argparse import Namespace
 from itertools import chain
 import tensorflow as tf
@@ -11,17 +12,24 @@ def test_create_from_freq_dict():
     freq_dict = {"a": 2, "c": 10, "int": 100, "A": 1}
     vocab = Vocab.create_from_freq_dict(freq_dict)
     assert {word: i for i, word in
-            enumerate(['NOTHING', 'A', 'a', 'c', 'int'])} == vocab.word_to_index
+            enumerate(['NOTHING', 'int', 'c', 'a', 'A'])} == vocab.word_to_index
     assert {i: word for i, word in
-            enumerate(['NOTHING', 'A', 'a', 'c', 'int'])} == vocab.index_to_word
+            enumerate(['NOTHING', 'int', 'c', 'a', 'A'])} == vocab.index_to_word
 
 
-def test_save_load_vocab():
+def test_create_from_freq_dict_keeps_most_frequent():
+    freq_dict = {"a": 2, "c": 10, "int": 100, "A": 1}
+    vocab = Vocab.create_from_freq_dict(freq_dict, 2)
+    assert {word: i for i, word in
+            enumerate(['NOTHING', 'int', 'c'])} == vocab.word_to_index
+
+
+def test_save_load_vocab(tmp_path):
     freq_dict = {"a": 2, "c": 10, "int": 100, "A": 1}
     vocab = Vocab.create_from_freq_dict(freq_dict)
-    with open("dump_vocab.v.c2v", 'wb') as file:
+    with open(tmp_path / "dump_vocab.v.c2v", 'wb') as file:
         vocab.save_to_file(file)
-    with open("dump_vocab.v.c2v", 'rb') as file:
+    with open(tmp_path / "dump_vocab.v.c2v", 'rb') as file:
         new_vocab = Vocab.load_from_file(file)
     assert vocab.word_to_index == new_vocab.word_to_index
     assert vocab.index_to_word == new_vocab.index_to_word
@@ -49,3 +57,69 @@ def test_load_c2v_vocab():
     config.config.CREATE_VOCAB = False
     config.config.CODE2VEC_VOCABS_PATH = "dump_c2v_vocabs.c2v.vocabs"
     c2v_vocabs = Code2VecVocabs()
+
+
+def test_save_load_mapped_vocab(tmp_path):
+    freq_dict = {"a": 2, "c": 10, "int": 100, "A": 1}
+    vocab = Vocab.create_from_freq_dict(freq_dict, 10)
+    with open(tmp_path / "dump_vocab.mapped.c2v", 'wb') as file:
+        vocab.save_to_mapped_file(file)
+    with open(tmp_path / "dump_vocab.mapped.c2v", 'rb') as file:
+        new_vocab, _ = Vocab.load_from_mapped_buffer(file.read())
+    assert vocab.word_to_index == dict(new_vocab.word_to_index)
+    assert vocab.index_to_word == dict(new_vocab.index_to_word)
+    assert "b" not in new_vocab.word_to_index
+    for word, index in vocab.word_to_index.items():
+        assert new_vocab.get_word_to_index_lookup_table().lookup(tf.constant(word)).numpy() == index
+        assert new_vocab.get_index_to_word_lookup_table().lookup(tf.constant(index)).numpy() == word.encode()
+
+
+def test_int_keys_vocab_lookup():
+    freq_dict = {-5: 2, 12: 10, 9223372036854775807: 100}
+    vocab = Vocab.create_from_freq_dict(freq_dict)
+    assert vocab.int_keys
+    words = tf.constant(["9223372036854775807", "12", "-5", "", "7"])
+    assert list(vocab.get_lookup_index(words).numpy()) == [1, 2, 3, 0, 0]
+
+
+def test_save_load_mapped_int_vocab(tmp_path):
+    freq_dict = {-5: 2, 12: 10, 9223372036854775807: 100}
+    vocab = Vocab.create_from_freq_dict(freq_dict)
+    with open(tmp_path / "dump_vocab.mapped_int.c2v", 'wb') as file:
+        vocab.save_to_mapped_file(file)
+    with open(tmp_path / "dump_vocab.mapped_int.c2v", 'rb') as file:
+        new_vocab, _ = Vocab.load_from_mapped_buffer(file.read())
+    assert new_vocab.int_keys
+    assert vocab.word_to_index == dict(new_vocab.word_to_index)
+    assert vocab.index_to_word == dict(new_vocab.index_to_word)
+    assert len(new_vocab.word_to_index) == 4
+    assert 7 not in new_vocab.word_to_index
+    assert list(new_vocab.get_lookup_index(tf.constant(["12", "-5", ""])).numpy()) == [2, 3, 0]
+
+
+def test_fingerprint_of_mapped_vocab(tmp_path):
+    vocab = Vocab.create_from_freq_dict({"a": 2, "c": 10, "int": 100, "A": 1})
+    with open(tmp_path / "dump_vocab.mapped.c2v", 'wb') as file:
+        vocab.save_to_mapped_file(file)
+    with open(tmp_path / "dump_vocab.mapped.c2v", 'rb') as file:
+        new_vocab, _ = Vocab.load_from_mapped_buffer(file.read())
+    assert vocab.fingerprint() == new_vocab.fingerprint()
+    assert vocab.fingerprint() != Vocab.create_from_freq_dict({"a": 2, "c": 10, "int": 1, "A": 100}).fingerprint()
+
+
+def test_fingerprint_is_saved_with_freq_dicts_and_mapped_vocabs(tmp_path, monkeypatch):
+    from preprocess import save_dictionaries
+    save_dictionaries({"1": 3, "2": 1}, {"get": 2, "set": 1}, {"a": 1, "b": 5}, str(tmp_path / "data"))
+    monkeypatch.setattr(config.config, "CREATE_VOCAB", True)
+    vocabs = Code2VecVocabs(freq_dicts_path=str(tmp_path / "data.c2v.dict"))
+    computed = [vocabs.target_vocab, vocabs.path_vocab, vocabs.token_vocab]
+    monkeypatch.setattr(Vocab, "fingerprint", lambda vocab: pytest.fail("fingerprint is computed on load"))
+    fingerprint = vocabs.fingerprint()
+    vocabs.save(str(tmp_path / "vocabs.c2v"))
+
+    monkeypatch.setattr(config.config, "CREATE_VOCAB", False)
+    monkeypatch.setattr(config.config, "CODE2VEC_VOCABS_PATH", str(tmp_path / "vocabs.c2v"))
+    assert Code2VecVocabs().fingerprint() == fingerprint
+    monkeypatch.undo()
+    # Saved one is the same as computed word by word.
+    assert fingerprint == hashlib.sha256(b"".join(vocab.fingerprint() for vocab in computed)).digest()
@@ -8,12 +8,14 @@ if [ $# -eq 0 ]
     exit 1
 fi
 DATASET_NAME=$1
+# Net is var or vec, weights of training-var and training-vec are loaded by default, see config.py
+NET=${3:-var}
 
-if [ $# -eq 2 ]
+if [ $# -ge 2 ]
   then
     CHECKPOINTS_DIR=$2
-    mkdir $2
-    ${PYTHON} code2var.py --dataset $DATASET_NAME --checkpoints_dir $CHECKPOINTS_DIR --net var --train true
   else
-    ${PYTHON} code2var.py --dataset $DATASET_NAME --net var --train true
+    CHECKPOINTS_DIR=training-${NET}
 fi
+mkdir -p $CHECKPOINTS_DIR
+${PYTHON} code2var.py --dataset $DATASET_NAME --checkpoints_dir $CHECKPOINTS_DIR --net $NET --train true
@@ -0,0 +1,80 @@
+#!/usr/bin/python
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from argparse import ArgumentParser
+from typing import Dict, List
+
+
+def get_free_ports(number: int) -> List[int]:
+    """Asks OS for free local ports"""
+    sockets = [socket.socket() for _ in range(number)]
+    for sock in sockets:
+        sock.bind(("localhost", 0))
+    ports = [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return ports
+
+
+def create_tf_configs(ports: List[int]) -> List[Dict]:
+    """Creates TF_CONFIG of every local worker, the first one is chief"""
+    cluster = {"worker": [f"localhost:{port}" for port in ports]}
+    return [{"cluster": cluster, "task": {"type": "worker", "index": index}} for index in range(len(ports))]
+
+
+def run_workers(num_workers: int, train_args: List[str], logs_dir: str) -> int:
+    """
+    Runs code2var.py --train in num_workers local processes, which train one model with MultiWorkerMirroredStrategy.
+    Cores are split between workers. Chief prints to stdout, other workers to logs_dir/worker-{index}.log.
+    Workers run in the current directory, so dataset and checkpoints paths are relative to it.
+    Returns:
+        exit code of the first failed worker or 0.
+    """
+    threads = max(1, (os.cpu_count() or 1) // num_workers)
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "code2var.py"), "--train", "true", "--multi_worker", "true",
+               "--intra_op_threads", str(threads), *train_args]
+    os.makedirs(logs_dir, exist_ok=True)
+    processes = []
+    for index, tf_config in enumerate(create_tf_configs(get_free_ports(num_workers))):
+        env = dict(os.environ, TF_CONFIG=json.dumps(tf_config))
+        output = None if index == 0 else open(os.path.join(logs_dir, f"worker-{index}.log"), "w")
+        processes.append((subprocess.Popen(command, env=env, stdout=output, stderr=output), output))
+
+    return_code = 0
+    while return_code == 0 and any(process.poll() is None for process, _ in processes):
+        time.sleep(1)
+        failed = [process.returncode for process, _ in processes if process.poll() not in (None, 0)]
+        if failed:
+            return_code = failed[0]
+    for process, output in processes:
+        if process.poll() is None:
+            # Other workers would wait for failed one forever.
+            process.terminate()
+        process.wait()
+        if output is not None:
+            output.close()
+        if return_code == 0:
+            return_code = process.returncode
+    return return_code
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Data-parallel training of code2var.py in several local processes. "
+                                        "Unknown arguments are passed to code2var.py, e.g. --dataset and --net")
+    parser.add_argument("--num_workers",
+                        dest="num_workers",
+                        type=int,
+                        required=False,
+                        default=2)
+    parser.add_argument("--logs_dir",
+                        dest="logs_dir",
+                        help="dir for output of non-chief workers",
+                        required=False,
+                        default="logs")
+    args, train_args = parser.parse_known_args()
+    sys.exit(run_workers(args.num_workers, train_args, args.logs_dir))
@@ -1,38 +1,228 @@
+import hashlib
+import heapq
+import mmap
 import pickle
+import struct
 from argparse import Namespace
-from typing import List, Optional, Dict, BinaryIO, NamedTuple, Set
+from collections.abc import Mapping
+from itertools import islice
+from typing import List, Optional, Dict, BinaryIO, NamedTuple, Set, Tuple
 
-import tensorflow as tf
+import numpy as np
+# TensorFlow is imported only by methods building tensors and lookup tables, so tools which only create,
+# save or dump vocabs start without it.
 
 import config
-from preprocess import NetType
+from net_type import NetType
 
 basic_special_words = Namespace(NOTHING='NOTHING')
 
+MAPPED_VOCAB_MAGIC = b"C2VMVOC1"
+# Vocab of int64 keys, e.g. hashed paths
+MAPPED_INT_VOCAB_MAGIC = b"C2VMVOI1"
+# words number, special words number, blob size
+MAPPED_VOCAB_HEADER = struct.Struct("<QQQ")
+# Optional section after mapped vocabs: magic and fingerprint of vocabs, so it is not computed on every load
+MAPPED_FINGERPRINT_MAGIC = b"C2VFPRT1"
+
+
+def _aligned(size: int, alignment: int = 8) -> int:
+    return (size + alignment - 1) // alignment * alignment
+
+
+class MappedWordToIndex(Mapping):
+    """
+    Read-only word to index dict working straight from mapped vocab buffers.
+    Words are stored as sorted utf-8 blob with offsets, so lookup is a binary search.
+    """
+
+    def __init__(self, blob: memoryview, offsets: np.ndarray, indices: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+        self.indices = indices
+
+    def word_bytes(self, position: int) -> bytes:
+        return bytes(self.blob[self.offsets[position]:self.offsets[position + 1]])
+
+    def find(self, word: str) -> Optional[int]:
+        """Returns position of word in sorted blob or None"""
+        encoded = word.encode("utf-8")
+        low, high = 0, len(self.indices)
+        while low < high:
+            middle = (low + high) // 2
+            if self.word_bytes(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.indices) and self.word_bytes(low) == encoded:
+            return low
+        return None
+
+    def __getitem__(self, word: str) -> int:
+        position = self.find(word)
+        if position is None:
+            raise KeyError(word)
+        return int(self.indices[position])
+
+    def __contains__(self, word) -> bool:
+        return isinstance(word, str) and self.find(word) is not None
+
+    def __iter__(self):
+        return (self.word_bytes(position).decode("utf-8") for position in range(len(self.indices)))
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def keys_tensor(self) -> "tf.Tensor":
+        """Cuts all words from blob in-graph, without creating python string for each word"""
+        import tensorflow as tf
+        return tf.strings.substr(tf.constant(bytes(self.blob)),
+                                 tf.constant(self.offsets[:-1].astype(np.int64)),
+                                 tf.constant(np.diff(self.offsets).astype(np.int64)))
+
+    def values_tensor(self) -> "tf.Tensor":
+        import tensorflow as tf
+        return tf.constant(self.indices, dtype=tf.int32)
+
+
+class MappedIndexToWord(Mapping):
+    """Read-only index to word dict working straight from mapped vocab buffers."""
+
+    def __init__(self, word_to_index: MappedWordToIndex, positions: np.ndarray):
+        """positions - position of word with given index in sorted blob"""
+        self.word_to_index = word_to_index
+        self.positions = positions
+
+    def __getitem__(self, index: int) -> str:
+        if not 0 <= index < len(self.positions):
+            raise KeyError(index)
+        return self.word_to_index.word_bytes(self.positions[index]).decode("utf-8")
+
+    def __iter__(self):
+        return iter(range(len(self.positions)))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def keys_tensor(self) -> "tf.Tensor":
+        import tensorflow as tf
+        return tf.range(len(self.positions), dtype=tf.int32)
+
+    def values_tensor(self) -> "tf.Tensor":
+        import tensorflow as tf
+        return tf.gather(self.word_to_index.keys_tensor(), self.positions)
+
+
+class MappedIntWordToIndex(Mapping):
+    """
+    Read-only int64 key to index dict working straight from mapped vocab buffers.
+    Keys are stored sorted, so lookup is a binary search. Special words keep their string keys.
+    """
+
+    def __init__(self, keys: np.ndarray, indices: np.ndarray, special_words: Dict[str, int]):
+        self.sorted_keys = keys
+        self.indices = indices
+        self.special_words = special_words
+
+    def find(self, key: int) -> Optional[int]:
+        """Returns position of key in sorted keys or None"""
+        position = int(np.searchsorted(self.sorted_keys, key))
+        if position < len(self.sorted_keys) and self.sorted_keys[position] == key:
+            return position
+        return None
+
+    def __getitem__(self, key) -> int:
+        if isinstance(key, str):
+            return self.special_words[key]
+        position = self.find(key) if isinstance(key, (int, np.integer)) else None
+        if position is None:
+            raise KeyError(key)
+        return int(self.indices[position])
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        yield from self.special_words
+        yield from (int(key) for key in self.sorted_keys)
+
+    def __len__(self) -> int:
+        return len(self.special_words) + len(self.sorted_keys)
+
+    def keys_tensor(self) -> "tf.Tensor":
+        import tensorflow as tf
+        return tf.constant(self.sorted_keys, dtype=tf.int64)
+
+    def values_tensor(self) -> "tf.Tensor":
+        import tensorflow as tf
+        return tf.constant(self.indices, dtype=tf.int32)
+
+
+class MappedIntIndexToWord(Mapping):
+    """Read-only index to int64 key dict working straight from mapped vocab buffers."""
+
+    def __init__(self, word_to_index: MappedIntWordToIndex, positions: np.ndarray):
+        """positions - position of key with given index (minus number of special words) in sorted keys"""
+        self.word_to_index = word_to_index
+        self.positions = positions
+        self.special_words = {index: word for word, index in word_to_index.special_words.items()}
+
+    def __getitem__(self, index: int):
+        if index in self.special_words:
+            return self.special_words[index]
+        if not 0 <= index - len(self.special_words) < len(self.positions):
+            raise KeyError(index)
+        return int(self.word_to_index.sorted_keys[self.positions[index - len(self.special_words)]])
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __len__(self) -> int:
+        return len(self.special_words) + len(self.positions)
+
+    def keys_tensor(self) -> "tf.Tensor":
+        import tensorflow as tf
+        return tf.range(len(self), dtype=tf.int32)
+
+    def values_tensor(self) -> "tf.Tensor":
+        import tensorflow as tf
+        return tf.concat([tf.constant([self.special_words[index] for index in sorted(self.special_words)]),
+                          tf.strings.as_string(tf.gather(self.word_to_index.keys_tensor(), self.positions))], 0)
+
 
 class Vocab:
     """Implements vocabulary for code2vec model"""
 
     def __init__(self, words: List[str],
-                 special_words: Optional[Namespace] = basic_special_words):
-        """words - """
+                 special_words: Optional[Namespace] = basic_special_words,
+                 int_keys: bool = False):
+        """
+        words - words ordered by index, special words go before them
+        int_keys - words are int64 keys, e.g. hashed paths, special words stay strings
+        """
         self.word_to_index = {word: i for i, word in
                               enumerate([*special_words.__dict__.values(), *words])}
         self.index_to_word = {i: word for word, i in self.word_to_index.items()}
         self.number_of_special = len(special_words.__dict__)
+        self.int_keys = int_keys
         self.lookup_table_word_to_index = None
         self.lookup_table_index_to_word = None
+        self._fingerprint: Optional[bytes] = None
 
     @classmethod
-    def create_from_freq_dict(cls, freq_dict: Dict[str, int], limit: int):
-        sorted_by_occurrences = sorted(freq_dict,
-                                       key=lambda word: freq_dict[word])
-        if len(sorted_by_occurrences) > limit:
-            sorted_by_occurrences = sorted_by_occurrences[
-                                    :limit]
+    def create_from_freq_dict(cls, freq_dict: Dict[str, int], limit: Optional[int] = None):
+        """Creates vocab of limit most frequent words. More frequent words get lower indices"""
+        if limit is not None and limit < len(freq_dict):
+            most_frequent = heapq.nlargest(limit, freq_dict, key=freq_dict.get)
+        else:
+            most_frequent = sorted(freq_dict, key=freq_dict.get, reverse=True)
         print("Creating vocab from frequency dictionary of",
-              len(sorted_by_occurrences), "elements")
-        return cls(words=sorted_by_occurrences)
+              len(most_frequent), "elements")
+        return cls(words=most_frequent, int_keys=_has_int_keys(freq_dict))
 
     @classmethod
     def load_from_file(cls, file: BinaryIO,
@@ -46,7 +236,7 @@ class Vocab:
                 "Wrong special words providen: expected length: " + str(
                     special_words_size) + ", but " + str(
                     len(special_words.__dict__)) + " were given")
-        vocab = Vocab([], special_words)
+        vocab = Vocab([], special_words, int_keys=_has_int_keys(w_t_i))
         vocab.index_to_word = i_t_w
         vocab.word_to_index = w_t_i
         for idx, word in enumerate(special_words.__dict__.keys()):
@@ -66,22 +256,152 @@ class Vocab:
         pickle.dump(self.number_of_special, file)
         print("Vocab successfully saved")
 
+    def save_to_mapped_file(self, file: BinaryIO):
+        """
+        Writes vocab (special words included) in format that can be opened by load_from_mapped_buffer:
+        magic, header, offsets of sorted words, positions of words by index, indices of sorted words and words blob.
+        """
+        if self.int_keys:
+            self._save_to_mapped_int_file(file)
+            return
+        print("Saving mapped vocab to file...")
+        encoded_words = sorted((word.encode("utf-8"), index) for word, index in self.word_to_index.items())
+        words_number = len(encoded_words)
+        if sorted(index for _, index in encoded_words) != list(range(words_number)):
+            raise RuntimeError("Only vocabs with continuous indices can be saved to mapped file")
+        offsets = np.zeros(words_number + 1, dtype="<u8")
+        offsets[1:] = np.cumsum([len(word) for word, _ in encoded_words])
+        indices = np.array([index for _, index in encoded_words], dtype="<i4")
+        positions = np.empty(words_number, dtype="<i4")
+        positions[indices] = np.arange(words_number, dtype="<i4")
+        blob = b"".join(word for word, _ in encoded_words)
+
+        file.write(MAPPED_VOCAB_MAGIC)
+        file.write(MAPPED_VOCAB_HEADER.pack(words_number, self.number_of_special, len(blob)))
+        for array in (offsets, positions, indices):
+            file.write(array.tobytes())
+        file.write(b"\0" * (_aligned(file.tell()) - file.tell()))
+        file.write(blob)
+        file.write(b"\0" * (_aligned(file.tell()) - file.tell()))
+        print("Mapped vocab successfully saved")
+
+    def _save_to_mapped_int_file(self, file: BinaryIO):
+        """
+        Writes vocab of int64 keys: magic, header, sorted keys, indices of sorted keys and positions of keys by index.
+        Special words are not written, they get indices before keys.
+        """
+        print("Saving mapped int vocab to file...")
+        items = sorted((key, index) for key, index in self.word_to_index.items() if not isinstance(key, str))
+        keys_number = len(items)
+        if sorted(index for _, index in items) != list(range(self.number_of_special,
+                                                             self.number_of_special + keys_number)):
+            raise RuntimeError("Only vocabs with continuous indices can be saved to mapped file")
+        keys = np.array([key for key, _ in items], dtype="<i8")
+        indices = np.array([index for _, index in items], dtype="<i4")
+        positions = np.empty(keys_number, dtype="<i4")
+        positions[indices - self.number_of_special] = np.arange(keys_number, dtype="<i4")
+
+        file.write(MAPPED_INT_VOCAB_MAGIC)
+        file.write(MAPPED_VOCAB_HEADER.pack(keys_number, self.number_of_special, 0))
+        for array in (keys, indices, positions):
+            file.write(array.tobytes())
+        file.write(b"\0" * (_aligned(file.tell()) - file.tell()))
+        print("Mapped int vocab successfully saved")
+
+    @classmethod
+    def load_from_mapped_buffer(cls, buffer, offset: int = 0,
+                                special_words: Optional[Namespace] = basic_special_words) -> Tuple["Vocab", int]:
+        """
+        Opens vocab written by save_to_mapped_file without copying it. Buffer should be alive while vocab is used.
+        Returns:
+            vocab and offset of the next section in buffer.
+        """
+        magic = bytes(buffer[offset:offset + len(MAPPED_VOCAB_MAGIC)])
+        if magic not in (MAPPED_VOCAB_MAGIC, MAPPED_INT_VOCAB_MAGIC):
+            raise RuntimeError("Wrong mapped vocab format at offset " + str(offset))
+        offset += len(MAPPED_VOCAB_MAGIC)
+        words_number, special_words_size, blob_size = MAPPED_VOCAB_HEADER.unpack_from(buffer, offset)
+        if special_words_size != len(special_words.__dict__):
+            raise RuntimeError(
+                "Wrong special words providen: expected length: " + str(
+                    special_words_size) + ", but " + str(
+                    len(special_words.__dict__)) + " were given")
+        offset += MAPPED_VOCAB_HEADER.size
+        if magic == MAPPED_INT_VOCAB_MAGIC:
+            return cls._load_from_mapped_int_buffer(buffer, offset, words_number, special_words)
+        offsets = np.frombuffer(buffer, dtype="<u8", count=words_number + 1, offset=offset)
+        offset += offsets.nbytes
+        positions = np.frombuffer(buffer, dtype="<i4", count=words_number, offset=offset)
+        offset += positions.nbytes
+        indices = np.frombuffer(buffer, dtype="<i4", count=words_number, offset=offset)
+        offset = _aligned(offset + indices.nbytes)
+        blob = memoryview(buffer)[offset:offset + blob_size]
+        offset = _aligned(offset + blob_size)
+
+        vocab = cls([], special_words)
+        vocab.word_to_index = MappedWordToIndex(blob, offsets, indices)
+        vocab.index_to_word = MappedIndexToWord(vocab.word_to_index, positions)
+        print("Mapped vocab of", words_number, "elements")
+        return vocab, offset
+
+    @classmethod
+    def _load_from_mapped_int_buffer(cls, buffer, offset: int, keys_number: int,
+                                     special_words: Namespace) -> Tuple["Vocab", int]:
+        keys = np.frombuffer(buffer, dtype="<i8", count=keys_number, offset=offset)
+        offset += keys.nbytes
+        indices = np.frombuffer(buffer, dtype="<i4", count=keys_number, offset=offset)
+        offset += indices.nbytes
+        positions = np.frombuffer(buffer, dtype="<i4", count=keys_number, offset=offset)
+        offset = _aligned(offset + positions.nbytes)
+
+        vocab = cls([], special_words, int_keys=True)
+        vocab.word_to_index = MappedIntWordToIndex(keys, indices, {word: index for index, word in
+                                                                   enumerate(special_words.__dict__.values())})
+        vocab.index_to_word = MappedIntIndexToWord(vocab.word_to_index, positions)
+        print("Mapped int vocab of", keys_number + len(special_words.__dict__), "elements")
+        return vocab, offset
+
+    def fingerprint(self) -> bytes:
+        """sha256 of words in order of their indices, the same for created, pickled and mapped vocab"""
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for index in range(len(self.index_to_word)):
+                digest.update(str(self.index_to_word[index]).encode("utf-8") + b"\n")
+            self._fingerprint = digest.digest()
+        return self._fingerprint
+
     @staticmethod
     def create_word_to_index_lookup_table(word_to_index: Dict[str, int],
-                                          default_value: int):
+                                          default_value: int,
+                                          int_keys: bool = False):
+        """int_keys - table is keyed by int64 keys of vocab, its special words are left out"""
+        import tensorflow as tf
+        if isinstance(word_to_index, (MappedWordToIndex, MappedIntWordToIndex)):
+            keys, values = word_to_index.keys_tensor(), word_to_index.values_tensor()
+        elif int_keys:
+            items = [(key, index) for key, index in word_to_index.items() if not isinstance(key, str)]
+            keys = np.array([key for key, _ in items], dtype=np.int64)
+            values = np.array([index for _, index in items], dtype=np.int32)
+        else:
+            keys, values = list(word_to_index.keys()), list(word_to_index.values())
         return tf.lookup.StaticHashTable(
-            tf.lookup.KeyValueTensorInitializer(list(word_to_index.keys()),
-                                                list(word_to_index.values()),
-                                                key_dtype=tf.string,
+            tf.lookup.KeyValueTensorInitializer(keys,
+                                                values,
+                                                key_dtype=tf.int64 if int_keys else tf.string,
                                                 value_dtype=tf.int32),
             default_value=tf.constant(default_value, tf.int32))
 
     @staticmethod
     def create_index_to_word_lookup_table(index_to_word: Dict[int, str],
                                           default_value: str):
+        import tensorflow as tf
+        if isinstance(index_to_word, (MappedIndexToWord, MappedIntIndexToWord)):
+            keys, values = index_to_word.keys_tensor(), index_to_word.values_tensor()
+        else:
+            keys, values = list(index_to_word.keys()), [str(word) for word in index_to_word.values()]
         return tf.lookup.StaticHashTable(
-            tf.lookup.KeyValueTensorInitializer(list(index_to_word.keys()),
-                                                list(index_to_word.values()),
+            tf.lookup.KeyValueTensorInitializer(keys,
+                                                values,
                                                 key_dtype=tf.int32,
                                                 value_dtype=tf.string),
             default_value=tf.constant(default_value, tf.string))
@@ -90,7 +410,8 @@ class Vocab:
         if self.lookup_table_word_to_index is None:
             self.lookup_table_word_to_index = self.create_word_to_index_lookup_table(
                 self.word_to_index,
-                config.config.DEFAULT_INT32_LOOKUP_VALUE)
+                config.config.DEFAULT_INT32_LOOKUP_VALUE,
+                self.int_keys)
 
     def create_index_lookup(self):
         if self.lookup_table_index_to_word is None:
@@ -98,14 +419,15 @@ class Vocab:
                 self.index_to_word,
                 config.config.DEFAULT_STRING_LOOKUP_VALUE)
 
-    def get_word_to_index_lookup_table(self) -> tf.lookup.StaticHashTable:
+    def get_word_to_index_lookup_table(self) -> "tf.lookup.StaticHashTable":
         if self.lookup_table_word_to_index is None:
             self.lookup_table_word_to_index = self.create_word_to_index_lookup_table(
                 self.word_to_index,
-                config.config.DEFAULT_INT32_LOOKUP_VALUE)
+                config.config.DEFAULT_INT32_LOOKUP_VALUE,
+                self.int_keys)
         return self.lookup_table_word_to_index
 
-    def get_index_to_word_lookup_table(self) -> tf.lookup.StaticHashTable:
+    def get_index_to_word_lookup_table(self) -> "tf.lookup.StaticHashTable":
         if self.lookup_table_index_to_word is None:
             self.lookup_table_index_to_word = self.create_index_to_word_lookup_table(
                 self.index_to_word,
@@ -113,9 +435,21 @@ class Vocab:
         return self.lookup_table_index_to_word
 
     def get_lookup_index(self, word):
+        """Looks up string tensor of words. Words of vocab with int keys are parsed, empty ones are not in vocab"""
+        import tensorflow as tf
+        if self.int_keys:
+            empty = tf.equal(word, "")
+            indices = self.get_word_to_index_lookup_table().lookup(
+                tf.strings.to_number(tf.where(empty, "0", word), out_type=tf.int64))
+            return tf.where(empty, tf.constant(config.config.DEFAULT_INT32_LOOKUP_VALUE, tf.int32), indices)
         return self.get_word_to_index_lookup_table().lookup(word)
 
 
+def _has_int_keys(word_to_something: Dict) -> bool:
+    # Keys are of one type, except for special words which go first.
+    return any(isinstance(word, int) for word in islice(word_to_something, len(basic_special_words.__dict__) + 1))
+
+
 WordFreqDictType = Dict[str, int]
 
 
@@ -125,16 +459,55 @@ class Code2VecFreqDicts(NamedTuple):
     target_freq_dict: WordFreqDictType
 
 
+def _vocabs_limits() -> Tuple[int, int, int]:
+    """Sizes of token, path and target vocabs created from frequency dicts"""
+    return (config.config.MAX_NUMBER_OF_WORDS_IN_FREQ_DICT, config.config.MAX_NUMBER_OF_WORDS_IN_FREQ_DICT,
+            config.config.TARGET_VOCAB_SIZE)
+
+
+def _create_vocabs(freq_dicts: Code2VecFreqDicts) -> Tuple[Vocab, Vocab, Vocab]:
+    """Token, path and target vocabs of the most frequent words"""
+    token_limit, path_limit, target_limit = _vocabs_limits()
+    print("Creating token vocab")
+    token_vocab = Vocab.create_from_freq_dict(freq_dicts.token_freq_dict, token_limit)
+    print("Created token vocab")
+    print("Creating path vocab")
+    path_vocab = Vocab.create_from_freq_dict(freq_dicts.path_freq_dict, path_limit)
+    print("Created path vocab")
+    print("Creating target vocab")
+    target_vocab = Vocab.create_from_freq_dict(freq_dicts.target_freq_dict, target_limit)
+    print("Created target vocab")
+    return token_vocab, path_vocab, target_vocab
+
+
+def _vocabs_fingerprint(target_vocab: Vocab, path_vocab: Vocab, token_vocab: Vocab) -> bytes:
+    return hashlib.sha256(b"".join(vocab.fingerprint() for vocab in (target_vocab, path_vocab, token_vocab))).digest()
+
+
+def freq_dicts_fingerprint(freq_dicts: Code2VecFreqDicts) -> Dict:
+    """
+    Fingerprint of vocabs created from freq dicts with sizes from config. It is saved after freq dicts, so
+    Code2VecVocabs created from them with the same sizes does not compute it word by word.
+    """
+    token_vocab, path_vocab, target_vocab = _create_vocabs(freq_dicts)
+    return {"limits": _vocabs_limits(), "fingerprint": _vocabs_fingerprint(target_vocab, path_vocab, token_vocab)}
+
+
 class Code2VecVocabs:
-    def __init__(self, net: NetType = NetType.code2vec):
+    def __init__(self, net: NetType = NetType.code2vec, freq_dicts_path: Optional[str] = None):
+        """freq_dicts_path - overrides frequency dicts path from config for the given net"""
         self.already_saved_paths: Set[str] = set()
         self.token_vocab: Optional[Vocab] = None
         self.path_vocab: Optional[Vocab] = None
         self.target_vocab: Optional[Vocab] = None
+        self.buffer: Optional[mmap.mmap] = None
+        self._fingerprint: Optional[bytes] = None
         self.net = net
         self.training_freq_dict_path = config.config.VEC_TRAINING_FREQ_DICTS_PATH
         if self.net == NetType.code2var:
             self.training_freq_dict_path = config.config.VAR_TRAINING_FREQ_DICTS_PATH
+        if freq_dicts_path is not None:
+            self.training_freq_dict_path = freq_dicts_path
         if config.config.CREATE_VOCAB:
             self._create()
         else:
@@ -142,22 +515,15 @@ class Code2VecVocabs:
 
     def _create(self):
         print("Creating vocab from", self.training_freq_dict_path)
-        freq_dicts = self._load_freq_dicts()
-        print("Creating token vocab")
-        self.token_vocab = Vocab.create_from_freq_dict(
-            freq_dicts.token_freq_dict, config.config.MAX_NUMBER_OF_WORDS_IN_FREQ_DICT)
-        print("Created token vocab")
-        print("Creating path vocab")
-        self.path_vocab = Vocab.create_from_freq_dict(freq_dicts.path_freq_dict,
-                                                      config.config.MAX_NUMBER_OF_WORDS_IN_FREQ_DICT)
-        print("Created path vocab")
-        print("Creating target vocab")
-        self.target_vocab = Vocab.create_from_freq_dict(
-            freq_dicts.target_freq_dict, config.config.TARGET_VOCAB_SIZE)
-        print("Created target vocab")
+        freq_dicts, fingerprint = self._load_freq_dicts()
+        self.token_vocab, self.path_vocab, self.target_vocab = _create_vocabs(freq_dicts)
+        # Vocabs of other sizes than freq dicts were saved for have other fingerprint.
+        if fingerprint is not None and tuple(fingerprint["limits"]) == _vocabs_limits():
+            self._fingerprint = fingerprint["fingerprint"]
         print("Created all vocabs")
 
-    def _load_freq_dicts(self):
+    def _load_freq_dicts(self) -> Tuple[Code2VecFreqDicts, Optional[Dict]]:
+        """Returns freq dicts and fingerprint saved after them by preprocess, None in freq dicts saved before it"""
         with open(self.training_freq_dict_path, "rb") as file:
             print("Loading frequency dicts from",
                   self.training_freq_dict_path)
@@ -167,20 +533,58 @@ class Code2VecVocabs:
             path_freq_dict = pickle.load(file)
             print("Loading target freq dict")
             target_freq_dict = pickle.load(file)
+            try:
+                fingerprint = pickle.load(file)
+            except EOFError:
+                fingerprint = None
         return Code2VecFreqDicts(token_freq_dict=token_freq_dict,
                                  path_freq_dict=path_freq_dict,
-                                 target_freq_dict=target_freq_dict)
+                                 target_freq_dict=target_freq_dict), fingerprint
+
+    def fingerprint(self) -> bytes:
+        """
+        sha256 of target, path and token vocabs, tells whether indices of data match these vocabs.
+        It is read from freq dicts or mapped vocabs if they were saved with it, otherwise computed word by word.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = _vocabs_fingerprint(self.target_vocab, self.path_vocab, self.token_vocab)
+        return self._fingerprint
 
     def save(self, path: str):
+        """Saves vocabs in mapped format, so they can be opened by _load without unpickling"""
         if path not in self.already_saved_paths:
             with open(path, "wb") as file:
                 print("Saving Code2VecVocabs to", path)
-                self.target_vocab.save_to_file(file)
-                self.path_vocab.save_to_file(file)
-                self.token_vocab.save_to_file(file)
+                self.target_vocab.save_to_mapped_file(file)
+                self.path_vocab.save_to_mapped_file(file)
+                self.token_vocab.save_to_mapped_file(file)
+                file.write(MAPPED_FINGERPRINT_MAGIC)
+                file.write(self.fingerprint())
             self.already_saved_paths.add(path)
 
     def _load(self, path: str):
+        with open(path, "rb") as file:
+            is_mapped = file.read(len(MAPPED_VOCAB_MAGIC)) == MAPPED_VOCAB_MAGIC
+        if is_mapped:
+            self._load_mapped(path)
+        else:
+            self._load_pickled(path)
+
+    def _load_mapped(self, path: str):
+        with open(path, "rb") as file:
+            # mmap keeps its own file descriptor, so the buffer stays valid after file is closed.
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        print("Mapping Code2VecVocabs from", path)
+        self.target_vocab, offset = Vocab.load_from_mapped_buffer(self.buffer)
+        self.path_vocab, offset = Vocab.load_from_mapped_buffer(self.buffer, offset)
+        self.token_vocab, offset = Vocab.load_from_mapped_buffer(self.buffer, offset)
+        # Mapped vocabs saved before fingerprint was added end here.
+        if bytes(self.buffer[offset:offset + len(MAPPED_FINGERPRINT_MAGIC)]) == MAPPED_FINGERPRINT_MAGIC:
+            offset += len(MAPPED_FINGERPRINT_MAGIC)
+            self._fingerprint = bytes(self.buffer[offset:offset + hashlib.sha256().digest_size])
+        self.already_saved_paths.add(path)
+
+    def _load_pickled(self, path: str):
         with open(path, "rb") as file:
             print("Loading Code2VecVocabs from", path)
             print("Loading target vocab")